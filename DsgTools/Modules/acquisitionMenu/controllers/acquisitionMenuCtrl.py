@@ -19,6 +19,7 @@ class AcquisitionMenuCtrl:
 
     def unloadPlugin(self):
         self.disconnectQgisSignals()
+        self.qgis.unload()
 
     def connectQgisSignals(self):
         self.qgis.connectSignal("StartAddFeature", self.deactiveMenu)
@@ -0,0 +1,176 @@
+from qgis import core
+
+
+class LayerRegistry:
+    def __init__(self, project=None, formatMapValues=None):
+        """
+        formatMapValues, if given, is applied to the value map of each field
+        before it is cached (see QgisCtrl.formatMapValues).
+        """
+        self.project = project
+        self.formatMapValues = formatMapValues
+        self.loaded = False
+        self.layerNameById = {}
+        self.layerIdsByName = {}
+        self.fieldConfigsById = {}
+        self.attributePlansById = {}
+        self.primaryKeyIndexesById = {}
+        self.layerConnections = {}
+
+    def getProject(self):
+        return self.project if self.project else core.QgsProject.instance()
+
+    def load(self):
+        if self.loaded:
+            return
+        project = self.getProject()
+        self.addLayers(project.mapLayers().values())
+        project.layersAdded.connect(self.addLayers)
+        project.layersWillBeRemoved.connect(self.removeLayers)
+        self.loaded = True
+
+    def unload(self):
+        if not self.loaded:
+            return
+        project = self.getProject()
+        for signal, callback in (
+            (project.layersAdded, self.addLayers),
+            (project.layersWillBeRemoved, self.removeLayers),
+        ):
+            try:
+                signal.disconnect(callback)
+            except Exception:
+                pass
+        for layerId in list(self.layerNameById):
+            self.disconnectLayer(layerId)
+        self.layerNameById = {}
+        self.layerIdsByName = {}
+        self.fieldConfigsById = {}
+        self.attributePlansById = {}
+        self.primaryKeyIndexesById = {}
+        self.loaded = False
+
+    def addLayers(self, layers):
+        for layer in layers:
+            if not (layer.type() == core.QgsMapLayer.VectorLayer):
+                continue
+            self.indexLayer(layer)
+            connections = [
+                (layer.dataSourceChanged, lambda layer=layer: self.reindexLayer(layer)),
+                (layer.nameChanged, lambda layer=layer: self.reindexLayer(layer)),
+                (
+                    layer.updatedFields,
+                    lambda layerId=layer.id(): self.clearFieldCache(layerId),
+                ),
+            ]
+            for signal, callback in connections:
+                signal.connect(callback)
+            self.layerConnections[layer.id()] = connections
+
+    def removeLayers(self, layerIds):
+        for layerId in layerIds:
+            if layerId not in self.layerNameById:
+                continue
+            self.disconnectLayer(layerId)
+            self.unindexLayer(layerId)
+
+    def disconnectLayer(self, layerId):
+        for signal, callback in self.layerConnections.pop(layerId, []):
+            try:
+                signal.disconnect(callback)
+            except Exception:
+                pass
+
+    def indexLayer(self, layer):
+        layerName = self.buildLayerName(layer)
+        self.layerNameById[layer.id()] = layerName
+        if not layerName:
+            return
+        self.layerIdsByName.setdefault(layerName, []).append(layer.id())
+
+    def unindexLayer(self, layerId):
+        layerName = self.layerNameById.pop(layerId, None)
+        self.clearFieldCache(layerId)
+        self.primaryKeyIndexesById.pop(layerId, None)
+        if not layerName or layerName not in self.layerIdsByName:
+            return
+        self.layerIdsByName[layerName].remove(layerId)
+        if not self.layerIdsByName[layerName]:
+            del self.layerIdsByName[layerName]
+
+    def reindexLayer(self, layer):
+        self.unindexLayer(layer.id())
+        self.indexLayer(layer)
+
+    def clearFieldCache(self, layerId):
+        self.fieldConfigsById.pop(layerId, None)
+        self.attributePlansById.pop(layerId, None)
+
+    def buildLayerName(self, layer):
+        if layer.providerType() == "postgres":
+            return layer.dataProvider().uri().table()
+        if layer.providerType() == "ogr":
+            layerName = (
+                layer.dataProvider().uri().uri().split("|")[-1].split("=")[-1][1:-1]
+            )
+            return layerName if layerName != "" else layer.name()
+        return layer.name()
+
+    def getLayerName(self, layer):
+        self.load()
+        if layer.id() in self.layerNameById:
+            return self.layerNameById[layer.id()]
+        return self.buildLayerName(layer)
+
+    def getLayerNames(self):
+        self.load()
+        return [name for name in self.layerNameById.values() if name]
+
+    def getLayersByName(self, name):
+        self.load()
+        project = self.getProject()
+        return [
+            project.mapLayer(layerId) for layerId in self.layerIdsByName.get(name, [])
+        ]
+
+    def getPrimaryKeyIndexes(self, layer):
+        self.load()
+        if layer.id() not in self.primaryKeyIndexesById:
+            self.primaryKeyIndexesById[layer.id()] = set(
+                layer.dataProvider().pkAttributeIndexes()
+            )
+        return self.primaryKeyIndexesById[layer.id()]
+
+    def getFieldConfigs(self, layer):
+        """
+        Returns a dict {fieldName: (fieldIndex, editorConfig, valueMap)} of the
+        layer. editorConfig is the widget config of the field and valueMap the
+        formatted value map of the layer widget, or None when the field does
+        not use a value map widget.
+        """
+        self.load()
+        if layer.id() in self.fieldConfigsById:
+            return self.fieldConfigsById[layer.id()]
+        fieldConfigs = {}
+        fields = layer.fields()
+        for fieldIndex in layer.attributeList():
+            field = fields.field(fieldIndex)
+            layerConfig = layer.editorWidgetSetup(fieldIndex).config()
+            valueMap = layerConfig["map"] if "map" in layerConfig else None
+            if valueMap is not None and self.formatMapValues is not None:
+                valueMap = self.formatMapValues(valueMap)
+            fieldConfigs[field.name()] = (
+                fieldIndex,
+                field.editorWidgetSetup().config(),
+                valueMap,
+            )
+        self.fieldConfigsById[layer.id()] = fieldConfigs
+        return fieldConfigs
+
+    def getAttributePlans(self, layer):
+        """
+        Returns the dict used to cache the compiled attribute plans of the
+        layer. It is cleared together with the field configs.
+        """
+        self.load()
+        return self.attributePlansById.setdefault(layer.id(), {})
@@ -3,49 +3,30 @@ from qgis.utils import iface
 from PyQt5 import QtCore, uic, QtWidgets, QtGui
 import json
 from DsgTools.Modules.qgis.factories.actionsFactory import ActionsFactory
+from DsgTools.Modules.qgis.controllers.layerRegistry import LayerRegistry
 
 
 class QgisCtrl:
-    def __init__(self, actionsFactory=ActionsFactory()):
+    def __init__(self, actionsFactory=ActionsFactory(), layerRegistry=None):
         self.actionsFactory = actionsFactory
+        self.layerRegistry = (
+            layerRegistry
+            if layerRegistry is not None
+            else LayerRegistry(formatMapValues=self.formatMapValues)
+        )
+
+    def unload(self):
+        self.layerRegistry.unload()
 
     def getLoadedVectorLayerNames(self):
-        layerNames = []
-        for l in core.QgsProject.instance().mapLayers().values():
-            if not (l.type() == core.QgsMapLayer.VectorLayer):
-                continue
-            layerName = None
-            if l.providerType() == "postgres":
-                layerName = l.dataProvider().uri().table()
-            elif l.providerType() == "ogr":
-                layerName = (
-                    l.dataProvider().uri().uri().split("|")[-1].split("=")[-1][1:-1]
-                )
-                if layerName == '':
-                    layerName = l.name()
-            else:
-                layerName = l.name()
-            if not layerName:
-                continue
-            layerNames.append(layerName)
-        return layerNames
+        return self.layerRegistry.getLayerNames()
 
     def getVectorLayerNames(self, layers):
         layerNames = []
         for l in layers:
             if not (l.type() == core.QgsMapLayer.VectorLayer):
                 continue
-            layerName = None
-            if l.providerType() == "postgres":
-                layerName = l.dataProvider().uri().table()
-            elif l.providerType() == "ogr":
-                layerName = (
-                    l.dataProvider().uri().uri().split("|")[-1].split("=")[-1][1:-1]
-                )
-                if layerName == '':
-                    layerName = l.name()
-            else:
-                layerName = l.name()
+            layerName = self.layerRegistry.getLayerName(l)
             if not layerName:
                 continue
             layerNames.append(layerName)
@@ -59,25 +40,7 @@ class QgisCtrl:
         ]
 
     def getVectorLayersByName(self, name):
-        layers = []
-        for l in core.QgsProject.instance().mapLayers().values():
-            if not (l.type() == core.QgsMapLayer.VectorLayer):
-                continue
-            layerName = None
-            if l.providerType() == "postgres":
-                layerName = l.dataProvider().uri().table()
-            elif l.providerType() == "ogr":
-                layerName = (
-                    l.dataProvider().uri().uri().split("|")[-1].split("=")[-1][1:-1]
-                )
-                if layerName == '':
-                    layerName = l.name()
-            else:
-                layerName = l.name()
-            if not layerName or layerName != name:
-                continue
-            layers.append(l)
-        return layers
+        return self.layerRegistry.getLayersByName(name)
 
     def getVectorLayerByName(self, name):
         layers = self.getVectorLayersByName(name)
@@ -95,22 +58,20 @@ class QgisCtrl:
 
     def getAttributesConfigByLayer(self, layer, withPrimaryKey, withVirtualField):
         attrConfig = {}
-        for fieldIndex in layer.attributeList():
-            if not (withPrimaryKey) and (
-                fieldIndex in self.getLayerPrimaryKeyIndexes(layer)
-            ):
+        primaryKeyIndexes = self.getLayerPrimaryKeyIndexes(layer)
+        fieldConfigs = self.layerRegistry.getFieldConfigs(layer)
+        for fieldName, (fieldIndex, fieldConfig, _) in fieldConfigs.items():
+            if not (withPrimaryKey) and (fieldIndex in primaryKeyIndexes):
                 continue
             if not (withVirtualField) and (
                 self.getFieldTypeName(layer, fieldIndex) == ""
             ):
                 continue
-            fieldName = layer.fields().field(fieldIndex).name()
-            fieldConfig = layer.fields().field(fieldIndex).editorWidgetSetup().config()
             attrConfig[fieldName] = fieldConfig
         return attrConfig
 
     def getLayerPrimaryKeyIndexes(self, layer):
-        return layer.dataProvider().pkAttributeIndexes()
+        return self.layerRegistry.getPrimaryKeyIndexes(layer)
 
     def getFieldTypeName(self, layer, fieldIndex):
         return layer.fields().field(fieldIndex).typeName()
@@ -135,18 +96,16 @@ class QgisCtrl:
         gui.QgsGui.shortcutsManager().unregisterShortcut(shortcut)
 
     def setDefaultFields(self, layer, attributes, reset=False):
-        primaryKeyIndexes = layer.dataProvider().pkAttributeIndexes()
+        primaryKeyIndexes = self.getLayerPrimaryKeyIndexes(layer)
+        fieldConfigs = self.layerRegistry.getFieldConfigs(layer)
         for attributeName in attributes:
-            fieldIndex = layer.fields().indexFromName(attributeName)
+            fieldIndex, _, valueMap = fieldConfigs.get(attributeName, (-1, {}, None))
             if fieldIndex in primaryKeyIndexes:
                 continue
             attributeValue = attributes[attributeName]
             configField = layer.defaultValueDefinition(fieldIndex)
-            isMapValue = "map" in layer.editorWidgetSetup(fieldIndex).config()
+            isMapValue = valueMap is not None
             if isMapValue:
-                valueMap = self.formatMapValues(
-                    layer.editorWidgetSetup(fieldIndex).config()["map"]
-                )
                 if not (attributeValue is None) and attributeValue in valueMap:
                     configField.setExpression("{0}".format(valueMap[attributeValue]))
                 elif reset:
@@ -190,47 +149,73 @@ class QgisCtrl:
 
     def attributeSelectedFeatures(self, layer, attributes):
         layer.startEditing()
-        features = layer.selectedFeatures()
-        for feature in features:
-            self.attributeFeature(feature, layer, attributes)
-            layer.updateFeature(feature)
+        attributePlan = self.getAttributePlan(layer, attributes)
+        if attributePlan:
+            layer.beginEditCommand("DSGTools acquisition menu reclassification")
+            for featureId in layer.selectedFeatureIds():
+                layer.changeAttributeValues(featureId, attributePlan)
+            layer.endEditCommand()
         self.canvasRefresh()
 
-    def attributeFeature(self, feature, layer, attributes):
+    def getAttributePlan(self, layer, attributes):
+        """
+        Compiles the attribute dict of a button into a {fieldIndex: value}
+        plan for the given layer. Plans are cached per layer and are rebuilt
+        only when the fields of the layer change.
+        """
+        attributePlans = self.layerRegistry.getAttributePlans(layer)
+        planKey = json.dumps(attributes, sort_keys=True, default=str)
+        if planKey in attributePlans:
+            return attributePlans[planKey]
+        fieldConfigs = self.layerRegistry.getFieldConfigs(layer)
+        attributePlan = {}
         for fieldName in attributes:
-            indx = layer.fields().indexFromName(fieldName)
-            if indx < 0:
+            if fieldName not in fieldConfigs:
                 continue
-            config = layer.editorWidgetSetup(indx).config()
-            isMapValue = "map" in config
+            indx, _, valueMap = fieldConfigs[fieldName]
             attributeValue = attributes[fieldName]
-            if isMapValue:
-                valueMap = self.formatMapValues(config["map"])
+            if valueMap is not None:
                 if attributeValue in valueMap:
-                    feature.setAttribute(indx, valueMap[attributeValue])
+                    attributePlan[indx] = valueMap[attributeValue]
             elif attributeValue and not (attributeValue in ["NULL", "IGNORAR"]):
                 """if re.match('^\@value\(".+"\)$', value):
                 variable = value.split('"')[-2]
                 value = ProjectQgis(self.iface).getVariableProject(variable)"""
-                feature.setAttribute(indx, attributeValue)
+                attributePlan[indx] = attributeValue
+        attributePlans[planKey] = attributePlan
+        return attributePlan
+
+    def attributeFeature(self, feature, layer, attributes):
+        for indx, attributeValue in self.getAttributePlan(layer, attributes).items():
+            feature.setAttribute(indx, attributeValue)
 
     def cutAndPasteSelectedFeatures(self, layer, destinatonLayer, attributes):
         layer.startEditing()
         destinatonLayer.startEditing()
-        features = layer.selectedFeatures()
+        attributePlan = self.getAttributePlan(destinatonLayer, attributes)
+        fields = destinatonLayer.fields()
+        attributeValues = [None] * fields.count()
+        for indx, attributeValue in attributePlan.items():
+            attributeValues[indx] = attributeValue
+        toPoint = (
+            destinatonLayer.geometryType() == core.QgsWkbTypes.PointGeometry
+            and layer.geometryType() == core.QgsWkbTypes.PolygonGeometry
+        )
         newFeatures = []
-        for feature in features:
-            newFeat = core.QgsFeature()
-            newFeat.setFields(destinatonLayer.fields())
-            newGeom = feature.geometry().pointOnSurface() \
-                if destinatonLayer.geometryType() == core.QgsWkbTypes.PointGeometry \
-                    and layer.geometryType() == core.QgsWkbTypes.PolygonGeometry \
-                else feature.geometry()
+        for feature in layer.getSelectedFeatures():
+            newFeat = core.QgsFeature(fields)
+            newGeom = (
+                feature.geometry().pointOnSurface() if toPoint else feature.geometry()
+            )
             newFeat.setGeometry(newGeom)
-            self.attributeFeature(newFeat, destinatonLayer, attributes)
+            newFeat.setAttributes(list(attributeValues))
             newFeatures.append(newFeat)
+        layer.beginEditCommand("DSGTools acquisition menu reclassification")
         layer.deleteSelectedFeatures()
+        layer.endEditCommand()
+        destinatonLayer.beginEditCommand("DSGTools acquisition menu reclassification")
         destinatonLayer.addFeatures(newFeatures)
+        destinatonLayer.endEditCommand()
         self.canvasRefresh()
 
     def startToolByName(self, name):
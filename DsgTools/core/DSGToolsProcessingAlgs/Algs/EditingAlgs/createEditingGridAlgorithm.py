@@ -75,6 +75,7 @@ class CreateEditingGridAlgorithm(QgsProcessingAlgorithm):
     FONT_LL = "FONT_LL"
     COLOR_LL = "COLOR_LL"
     OUTPUT = "OUTPUT"
+    GRID_OUTPUT = "GRID_OUTPUT"
 
     def initAlgorithm(self, config):
         """
@@ -209,6 +210,9 @@ class CreateEditingGridAlgorithm(QgsProcessingAlgorithm):
                 self.OUTPUT, self.tr("Original layer with assigned styles")
             )
         )
+        self.addOutput(
+            QgsProcessingOutputVectorLayer(self.GRID_OUTPUT, self.tr("Grid layer"))
+        )
 
     def parameterAsColor(self, parameters, name, context):
         return parameters[name]
@@ -233,7 +237,8 @@ class CreateEditingGridAlgorithm(QgsProcessingAlgorithm):
         font = self.parameterAsFont(parameters, self.FONT, context)
         fontLL = self.parameterAsFont(parameters, self.FONT_LL, context)
         llcolor = self.parameterAsColor(parameters, self.COLOR_LL, context)
-        GridAndLabelCreator().geo_test(
+        gridCreator = GridAndLabelCreator()
+        gridCreator.geo_test(
             inputLyr,
             attribute,
             id_attribute,
@@ -248,8 +253,9 @@ class CreateEditingGridAlgorithm(QgsProcessingAlgorithm):
             fontLL,
             llcolor,
         )
+        gridLayer = gridCreator.getGridCacheLayer(inputLyr, id_value)
 
-        return {self.OUTPUT: inputLyr}
+        return {self.OUTPUT: inputLyr, self.GRID_OUTPUT: gridLayer}
 
     def name(self):
         """
@@ -288,9 +294,29 @@ class CreateEditingGridAlgorithm(QgsProcessingAlgorithm):
     def tr(self, string):
         return QCoreApplication.translate("CreateEditingGridAlgorithm", string)
 
+    def shortHelpString(self):
+        return self.tr(
+            "Creates the editing grid of the frame feature with the given id. The "
+            "frame layer only receives the frame style and the grid labels; the "
+            "grid lines are drawn by a separate line layer named "
+            "[frame layer]_grid_[id], returned as the Grid layer output. That "
+            "layer is stored in [project name]_grid_cache.gpkg next to the "
+            "project file (or in the processing temporary folder when the "
+            "project is not saved yet) and is reused while the grid parameters "
+            "do not change. Exporting the frame layer style alone does not "
+            "carry the grid lines."
+        )
+
     def createInstance(self):
         return CreateEditingGridAlgorithm()
 
+    def flags(self):
+        """
+        This process is not thread safe due to the fact that it adds the grid
+        layers to the project and its layer tree.
+        """
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
 
 class ParameterFontType(QgsProcessingParameterType):
     def __init__(self):
@@ -59,6 +59,7 @@ from qgis.core import (
     QgsProcessingOutputMultipleLayers,
     QgsProcessingParameterString,
 )
+from DsgTools.core.DSGToolsProcessingAlgs.styleCache import styleCache
 
 
 class ApplyStylesFromDatabaseToLayersAlgorithm(QgsProcessingAlgorithm):
@@ -98,36 +99,38 @@ class ApplyStylesFromDatabaseToLayersAlgorithm(QgsProcessingAlgorithm):
         styleName = self.parameterAsString(parameters, self.STYLE_NAME, context)
         listSize = len(inputLyrList)
         progressStep = 100 / listSize if listSize else 0
+        # one query per database for the layers whose styles can be fetched
+        # in bulk, the remaining ones are read layer by layer
+        styleDict, unresolvedList = styleCache.databaseStyles(inputLyrList, styleName)
+        unresolvedIds = set(lyr.id() for lyr in unresolvedList)
         for current, lyr in enumerate(inputLyrList):
             if feedback.isCanceled():
                 break
-            count, idList, styleList, time, _ = lyr.listStylesInDatabase()
-            styleDict = dict(zip(styleList, idList))
-            if styleName in styleDict:
-                styleQml, _ = lyr.getStyleFromDatabase(styleDict[styleName])
-                self.applyStyle(lyr, styleQml)
-            elif (
-                "{style_name}/{layer_name}".format(
-                    style_name=styleName, layer_name=lyr.name()
-                )
-                in styleDict
-            ):
-                styleQml, _ = lyr.getStyleFromDatabase(
-                    styleDict[
-                        "{style_name}/{layer_name}".format(
-                            style_name=styleName, layer_name=lyr.name()
-                        )
-                    ]
-                )
+            if lyr.id() in unresolvedIds:
+                styleQml = self.getStyleFromLayer(lyr, styleName)
+            else:
+                styleQml = styleDict.get(lyr.id())
+            if styleQml:
                 self.applyStyle(lyr, styleQml)
             feedback.setProgress(current * progressStep)
-
         return {self.OUTPUT: [i.id() for i in inputLyrList]}
 
+    def getStyleFromLayer(self, lyr, styleName):
+        count, idList, styleList, time, _ = lyr.listStylesInDatabase()
+        styleDict = dict(zip(styleList, idList))
+        for name in (
+            styleName,
+            "{style_name}/{layer_name}".format(
+                style_name=styleName, layer_name=lyr.name()
+            ),
+        ):
+            if name in styleDict:
+                styleQml, _ = lyr.getStyleFromDatabase(styleDict[name])
+                return styleQml
+        return None
+
     def applyStyle(self, lyr, styleQml):
-        styleDoc = QDomDocument("qgis")
-        styleDoc.setContent(styleQml)
-        lyr.importNamedStyle(styleDoc)
+        lyr.importNamedStyle(styleCache.document(styleQml))
         lyr.triggerRepaint()
 
     def name(self):
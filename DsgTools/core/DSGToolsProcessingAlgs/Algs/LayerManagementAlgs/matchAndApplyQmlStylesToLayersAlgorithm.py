@@ -59,6 +59,7 @@ from qgis.core import (
     QgsProcessingOutputMultipleLayers,
     QgsProcessingParameterString,
 )
+from DsgTools.core.DSGToolsProcessingAlgs.styleCache import styleCache
 
 
 class MatchAndApplyQmlStylesToLayersAlgorithm(QgsProcessingAlgorithm):
@@ -131,31 +132,25 @@ class MatchAndApplyQmlStylesToLayersAlgorithm(QgsProcessingAlgorithm):
         for current, lyr in enumerate(inputLyrList):
             if feedback.isCanceled():
                 break
-            if lyr.dataProvider().uri().table() in qmlDict:
-                lyr.loadNamedStyle(qmlDict[lyr.dataProvider().uri().table()], True)
+            tableName = lyr.dataProvider().uri().table()
+            if tableName in qmlDict:
+                lyr.importNamedStyle(styleCache.fileDocument(qmlDict[tableName]))
                 lyr.triggerRepaint()
             feedback.setProgress(current * progressStep)
 
     def loadQMlFromJSONMap(self, inputJSONMap, inputLyrList, feedback):
         listSize = len(inputLyrList)
-        layerNames = [item["camada"] for item in inputJSONMap]
+        # the first entry of each layer is used
+        qmlDict = dict()
+        for item in inputJSONMap:
+            qmlDict.setdefault(item["camada"], item["qml"])
         progressStep = 100 / listSize if listSize else 0
         for current, lyr in enumerate(inputLyrList):
             if feedback.isCanceled():
                 break
-            if (
-                lyr.dataProvider().uri().table() in layerNames
-                and inputJSONMap[layerNames.index(lyr.dataProvider().uri().table())][
-                    "qml"
-                ]
-            ):
-                doc = QDomDocument()
-                doc.setContent(
-                    inputJSONMap[layerNames.index(lyr.dataProvider().uri().table())][
-                        "qml"
-                    ]
-                )
-                lyr.importNamedStyle(doc)
+            qml = qmlDict.get(lyr.dataProvider().uri().table())
+            if qml:
+                lyr.importNamedStyle(styleCache.document(qml))
                 lyr.triggerRepaint()
             feedback.setProgress(current * progressStep)
 
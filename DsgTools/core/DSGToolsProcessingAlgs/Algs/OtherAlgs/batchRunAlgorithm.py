@@ -20,6 +20,10 @@
  ***************************************************************************/
 """
 
+import concurrent.futures
+import os
+import time
+
 from PyQt5.QtCore import QCoreApplication
 from DsgTools.core.DSGToolsProcessingAlgs.algRunner import AlgRunner
 from qgis.PyQt.QtCore import QVariant
@@ -47,6 +51,11 @@ from qgis.core import (
     QgsProcessingMultiStepFeedback,
     QgsFields,
     QgsField,
+    QgsFeatureRequest,
+    QgsApplication,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
 )
 
 
@@ -56,6 +65,7 @@ class BatchRunAlgorithm(QgsProcessingAlgorithm):
     ALG_NAME = "ALG_NAME"
     PARAMETER_DICT = "PARAMETER_DICT"
     OUTPUT_LAYER_PARAMETER_NAME = "OUTPUT_LAYER_PARAMETER_NAME"
+    RUN_IN_PARALLEL = "RUN_IN_PARALLEL"
     OUTPUT = "OUTPUT"
 
     def __init__(self):
@@ -101,6 +111,13 @@ class BatchRunAlgorithm(QgsProcessingAlgorithm):
                 optional=True,
             )
         )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.RUN_IN_PARALLEL,
+                self.tr("Run each layer in parallel"),
+                defaultValue=False,
+            )
+        )
         self.addParameter(
             QgsProcessingParameterFeatureSink(self.OUTPUT, self.tr("Batch run output"))
         )
@@ -134,43 +151,72 @@ class BatchRunAlgorithm(QgsProcessingAlgorithm):
             return {"OUTPUT": flag_id}
         layerList = AlgRunner().runStringCsvToLayerList(layerCsv, context)
         nSteps = len(layerList)
-        multiStepFeedback = QgsProcessingMultiStepFeedback(nSteps, feedback)
+        runInParallel = self.parameterAsBool(parameters, self.RUN_IN_PARALLEL, context)
+        layerDict = dict()
         for idx, layer_id in enumerate(layerList):
             layer = QgsProcessingUtils.mapLayerFromString(layer_id, context)
-            layerName = layer.name()
-            multiStepFeedback.setCurrentStep(idx)
-            multiStepFeedback.pushInfo(
-                self.tr(
-                    "Step {idx}/{total}: Running algorithm {algName} on {layerName}"
-                ).format(idx=idx, total=nSteps, algName=algName, layerName=layerName)
-            )
             if layer is None:
-                multiStepFeedback.pushInfo(
+                feedback.pushInfo(
                     self.tr("Layer {layerName} not found. Skipping step.").format(
-                        layerName=layerName
+                        layerName=layer_id
                     )
                 )
                 continue
-
+            layerDict[idx] = layer
+        if runInParallel:
+            runInParallel = self.canRunInParallel(
+                algName, algParameterDict, layerDict.values(), feedback
+            )
+        multiStepFeedback = QgsProcessingMultiStepFeedback(nSteps, feedback)
+        layerRunList = []
+        for idx, layer in layerDict.items():
             currentDict = dict(algParameterDict)  # copy of the dict
-            currentDict[inputKey] = layerName
-            output = self.runProcessingAlg(
-                algName,
-                outputKey,
-                currentDict,
-                context=context,
-                feedback=multiStepFeedback,
+            # parallel runs get a clone of the input, which reads the same
+            # data source with the same feature ids, so no thread uses a layer
+            # that the project may change
+            currentDict[inputKey] = layer.clone() if runInParallel else layer.name()
+            layerRunList.append((idx, layer.name(), currentDict))
+        resultList = (
+            self.runInParallel(
+                algName, outputKey, layerRunList, context, multiStepFeedback
             )
-            outputLyr = (
-                QgsProcessingUtils.mapLayerFromString(output, context)
-                if isinstance(output, str)
-                else output
+            if runInParallel
+            else self.runSequentially(
+                algName, outputKey, layerRunList, context, multiStepFeedback
+            )
+        )
+        # flags are merged in the order of the input list, whatever the order
+        # the runs finished
+        canceledList = []
+        for idx, layerName, outputLyr, elapsed, error, canceled in sorted(
+            resultList, key=lambda x: x[0]
+        ):
+            if canceled:
+                canceledList.append(layerName)
+                continue
+            if error is not None:
+                feedback.reportError(
+                    self.tr(
+                        "Algorithm {algName} failed on {layerName}: {error}"
+                    ).format(algName=algName, layerName=layerName, error=error)
+                )
+                continue
+            feedback.pushInfo(
+                self.tr("{layerName}: {elapsed:.2f} s").format(
+                    layerName=layerName, elapsed=elapsed
+                )
             )
             if outputLyr is None:
                 continue
             if self.flagSink is None:
                 self.prepareFlagSink(parameters, outputLyr, context)
             self.flagFeatures(outputLyr, algName, layerName, context)
+        if canceledList:
+            feedback.pushInfo(
+                self.tr("Canceled before finishing: {layerNames}").format(
+                    layerNames=", ".join(canceledList)
+                )
+            )
         if self.flag_id is None:
             _, self.flag_id = self.parameterAsSink(
                 parameters,
@@ -182,6 +228,164 @@ class BatchRunAlgorithm(QgsProcessingAlgorithm):
             )
         return {self.OUTPUT: self.flag_id}
 
+    def canRunInParallel(self, algName, algParameterDict, layerList, feedback):
+        """
+        Checks if the runs can be made on clones of the input layers, on other
+        threads. Clones do not keep the selection nor the edit buffer of the
+        input layers, clones of memory layers are empty and layers edited in
+        place would be edited concurrently, so those runs are sequential.
+        """
+        alg = QgsApplication.processingRegistry().algorithmById(algName)
+        reason = None
+        if alg is None:
+            reason = self.tr("Algorithm {algName} was not found.")
+        elif alg.flags() & QgsProcessingAlgorithm.FlagNoThreading:
+            reason = self.tr("Algorithm {algName} is not thread safe.")
+        elif AlgRunner().inPlaceAlgorithms(alg):
+            reason = self.tr("Algorithm {algName} edits layers in place.")
+        elif algParameterDict.get("SELECTED"):
+            reason = self.tr("Only selected features are processed.")
+        elif any(
+            layer.providerType() == "memory" or layer.isEditable()
+            for layer in layerList
+        ):
+            reason = self.tr("Memory layers or layers in edition are processed.")
+        if reason is None:
+            return True
+        feedback.pushInfo(
+            "{0} {1}".format(
+                reason.format(algName=algName),
+                self.tr("Running layers sequentially."),
+            )
+        )
+        return False
+
+    def runSequentially(self, algName, outputKey, layerRunList, context, feedback):
+        """
+        Runs the algorithm on each layer, one after the other. Returns a list
+        of (idx, layerName, outputLyr, elapsed, error, canceled).
+        """
+        nSteps = len(layerRunList)
+        resultList = []
+        for current, (idx, layerName, currentDict) in enumerate(layerRunList):
+            if feedback.isCanceled():
+                resultList.append((idx, layerName, None, 0, None, True))
+                continue
+            feedback.setCurrentStep(current)
+            feedback.pushInfo(
+                self.tr(
+                    "Step {idx}/{total}: Running algorithm {algName} on {layerName}"
+                ).format(idx=idx, total=nSteps, algName=algName, layerName=layerName)
+            )
+            start = time.perf_counter()
+            output = self.runProcessingAlg(
+                algName,
+                outputKey,
+                currentDict,
+                context=context,
+                feedback=feedback,
+            )
+            outputLyr = (
+                QgsProcessingUtils.mapLayerFromString(output, context)
+                if isinstance(output, str)
+                else output
+            )
+            resultList.append(
+                (
+                    idx,
+                    layerName,
+                    outputLyr,
+                    time.perf_counter() - start,
+                    None,
+                    feedback.isCanceled(),
+                )
+            )
+        return resultList
+
+    def runInParallel(self, algName, outputKey, layerRunList, context, feedback):
+        """
+        Runs the algorithm on each layer on its own QgsProcessingContext and
+        QgsProcessingFeedback in a bounded thread pool. Each run reads its own
+        clone of the input layer. Failures are returned instead of raised, so
+        one layer does not abort the others, and canceled runs are returned
+        apart from failures. Returns a list of (idx, layerName, outputLyr,
+        elapsed, error, canceled).
+        """
+        nSteps = len(layerRunList)
+        localFeedbackDict = {idx: QgsProcessingFeedback() for idx, _, _ in layerRunList}
+
+        def compute(idx, layerName, currentDict):
+            localFeedback = localFeedbackDict[idx]
+            if localFeedback.isCanceled():
+                return idx, layerName, None, 0, None, True
+            localContext = QgsProcessingContext()
+            localContext.setProject(context.project())
+            start = time.perf_counter()
+            try:
+                output = self.runProcessingAlg(
+                    algName,
+                    outputKey,
+                    currentDict,
+                    context=localContext,
+                    feedback=localFeedback,
+                )
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                if localFeedback.isCanceled():
+                    return idx, layerName, None, elapsed, None, True
+                return idx, layerName, None, elapsed, str(e), False
+            if localFeedback.isCanceled():
+                return idx, layerName, None, time.perf_counter() - start, None, True
+            outputLyr = (
+                QgsProcessingUtils.mapLayerFromString(output, localContext)
+                if isinstance(output, str)
+                else output
+            )
+            if outputLyr is not None and isinstance(output, str):
+                # the output is owned by the local context, which is
+                # discarded when the thread finishes
+                outputLyr = outputLyr.materialize(QgsFeatureRequest())
+            return idx, layerName, outputLyr, time.perf_counter() - start, None, False
+
+        pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, os.cpu_count() - 1)
+        )
+        futures = set()
+        feedback.pushInfo(
+            self.tr("Submitting {total} runs of {algName} to thread pool...").format(
+                total=nSteps, algName=algName
+            )
+        )
+        futureDict = dict()
+        for idx, layerName, currentDict in layerRunList:
+            futureDict[pool.submit(compute, idx, layerName, currentDict)] = (
+                idx,
+                layerName,
+            )
+        resultDict = dict()
+        for current, future in enumerate(concurrent.futures.as_completed(futureDict)):
+            if feedback.isCanceled():
+                for localFeedback in localFeedbackDict.values():
+                    localFeedback.cancel()
+                break
+            feedback.setCurrentStep(current)
+            resultDict[future] = future.result()
+            feedback.pushInfo(
+                self.tr("Run {current}/{total} is done.").format(
+                    current=current + 1, total=nSteps
+                )
+            )
+        # waits for the runs already started, which stop on the cancel request
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in futureDict:
+            if future not in resultDict and future.done() and not future.cancelled():
+                resultDict[future] = future.result()
+        # runs that were not started before the cancel request
+        return [
+            resultDict.get(future, (idx, layerName, None, 0, None, True))
+            for future, (idx, layerName) in futureDict.items()
+        ]
+
     def loadAlgorithmParametersDict(self, parameters, context, feedback):
         rules_text = self.parameterAsString(parameters, self.PARAMETER_DICT, context)
         feedback.pushInfo(rules_text)
@@ -148,14 +148,12 @@ class CreateFramesWithConstraintAlgorithm(QgsProcessingAlgorithm):
         (output_sink, output_sink_id) = self.parameterAsSink(
             parameters, self.OUTPUT, context, fields, QgsWkbTypes.Polygon, crs
         )
-        featureList = []
         coordinateTransformer = QgsCoordinateTransform(
             QgsCoordinateReferenceSystem(crs.geographicCrsAuthId()),
             crs,
             QgsProject.instance(),
         )
-        featureHandler.getSystematicGridFeaturesWithConstraint(
-            featureList,
+        for feat in featureHandler.iterateSystematicGridFeaturesWithConstraint(
             inputLyr,
             stopScale,
             coordinateTransformer,
@@ -163,13 +161,8 @@ class CreateFramesWithConstraintAlgorithm(QgsProcessingAlgorithm):
             xSubdivisions=xSubdivisions,
             ySubdivisions=ySubdivisions,
             feedback=feedback,
-        )
-        list(
-            map(
-                lambda x: output_sink.addFeature(x, QgsFeatureSink.FastInsert),
-                featureList,
-            )
-        )
+        ):
+            output_sink.addFeature(feat, QgsFeatureSink.FastInsert)
 
         return {"OUTPUT": output_sink_id}
 
@@ -22,11 +22,9 @@
  *                                                                         *
  ***************************************************************************/
 """
-import math
-import functools
 from ...algRunner import AlgRunner
 import processing
-from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtCore import QCoreApplication, QVariant
 from qgis.core import (
     QgsProcessing,
     QgsFeatureSink,
@@ -34,6 +32,8 @@ from qgis.core import (
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterFeatureSink,
     QgsFeature,
+    QgsField,
+    QgsFields,
     QgsDataSourceUri,
     QgsProcessingOutputVectorLayer,
     QgsProcessingParameterVectorLayer,
@@ -52,6 +52,12 @@ from qgis.core import (
     QgsProcessingException,
     QgsFeatureRequest,
     QgsRectangle,
+    QgsProcessingOutputNumber,
+    QgsProcessingOutputString,
+)
+
+from DsgTools.core.GeometricTools.positionalAccuracyEngine import (
+    PositionalAccuracyEngine,
 )
 
 
@@ -59,7 +65,13 @@ class PecCalculatorAlgorithm(QgsProcessingAlgorithm):
     INPUT = "INPUT"
     REFERENCE = "REFERENCE"
     TOLERANCE = "TOLERANCE"
-    # OUTPUT = 'OUTPUT'
+    SCALE = "SCALE"
+    SAMPLE_DISTANCE = "SAMPLE_DISTANCE"
+    OUTPUT = "OUTPUT"
+    MEAN = "MEAN"
+    RMS = "RMS"
+    PERCENTILE = "PERCENTILE"
+    PEC_CLASS = "PEC_CLASS"
 
     def initAlgorithm(self, config):
         """
@@ -67,14 +79,16 @@ class PecCalculatorAlgorithm(QgsProcessingAlgorithm):
         """
         self.addParameter(
             QgsProcessingParameterVectorLayer(
-                self.INPUT, self.tr("Input layer"), [QgsProcessing.TypeVectorPoint]
+                self.INPUT,
+                self.tr("Input layer"),
+                [QgsProcessing.TypeVectorAnyGeometry],
             )
         )
         self.addParameter(
             QgsProcessingParameterVectorLayer(
                 self.REFERENCE,
                 self.tr("Reference layer"),
-                [QgsProcessing.TypeVectorPoint],
+                [QgsProcessing.TypeVectorAnyGeometry],
             )
         )
         self.addParameter(
@@ -86,6 +100,37 @@ class PecCalculatorAlgorithm(QgsProcessingAlgorithm):
                 defaultValue=2,
             )
         )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SCALE,
+                self.tr("Scale denominator"),
+                minValue=1,
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=25000,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SAMPLE_DISTANCE,
+                self.tr(
+                    "Densification distance of lines and polygons (0 uses half of the max distance)"
+                ),
+                minValue=0,
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT, self.tr("Residuals"), optional=True
+            )
+        )
+        self.addOutput(QgsProcessingOutputNumber(self.MEAN, self.tr("Mean")))
+        self.addOutput(QgsProcessingOutputNumber(self.RMS, self.tr("RMS")))
+        self.addOutput(
+            QgsProcessingOutputNumber(self.PERCENTILE, self.tr("Percentile 90"))
+        )
+        self.addOutput(QgsProcessingOutputString(self.PEC_CLASS, self.tr("PEC class")))
 
     def processAlgorithm(self, parameters, context, feedback):
         """
@@ -94,80 +139,90 @@ class PecCalculatorAlgorithm(QgsProcessingAlgorithm):
         inputLyr = self.parameterAsVectorLayer(parameters, self.INPUT, context)
         referenceLyr = self.parameterAsVectorLayer(parameters, self.REFERENCE, context)
         tol = self.parameterAsDouble(parameters, self.TOLERANCE, context)
-        distanceDict = dict()
-        featList = [i for i in inputLyr.getFeatures()]
-        step = 100 / len(featList) if featList else 0
-        for current, feat in enumerate(featList):
-            if feedback.isCanceled():
+        scale = self.parameterAsInt(parameters, self.SCALE, context)
+        sampleDistance = self.parameterAsDouble(
+            parameters, self.SAMPLE_DISTANCE, context
+        )
+        (sink, sinkId) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            self.getResidualFields(),
+            inputLyr.wkbType(),
+            inputLyr.sourceCrs(),
+        )
+        multiStepFeedback = QgsProcessingMultiStepFeedback(3, feedback)
+        multiStepFeedback.setCurrentStep(0)
+        multiStepFeedback.pushInfo(self.tr("Loading reference coordinates"))
+        engine = PositionalAccuracyEngine(tol, sampleDistance=sampleDistance)
+        request = QgsFeatureRequest().setNoAttributes()
+        engine.addReferenceFeatures(
+            referenceLyr.getFeatures(request), feedback=multiStepFeedback
+        )
+        engine.build()
+        multiStepFeedback.setCurrentStep(1)
+        multiStepFeedback.pushInfo(self.tr("Computing residuals"))
+        resultList = engine.evaluateFeatures(
+            (
+                feat
+                for feat in inputLyr.getFeatures(request)
+                if feat.geometry().isGeosValid()
+            ),
+            feedback=multiStepFeedback,
+        )
+        multiStepFeedback.setCurrentStep(2)
+        size = 100 / len(resultList) if resultList else 0
+        residualList = []
+        for current, (feat, residual, maxResidual, nSamples, nMatched) in enumerate(
+            resultList
+        ):
+            if multiStepFeedback.isCanceled():
                 break
-            if not feat.geometry().isGeosValid():
-                continue
-            id = feat.id()
-            geom = feat.geometry().asGeometryCollection()[0].asPoint()
-            x = geom.x()
-            y = geom.y()
-            bbox = QgsRectangle(x - tol, y - tol, x + tol, y + tol)
-            request = QgsFeatureRequest()
-            request.setFilterRect(bbox)
-            minDistance = 0
-            candidateId = None
-            for candidateFeat in referenceLyr.getFeatures(request):
-                dist = feat.geometry().distance(candidateFeat.geometry())
-                if candidateId is None:
-                    minDistance = dist
-                    candidateId = candidateFeat.id()
-                    continue
-                elif dist < minDistance:
-                    minDistance = dist
-                    candidateId = candidateFeat.id()
-            if candidateId is not None:
-                distanceDict[id] = {
-                    "minDistance": minDistance,
-                    "candidateId": candidateId,
-                }
-            feedback.setProgress(current * step)
-
-        distanceList = [i["minDistance"] for i in distanceDict.values()]
-        n = len(distanceList)
-        distanceSquared = [i["minDistance"] ** 2 for i in distanceDict.values()]
-        rms = math.sqrt(sum(distanceSquared) / n)
-        percFunc = functools.partial(self.percentile, frequency=0.9)
-        perc = percFunc(distanceList)
-        mean = sum(distanceList) / n
-        feedback.pushInfo("MEAN: {mean}".format(mean=mean))
-        feedback.pushInfo("RMS: {rms}".format(rms=rms))
-        feedback.pushInfo("PERC: {perc}".format(perc=perc))
-
-        return {}
-
-    def percentile(self, N, frequency, key=lambda x: x):
-        """
-        Find the percentile of a list of values.
-
-        @parameter N - is a list of values. Note N MUST BE already sorted.
-        @parameter percent - a float value from 0.0 to 1.0.
-        @parameter key - optional key function to compute value from each element of N.
+            if residual is not None:
+                residualList.append(residual)
+            if sink is not None:
+                newFeat = QgsFeature(self.getResidualFields())
+                newFeat.setGeometry(feat.geometry())
+                newFeat.setAttributes(
+                    [feat.id(), residual, maxResidual, nSamples, nMatched]
+                )
+                sink.addFeature(newFeat, QgsFeatureSink.FastInsert)
+            multiStepFeedback.setProgress(current * size)
+        statistics = PositionalAccuracyEngine.statistics(residualList, frequency=0.9)
+        if statistics is None:
+            feedback.pushInfo(
+                self.tr("No input feature was found within the max distance.")
+            )
+            return {self.OUTPUT: sinkId}
+        pecClass = PositionalAccuracyEngine.pecClass(
+            statistics["rms"], statistics["percentile"], scale
+        )
+        feedback.pushInfo("MEAN: {mean}".format(mean=statistics["mean"]))
+        feedback.pushInfo("RMS: {rms}".format(rms=statistics["rms"]))
+        feedback.pushInfo("PERC: {perc}".format(perc=statistics["percentile"]))
+        feedback.pushInfo(
+            self.tr("PEC class (1:{scale}): {pec_class}").format(
+                scale=scale,
+                pec_class=pecClass if pecClass is not None else self.tr("none"),
+            )
+        )
 
-        @return - the percentile of the values
-        """
-        if not N:
-            return None
-        sortedN = sorted(N)
-        if len(sortedN) < 1:
-            return 0 if not sortedN else 1
-        if frequency <= 0:
-            return sortedN[0]
-        elif frequency >= 1:
-            return sortedN[-1]
-        position = frequency * (len(sortedN) - 1)
+        return {
+            self.OUTPUT: sinkId,
+            self.MEAN: statistics["mean"],
+            self.RMS: statistics["rms"],
+            self.PERCENTILE: statistics["percentile"],
+            self.PEC_CLASS: pecClass,
+        }
 
-        bottom = math.floor(position)
-        top = math.ceil(position)
-        if top == bottom:
-            return sortedN[top]
-        return sortedN[bottom] * (1.0 + bottom - position) + sortedN[top] * (
-            1.0 + position - top
-        )
+    def getResidualFields(self):
+        fields = QgsFields()
+        fields.append(QgsField("featid", QVariant.Int))
+        fields.append(QgsField("residual", QVariant.Double))
+        fields.append(QgsField("max_residual", QVariant.Double))
+        fields.append(QgsField("samples", QVariant.Int))
+        fields.append(QgsField("matched_samples", QVariant.Int))
+        return fields
 
     def name(self):
         """
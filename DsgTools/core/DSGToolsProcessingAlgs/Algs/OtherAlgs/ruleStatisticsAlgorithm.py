@@ -41,6 +41,10 @@ from qgis.core import (
     QgsProject,
     QgsProcessingParameterEnum,
     QgsProcessingParameterFile,
+    QgsProcessingMultiStepFeedback,
+)
+from DsgTools.core.GeometricTools.expressionRuleEvaluator import (
+    ExpressionRuleEvaluator,
 )
 from operator import itemgetter
 from collections import defaultdict
@@ -93,19 +97,23 @@ class RuleStatisticsAlgorithm(QgsProcessingAlgorithm):
         input_data = self.load_rules_from_parameters(parameters)
         rows = self.buildRuleDict(input_data[0], inputLyrNamesWithSchemaList)
 
+        rowLayersList = [
+            [
+                lyr
+                for lyr in layers_list
+                if f"{lyr.dataProvider().uri().schema()}.{lyr.dataProvider().uri().table()}"
+                in row["layers"]
+            ]
+            for row in rows
+        ]
+        matchDict = self.evaluate_rules(rows, rowLayersList, feedback)
+
         result = {}
         for i, row in enumerate(rows):
             if not row["type"] in result:
                 result[row["type"]] = []
             failed = self.check_rules_on_layers(
-                row["attribute"],
-                row["rule"],
-                [
-                    lyr
-                    for lyr in layers_list
-                    if f"{lyr.dataProvider().uri().schema()}.{lyr.dataProvider().uri().table()}"
-                    in row["layers"]
-                ],
+                row["attribute"], row["rule"], rowLayersList[i], matchDict
             )
             result[row["type"]].append(failed)
         if not input_data:
@@ -177,16 +185,45 @@ class RuleStatisticsAlgorithm(QgsProcessingAlgorithm):
             != 0
         )
 
-    def check_rules_on_layers(self, attribute, rule, layers):
+    def evaluate_rules(self, rows, rowLayersList, feedback):
+        """
+        Evaluates, layer by layer, every rule that applies to each layer,
+        without changing the layer selections.
+        :return: (dict) {layer id: {rule: True if some feature matches it}}
+        """
+        layerDict, rulesByLayer = dict(), defaultdict(list)
+        for row, rowLayers in zip(rows, rowLayersList):
+            for lyr in rowLayers:
+                if not self.hasAttribute(row["attribute"], lyr):
+                    continue
+                layerDict[lyr.id()] = lyr
+                rulesByLayer[lyr.id()].append(row["rule"])
+        evaluator = ExpressionRuleEvaluator()
+        multiStepFeedback = QgsProcessingMultiStepFeedback(
+            max(1, len(rulesByLayer)), feedback
+        )
+        matchDict = dict()
+        for current, (lyrId, ruleList) in enumerate(rulesByLayer.items()):
+            if multiStepFeedback.isCanceled():
+                break
+            multiStepFeedback.setCurrentStep(current)
+            matchDict[lyrId] = evaluator.matchingRules(
+                layerDict[lyrId], ruleList, feedback=multiStepFeedback
+            )
+        return matchDict
+
+    def check_rules_on_layers(self, attribute, rule, layers, matchDict=None):
         failed = {}
+        evaluator = ExpressionRuleEvaluator() if matchDict is None else None
         for lyr in layers:
             hasAttribute = self.hasAttribute(attribute, lyr)
             if not hasAttribute:
                 continue
-            lyr.selectByExpression(rule)
-            count = lyr.selectedFeatureCount()
-            lyr.removeSelection()
-            failed[lyr.name()] = True if count != 0 else False
+            if matchDict is None:
+                layerMatchDict = evaluator.matchingRules(lyr, [rule])
+            else:
+                layerMatchDict = matchDict.get(lyr.id(), {})
+            failed[lyr.name()] = layerMatchDict.get(rule, False)
         return failed
 
     def format_output_result(self, result):
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-22
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+
+import processing
+from PyQt5.QtCore import QCoreApplication
+from qgis.core import (
+    QgsApplication,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsFields,
+    QgsGeometry,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingMultiStepFeedback,
+    QgsProcessingParameterDateTime,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterMultipleLayers,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingUtils,
+    QgsWkbTypes,
+)
+
+from DsgTools.core.DSGToolsProcessingAlgs.editHistoryTracker import (
+    editHistoryTracker,
+)
+
+
+class RunIncrementalValidationAlgorithm(QgsProcessingAlgorithm):
+    """
+    Runs an identification algorithm only on the region changed since the
+    last validation of the input layers by the same algorithm and parameters
+    (see EditHistoryTracker).
+
+    The changed region is grown by the search radius and the features that
+    intersect it are extracted, together with their neighbours, into
+    temporary layers that replace the input layers on the algorithm
+    parameters. Previous flags inside the changed region are replaced by the
+    new ones and the previous flags outside it are kept. When a layer has no
+    history yet, the algorithm runs on the whole layers.
+    """
+
+    INPUTLAYERS = "INPUTLAYERS"
+    ALG_NAME = "ALG_NAME"
+    PARAMETER_DICT = "PARAMETER_DICT"
+    OUTPUT_LAYER_PARAMETER_NAME = "OUTPUT_LAYER_PARAMETER_NAME"
+    PREVIOUS_FLAGS = "PREVIOUS_FLAGS"
+    SEARCH_RADIUS = "SEARCH_RADIUS"
+    AUDIT_FIELD = "AUDIT_FIELD"
+    SINCE = "SINCE"
+    OUTPUT = "OUTPUT"
+    layerParameterTypes = ("source", "vector", "layer", "multilayer")
+
+    def initAlgorithm(self, config=None):
+        """
+        Parameter setting.
+        """
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.INPUTLAYERS,
+                self.tr("Validated layers"),
+                QgsProcessing.TypeVectorAnyGeometry,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.ALG_NAME, self.tr("Name of the algorithm with provider")
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.PARAMETER_DICT,
+                description=self.tr("Json parameter dict"),
+                multiLine=True,
+                defaultValue="{}",
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.OUTPUT_LAYER_PARAMETER_NAME,
+                self.tr("Output layer parameter name"),
+                defaultValue="FLAGS",
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.PREVIOUS_FLAGS,
+                self.tr("Flags of the previous validation"),
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SEARCH_RADIUS,
+                self.tr("Search radius"),
+                minValue=0,
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=1.0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.AUDIT_FIELD,
+                self.tr("Audit column (e.g. updated_at)"),
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterDateTime(
+                self.SINCE,
+                self.tr("Changes on the audit column since"),
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT, self.tr("Incremental validation flags")
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Here is where the processing itself takes place.
+        """
+        layerList = self.parameterAsLayerList(parameters, self.INPUTLAYERS, context)
+        algName = self.parameterAsString(parameters, self.ALG_NAME, context)
+        algParameterDict = json.loads(
+            self.parameterAsString(parameters, self.PARAMETER_DICT, context)
+        )
+        outputKey = self.parameterAsString(
+            parameters, self.OUTPUT_LAYER_PARAMETER_NAME, context
+        )
+        previousFlags = self.parameterAsSource(parameters, self.PREVIOUS_FLAGS, context)
+        searchRadius = self.parameterAsDouble(parameters, self.SEARCH_RADIUS, context)
+        auditField = self.parameterAsString(parameters, self.AUDIT_FIELD, context)
+        since = (
+            self.parameterAsDateTime(parameters, self.SINCE, context)
+            if parameters.get(self.SINCE)
+            else None
+        )
+        if not layerList:
+            raise QgsProcessingException(self.tr("No validated layers were given."))
+        crs = layerList[0].crs()
+        editHistoryTracker.watchLayers(layerList)
+        checkKey = self.checkKey(algName, algParameterDict, outputKey)
+        markerDict = editHistoryTracker.validationMarkers(layerList)
+        multiStepFeedback = QgsProcessingMultiStepFeedback(4, feedback)
+        multiStepFeedback.setCurrentStep(0)
+        multiStepFeedback.pushInfo(self.tr("Computing the changed region..."))
+        region = editHistoryTracker.changedRegion(
+            layerList,
+            crs,
+            checkKey,
+            searchRadius=searchRadius,
+            auditField=auditField,
+            since=since,
+        )
+        if region is not None and region.isEmpty():
+            multiStepFeedback.pushInfo(
+                self.tr("No changes since the last validation. Keeping the flags.")
+            )
+            flagLyr = None
+        else:
+            if region is None:
+                multiStepFeedback.pushInfo(
+                    self.tr(
+                        "There is no edit history of the layers. Validating the whole layers."
+                    )
+                )
+            else:
+                multiStepFeedback.pushInfo(
+                    self.tr("Changed region area: {area:.2f}").format(
+                        area=region.area()
+                    )
+                )
+            multiStepFeedback.setCurrentStep(1)
+            regionParameterDict = (
+                algParameterDict
+                if region is None
+                else self.restrictParametersToRegion(
+                    algName,
+                    algParameterDict,
+                    layerList,
+                    region,
+                    searchRadius,
+                    context,
+                )
+            )
+            regionParameterDict.setdefault(outputKey, "memory:")
+            multiStepFeedback.setCurrentStep(2)
+            multiStepFeedback.pushInfo(
+                self.tr("Running algorithm {algName}...").format(algName=algName)
+            )
+            output = processing.run(
+                algName,
+                regionParameterDict,
+                context=context,
+                feedback=multiStepFeedback,
+            )[outputKey]
+            flagLyr = (
+                QgsProcessingUtils.mapLayerFromString(output, context)
+                if isinstance(output, str)
+                else output
+            )
+        multiStepFeedback.setCurrentStep(3)
+        fieldsSource = flagLyr if flagLyr is not None else previousFlags
+        (sink, dest_id) = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fieldsSource.fields() if fieldsSource is not None else QgsFields(),
+            fieldsSource.wkbType() if fieldsSource is not None else QgsWkbTypes.Point,
+            fieldsSource.sourceCrs() if fieldsSource is not None else crs,
+        )
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+        nKept, nNew = self.mergeFlags(
+            sink, previousFlags, flagLyr, region, fieldsSource, multiStepFeedback
+        )
+        multiStepFeedback.pushInfo(
+            self.tr("{kept} previous flags kept, {new} flags raised.").format(
+                kept=nKept, new=nNew
+            )
+        )
+        if not feedback.isCanceled():
+            editHistoryTracker.markValidated(checkKey, markerDict)
+        return {self.OUTPUT: dest_id}
+
+    def checkKey(self, algName, algParameterDict, outputKey):
+        """
+        Identifies a check by its algorithm and parameters, so each check
+        keeps its own validation history of the layers.
+        """
+        return json.dumps(
+            [algName, algParameterDict, outputKey], sort_keys=True, default=str
+        )
+
+    def restrictParametersToRegion(
+        self, algName, algParameterDict, layerList, region, searchRadius, context
+    ):
+        """
+        Returns a copy of the algorithm parameters where the references to
+        the validated layers (by name or id) are replaced by temporary layers
+        with the features that intersect the region, plus their neighbours.
+        Only layer parameters of algName are replaced, so fields, expressions
+        or other strings that happen to match a layer name are kept.
+        """
+        alg = QgsApplication.processingRegistry().algorithmById(algName)
+        if alg is None:
+            raise QgsProcessingException(
+                self.tr("Algorithm {algName} not found.").format(algName=algName)
+            )
+        regionLyrDict = dict()
+        for layer in layerList:
+            regionLyr = self.extractRegion(layer, region, searchRadius)
+            context.temporaryLayerStore().addMapLayer(regionLyr)
+            regionLyrDict[layer.name()] = regionLyr.id()
+            regionLyrDict[layer.id()] = regionLyr.id()
+
+        def replaceLayers(value):
+            if isinstance(value, list):
+                return [replaceLayers(i) for i in value]
+            if isinstance(value, str):
+                return regionLyrDict.get(value, value)
+            return value
+
+        parameterDict = dict(algParameterDict)
+        for definition in alg.parameterDefinitions():
+            if (
+                definition.name() in parameterDict
+                and not definition.isDestination()
+                and definition.type() in self.layerParameterTypes
+            ):
+                parameterDict[definition.name()] = replaceLayers(
+                    parameterDict[definition.name()]
+                )
+        return parameterDict
+
+    def extractRegion(self, layer, region, searchRadius):
+        """
+        Materializes the features of layer that intersect the region and the
+        features within the search radius of them, so the checks done on the
+        region see the whole neighbourhood of each changed feature.
+        """
+        fidSet = self.intersectingIds(layer, region)
+        neighbourhood = QgsGeometry.unaryUnion(
+            [
+                QgsGeometry.fromRect(feat.geometry().boundingBox())
+                for feat in layer.getFeatures(
+                    QgsFeatureRequest().setFilterFids(list(fidSet)).setNoAttributes()
+                )
+            ]
+        )
+        if not neighbourhood.isNull():
+            fidSet |= self.intersectingIds(layer, neighbourhood.buffer(searchRadius, 4))
+        regionLyr = layer.materialize(QgsFeatureRequest().setFilterFids(list(fidSet)))
+        regionLyr.setName(layer.name())
+        return regionLyr
+
+    def intersectingIds(self, layer, geom):
+        engine = QgsGeometry.createGeometryEngine(geom.constGet())
+        engine.prepareGeometry()
+        return {
+            feat.id()
+            for feat in layer.getFeatures(
+                QgsFeatureRequest().setFilterRect(geom.boundingBox()).setNoAttributes()
+            )
+            if feat.hasGeometry() and engine.intersects(feat.geometry().constGet())
+        }
+
+    def mergeFlags(self, sink, previousFlags, flagLyr, region, fieldsSource, feedback):
+        """
+        Writes the previous flags outside the region and the new flags inside
+        it (all of them when region is None, i.e. on a full validation).
+        """
+        engine = None
+        if region is not None and not region.isEmpty():
+            engine = QgsGeometry.createGeometryEngine(region.constGet())
+            engine.prepareGeometry()
+        nKept, nNew = 0, 0
+        if previousFlags is not None and region is not None:
+            for feat in previousFlags.getFeatures():
+                if feedback.isCanceled():
+                    break
+                if engine is not None and engine.intersects(feat.geometry().constGet()):
+                    continue
+                sink.addFeature(
+                    self.copyFeature(feat, fieldsSource), QgsFeatureSink.FastInsert
+                )
+                nKept += 1
+        if flagLyr is None:
+            return nKept, nNew
+        for feat in flagLyr.getFeatures():
+            if feedback.isCanceled():
+                break
+            if engine is not None and not engine.intersects(feat.geometry().constGet()):
+                continue
+            sink.addFeature(
+                self.copyFeature(feat, fieldsSource), QgsFeatureSink.FastInsert
+            )
+            nNew += 1
+        return nKept, nNew
+
+    def copyFeature(self, feat, fieldsSource):
+        newFeat = QgsFeature(fieldsSource.fields())
+        for field in fieldsSource.fields():
+            if feat.fields().indexOf(field.name()) >= 0:
+                newFeat[field.name()] = feat[field.name()]
+        newFeat.setGeometry(feat.geometry())
+        return newFeat
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return "runincrementalvalidationalgorithm"
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr("Run Incremental Validation")
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr("Other Algorithms")
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return "DSGTools: Other Algorithms"
+
+    def tr(self, string):
+        return QCoreApplication.translate("RunIncrementalValidationAlgorithm", string)
+
+    def createInstance(self):
+        return RunIncrementalValidationAlgorithm()
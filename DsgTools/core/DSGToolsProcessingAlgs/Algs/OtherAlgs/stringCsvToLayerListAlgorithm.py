@@ -61,7 +61,9 @@ class StringCsvToLayerListAlgorithm(QgsProcessingAlgorithm):
         if not len(layerNameList):
             return {self.OUTPUT: None}
         layerSet = set()
-        layerNamesToLoadSet = self.getLayerNameSetToLoad(layerNameList)
+        layerNamesToLoadSet = self.getLayerNameSetToLoad(
+            layerNameList, context.project() or QgsProject.instance()
+        )
         progressStep = 100 / len(layerNamesToLoadSet)
         for idx, layerName in enumerate(layerNamesToLoadSet):
             if feedback.isCanceled():
@@ -74,10 +76,10 @@ class StringCsvToLayerListAlgorithm(QgsProcessingAlgorithm):
 
         return {self.OUTPUT: list(layerSet)}
 
-    def getLayerNameSetToLoad(self, layerNameList):
+    def getLayerNameSetToLoad(self, layerNameList, project):
         loadedLayerNamesSet = set(
             l.name()
-            for l in QgsProject.instance().mapLayers().values()
+            for l in project.mapLayers().values()
             if l.type() == QgsMapLayer.VectorLayer
         )
         wildCardFilterList = [fi for fi in layerNameList if "*" in fi]
@@ -20,11 +20,15 @@
  *                                                                         *
  ***************************************************************************/
 """
+import concurrent.futures
 import json
+import os
 
 from PyQt5.QtCore import QCoreApplication
 
+from qgis.analysis import QgsGeometrySnapper
 from qgis.core import (
+    QgsFeatureRequest,
     QgsProject,
     QgsProcessingUtils,
     QgsProcessingContext,
@@ -33,6 +37,9 @@ from qgis.core import (
     QgsProcessingParameterBoolean,
     QgsProcessingMultiStepFeedback,
     QgsProcessingParameterDefinition,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource,
+    QgsWkbTypes,
 )
 
 from DsgTools.core.GeometricTools.layerHandler import LayerHandler
@@ -44,6 +51,7 @@ class HierarchicalSnapLayerOnLayerAndUpdateAlgorithm(ValidationAlgorithm):
     SELECTED = "SELECTED"
     SNAP_HIERARCHY = "SNAP_HIERARCHY"
     BEHAVIOR = "BEHAVIOR"
+    PARALLEL = "PARALLEL"
 
     def initAlgorithm(self, config):
         """
@@ -66,6 +74,14 @@ class HierarchicalSnapLayerOnLayerAndUpdateAlgorithm(ValidationAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.PARALLEL,
+                self.tr("Snap the layers of each hierarchy level concurrently"),
+                defaultValue=False,
+            )
+        )
+
         self.modes = [
             self.tr("Prefer aligning nodes, insert extra vertices where required"),
             self.tr("Prefer closest point, insert extra vertices where required"),
@@ -100,6 +116,12 @@ class HierarchicalSnapLayerOnLayerAndUpdateAlgorithm(ValidationAlgorithm):
         )
 
         onlySelected = self.parameterAsBool(parameters, self.SELECTED, context)
+        parallel = self.parameterAsBool(parameters, self.PARALLEL, context)
+        snapLayersToReference = (
+            self.snapLayersToReferenceConcurrently
+            if parallel
+            else self.snapLayersToReference
+        )
 
         nSteps = 0
         for item in snapDictList:
@@ -136,7 +158,7 @@ class HierarchicalSnapLayerOnLayerAndUpdateAlgorithm(ValidationAlgorithm):
             multiStepFeedback.pushInfo(
                 self.tr(f"Starting snapping with reference layer {referenceLayerName}.")
             )
-            self.snapLayersToReference(
+            snapLayersToReference(
                 refLyrName=referenceLayerName,
                 snapStructure=snapStructure,
                 lyrList=lyrList,
@@ -184,6 +206,101 @@ class HierarchicalSnapLayerOnLayerAndUpdateAlgorithm(ValidationAlgorithm):
             )
             snapStructure[lyrName]["tempLayer"] = snappedLyr
 
+    def snapLayersToReferenceConcurrently(
+        self, refLyrName, snapStructure, lyrList, tol, behavior, context, feedback
+    ):
+        """
+        Snaps the layers of lyrList to the reference layer on a thread pool.
+        The reference is frozen into a single indexed QgsGeometrySnapper
+        shared by the workers, the same snapper qgis:snapgeometries builds,
+        and the snapped layers are stored in the order of lyrList, so the
+        output matches snapLayersToReference.
+        """
+        nSteps = len(lyrList)
+        if nSteps == 0:
+            return
+        if refLyrName in lyrList or len(set(lyrList)) != nSteps:
+            # layers that depend on each other on this level
+            return self.snapLayersToReference(
+                refLyrName, snapStructure, lyrList, tol, behavior, context, feedback
+            )
+        multiStepFeedback = QgsProcessingMultiStepFeedback(2, feedback)
+        multiStepFeedback.setCurrentStep(0)
+        multiStepFeedback.pushInfo(
+            self.tr(
+                "Snapping {n} layers to {reference} with snap {snap} concurrently..."
+            ).format(n=nSteps, reference=refLyrName, snap=tol)
+        )
+        refLyr = self.layerFromContext(snapStructure[refLyrName]["tempLayer"], context)
+        # the snapper keeps a pointer to the source and reads it on each
+        # snapGeometry call, so the source must outlive the pool
+        refSource = QgsVectorLayerFeatureSource(refLyr)
+        snapper = QgsGeometrySnapper(refSource)
+        # feature sources are created here, as layers must not be used from
+        # other threads
+        inputDict = dict()
+        for lyrName in lyrList:
+            lyr = self.layerFromContext(snapStructure[lyrName]["tempLayer"], context)
+            inputDict[lyrName] = (lyr, QgsVectorLayerFeatureSource(lyr))
+
+        def compute(lyrName):
+            featList = []
+            for feat in inputDict[lyrName][1].getFeatures(QgsFeatureRequest()):
+                if multiStepFeedback.isCanceled():
+                    return lyrName, None
+                if feat.hasGeometry():
+                    feat.setGeometry(
+                        snapper.snapGeometry(feat.geometry(), tol, behavior)
+                    )
+                featList.append(feat)
+            return lyrName, featList
+
+        featListDict = dict()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, os.cpu_count() - 1)
+        ) as pool:
+            futures = [pool.submit(compute, lyrName) for lyrName in lyrList]
+            for current, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1
+            ):
+                lyrName, featList = future.result()
+                featListDict[lyrName] = featList
+                multiStepFeedback.setProgress(100 * current / nSteps)
+        if multiStepFeedback.isCanceled():
+            return
+        multiStepFeedback.setCurrentStep(1)
+        for current, lyrName in enumerate(lyrList):
+            snappedLyr = self.createSnappedLayer(
+                inputDict[lyrName][0], featListDict[lyrName]
+            )
+            context.temporaryLayerStore().addMapLayer(snappedLyr)
+            self.algRunner.runCreateSpatialIndex(
+                snappedLyr, context, is_child_algorithm=True
+            )
+            snapStructure[lyrName]["tempLayer"] = snappedLyr.id()
+            multiStepFeedback.setProgress(100 * (current + 1) / nSteps)
+
+    def layerFromContext(self, layer, context):
+        return (
+            QgsProcessingUtils.mapLayerFromString(layer, context)
+            if isinstance(layer, str)
+            else layer
+        )
+
+    def createSnappedLayer(self, inputLyr, featList):
+        snappedLyr = QgsVectorLayer(
+            f"{QgsWkbTypes.displayString(inputLyr.wkbType())}?crs={inputLyr.crs().authid()}",
+            "Snapped geometry",
+            "memory",
+        )
+        snappedLyr.setCrs(inputLyr.crs())
+        provider = snappedLyr.dataProvider()
+        provider.addAttributes(inputLyr.fields().toList())
+        snappedLyr.updateFields()
+        provider.addFeatures(featList)
+        snappedLyr.updateExtents()
+        return snappedLyr
+
     def buildSnapStructure(self, snapDictList, onlySelected, context, feedback):
         snapStructure = dict()
         nItems = len(snapDictList)
@@ -20,6 +20,7 @@
  *                                                                         *
  ***************************************************************************/
 """
+
 import concurrent.futures
 import os
 from collections import defaultdict
@@ -28,6 +29,7 @@ from typing import DefaultDict, Dict, Tuple, Union
 import processing
 from DsgTools.core.DSGToolsProcessingAlgs.algRunner import AlgRunner
 from DsgTools.core.GeometricTools.layerHandler import LayerHandler
+from DsgTools.core.GeometricTools.preparedGeometryIndex import PreparedGeometryIndex
 from PyQt5.QtCore import QCoreApplication
 from qgis.core import (
     QgsFeatureRequest,
@@ -171,9 +173,11 @@ class IdentifyDanglesAlgorithm(ValidationAlgorithm):
         multiStepFeedback.setCurrentStep(currentStep)
         multiStepFeedback.pushInfo(self.tr("Building local cache..."))
         inputLyr = algRunner.runAddAutoIncrementalField(
-            inputLyr=inputLyr
-            if not onlySelected
-            else QgsProcessingFeatureSourceDefinition(inputLyr.id(), True),
+            inputLyr=(
+                inputLyr
+                if not onlySelected
+                else QgsProcessingFeatureSourceDefinition(inputLyr.id(), True)
+            ),
             context=context,
             feedback=multiStepFeedback,
             fieldName="AUTO",
@@ -377,27 +381,35 @@ class IdentifyDanglesAlgorithm(ValidationAlgorithm):
         localTotal = 100 / nPoints
         pool = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() - 1)
         futures = set()
+        multiStepFeedback = (
+            QgsProcessingMultiStepFeedback(3, feedback)
+            if feedback is not None
+            else None
+        )
+        if multiStepFeedback is not None:
+            multiStepFeedback.setCurrentStep(0)
+        # neighbours are read once and kept with their prepared engines,
+        # instead of issuing one provider request per candidate point.
+        neighbourIndex = PreparedGeometryIndex(
+            inputLyr.getFeatures(), feedback=multiStepFeedback
+        )
+
+        def isRelatedToPoint(engine, pointGeom):
+            if ignoreDanglesOnUnsegmentedLines:
+                return engine.intersects(pointGeom) or engine.distance(pointGeom) < 1e-8
+            return engine.touches(pointGeom)
 
         def evaluate(point) -> Union[QgsPointXY, None]:
             qgisPoint = QgsGeometry.fromPointXY(point)
-            buffer = qgisPoint.buffer(searchRadius, -1)
-            bufferBB = buffer.boundingBox()
-            # search radius to narrow down candidates
-            request = QgsFeatureRequest().setFilterRect(bufferBB)
+            pointGeom = qgisPoint.constGet()
             bufferCount, intersectCount = 0, 0
-            point_relationship_lambda = (
-                lambda x: qgisPoint.intersects(x) or qgisPoint.distance(x) < 1e-8
-                if ignoreDanglesOnUnsegmentedLines
-                else qgisPoint.touches(x)
-            )
-            for feat in inputLyr.getFeatures(request):
-                geom = feat.geometry()
+            # distance within search radius replaces the buffer intersection test
+            for featId in neighbourIndex.idsWithinDistance(qgisPoint, searchRadius):
                 if feedback is not None and feedback.isCanceled():
                     return None
-                if geom.intersects(buffer):
-                    bufferCount += 1
-                    if point_relationship_lambda(geom):
-                        intersectCount += 1
+                bufferCount += 1
+                if isRelatedToPoint(neighbourIndex.engine(featId), pointGeom):
+                    intersectCount += 1
             if intersectCount > 1:
                 return None
             if inputIsBoundaryLayer and intersectCount == 1 and bufferCount == 1:
@@ -413,19 +425,16 @@ class IdentifyDanglesAlgorithm(ValidationAlgorithm):
                 return point
             return point if bufferCount != intersectCount else None
 
-        multiStepFeedback = (
-            QgsProcessingMultiStepFeedback(2, feedback)
-            if feedback is not None
-            else None
-        )
-        multiStepFeedback.setCurrentStep(0)
+        if multiStepFeedback is not None:
+            multiStepFeedback.setCurrentStep(1)
         for current, point in enumerate(pointSet):
             if multiStepFeedback is not None and multiStepFeedback.isCanceled():
                 break
             futures.add(pool.submit(evaluate, point))
             if multiStepFeedback is not None:
                 multiStepFeedback.setProgress(current * localTotal)
-        multiStepFeedback.setCurrentStep(1)
+        if multiStepFeedback is not None:
+            multiStepFeedback.setCurrentStep(2)
         for current, future in enumerate(concurrent.futures.as_completed(futures)):
             if multiStepFeedback is not None and multiStepFeedback.isCanceled():
                 break
@@ -445,8 +454,8 @@ class IdentifyDanglesAlgorithm(ValidationAlgorithm):
         ignoreNotSplit: bool = False,
     ) -> Tuple[set, Dict[QgsPointXY, dict]]:
         """
-        Builds buffer areas from each point and evaluates the intersecting lines.
-        If the number of candidates that intersect the buffer is different than the
+        Evaluates the filter lines within the search radius of each point.
+        If the number of candidates within the search radius is different than the
         number of intersections of the point with the neighbors, it is a dangle.
 
         Returns the set containing the dangles.
@@ -459,26 +468,22 @@ class IdentifyDanglesAlgorithm(ValidationAlgorithm):
         localTotal = 100 / nPoints
         multiStepFeedback = QgsProcessingMultiStepFeedback(4, feedback)
         multiStepFeedback.setCurrentStep(0)
-        spatialIdx, allFeatureDict = self.buildSpatialIndexAndIdDict(
-            filterLayer, feedback=multiStepFeedback
+        filterIndex = PreparedGeometryIndex(
+            filterLayer.getFeatures(), feedback=multiStepFeedback
         )
         multiStepFeedback.setCurrentStep(1)
 
         def evaluate(point: QgsPointXY) -> dict:
             candidateCount, bufferCount = 0, 0
             qgisPoint = QgsGeometry.fromPointXY(point)
-            # search radius to narrow down candidates
-            buffer = qgisPoint.buffer(searchRadius, -1)
-            bufferBB = buffer.boundingBox()
+            pointGeom = qgisPoint.constGet()
             # if there is only one feat in candidateIds, that means that it is not a dangle
-            for id in spatialIdx.intersects(bufferBB):
-                candidateGeom = allFeatureDict[id].geometry()
+            for id in filterIndex.idsWithinDistance(qgisPoint, searchRadius):
                 if multiStepFeedback.isCanceled():
                     return None
-                if buffer.intersects(candidateGeom):
-                    bufferCount += 1
-                    if qgisPoint.intersects(candidateGeom):
-                        candidateCount += 1
+                bufferCount += 1
+                if filterIndex.engine(id).intersects(pointGeom):
+                    candidateCount += 1
             return point, {"candidateCount": candidateCount, "bufferCount": bufferCount}
 
         futures = set()
@@ -501,19 +506,6 @@ class IdentifyDanglesAlgorithm(ValidationAlgorithm):
 
         return danglesWithFilterLayers, relatedDict
 
-    def buildSpatialIndexAndIdDict(self, inputLyr, feedback=None):
-        """
-        creates a spatial index for the centroid layer
-        """
-        spatialIdx = QgsSpatialIndex()
-        idDict = {}
-        for feat in inputLyr.getFeatures():
-            if feedback is not None and feedback.isCanceled():
-                break
-            spatialIdx.addFeature(feat)
-            idDict[feat.id()] = feat
-        return spatialIdx, idDict
-
     def name(self):
         """
         Returns the algorithm name, used for identifying the algorithm. This
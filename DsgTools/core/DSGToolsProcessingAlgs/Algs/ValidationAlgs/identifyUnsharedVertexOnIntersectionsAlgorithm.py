@@ -117,31 +117,17 @@ class IdentifyUnsharedVertexOnIntersectionsAlgorithm(ValidationAlgorithm):
             QgsWkbTypes.Point,
             context,
         )
-        # Compute the number of steps to display within the progress bar and
-        # get features from source
-        multiStepFeedback = QgsProcessingMultiStepFeedback(2, feedback)
-        multiStepFeedback.setCurrentStep(0)
-        usharedIntersectionSet = layerHandler.getUnsharedVertexOnIntersections(
-            inputPointLyrList,
+        flagText = self.tr("Unshared vertex between the intersections of input layers.")
+        for flagGeom in layerHandler.iterateUnsharedVertexOnIntersections(
             inputLineLyrList,
             inputPolygonLyrList,
             onlySelected=onlySelected,
-            feedback=multiStepFeedback,
-        )
-        multiStepFeedback.setCurrentStep(1)
-        self.raiseFeaturesFlags(usharedIntersectionSet, multiStepFeedback)
+            feedback=feedback,
+        ):
+            self.flagFeature(flagGeom, flagText)
 
         return {self.FLAGS: self.flag_id}
 
-    def raiseFeaturesFlags(self, usharedIntersectionSet, feedback):
-        size = 100 / len(usharedIntersectionSet) if usharedIntersectionSet else 0
-        flagText = self.tr("Unshared vertex between the intersections of input layers.")
-        for current, geomWkb in enumerate(usharedIntersectionSet):
-            if feedback.isCanceled():
-                break
-            self.flagFeature(geomWkb, flagText, fromWkb=True)
-            feedback.setProgress(size * current)
-
     def name(self):
         """
         Returns the algorithm name, used for identifying the algorithm. This
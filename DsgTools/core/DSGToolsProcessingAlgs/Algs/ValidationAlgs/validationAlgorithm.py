@@ -33,6 +33,8 @@ from qgis.core import (
     QgsProject,
 )
 
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
+
 
 class ValidationAlgorithm(QgsProcessingAlgorithm):
     """
@@ -54,7 +56,7 @@ class ValidationAlgorithm(QgsProcessingAlgorithm):
             else:
                 total = 100.0 / lyr.featureCount() if lyr.featureCount() else 0
                 iterator = lyr.getFeatures()
-            return iterator, total
+            return algProfiler.countFeatures(iterator), total
         except:
             return [], 0
 
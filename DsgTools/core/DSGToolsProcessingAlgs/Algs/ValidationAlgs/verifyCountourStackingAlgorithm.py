@@ -34,9 +34,12 @@ from qgis.core import (
     QgsProcessingFeatureSourceDefinition,
     QgsFeatureRequest,
     QgsProcessingParameterBoolean,
+    QgsGeometry,
 )
 from qgis import processing
 
+from DsgTools.core.GeometricTools.contourTree import ContourTree
+
 from .validationAlgorithm import ValidationAlgorithm
 
 
@@ -180,8 +183,10 @@ class VerifyCountourStackingAlgorihtm(ValidationAlgorithm):
         for feature1 in pr.getFeatures():
             AreaOfInterest = feature1.geometry().boundingBox()
             request = QgsFeatureRequest().setFilterRect(AreaOfInterest)
+            engine = QgsGeometry.createGeometryEngine(feature1.geometry().constGet())
+            engine.prepareGeometry()
             for feature2 in countourLayer.getFeatures(request):
-                if feature2.geometry().touches(feature1.geometry()):
+                if engine.touches(feature2.geometry().constGet()):
                     fv = {}
                     for field in feature2.fields():
                         fieldIdx = pr.fields().indexFromName(field.name())
@@ -206,32 +211,22 @@ class VerifyCountourStackingAlgorihtm(ValidationAlgorithm):
     ):
         isDep = 1
         isNotDep = 0
-        auxstep = 0
-        AUXCOUNT = 0
-        auxProgressStep = countourLayerPoly.featureCount()
-        for feature1 in countourLayerPoly.getFeatures():
-            AUXCOUNT += 1
-            auxcount = 0
-            auxstep += 1
+        # the smallest polygon that contains each polygon is its parent on
+        # the contour nesting tree
+        contourTree = ContourTree()
+        contourTree.addFeatures(countourLayerPoly.getFeatures())
+        contourTree.build()
+        auxProgressStep = len(contourTree)
+        for auxstep, (nodeId, parentId) in enumerate(contourTree.traverse()):
+            if feedback.isCanceled():
+                break
             feedback.setProgress(
-                step * (1 + (auxstep / auxProgressStep)) * progressStep
+                step * (1 + ((auxstep + 1) / auxProgressStep)) * progressStep
             )
-            toCompare = []
-            areaComp = []
-            skip = True
-            AreaOfInterest = feature1.geometry().boundingBox()
-            request = QgsFeatureRequest().setFilterRect(AreaOfInterest)
-            for feature2 in countourLayerPoly.getFeatures(request):
-                auxcount += 1
-                if str(feature1.geometry()) == str(feature2.geometry()):
-                    continue
-                if feature1.geometry().within(feature2.geometry()):
-                    toCompare.append(feature2)
-                    areaComp.append(feature2.geometry().area())
-                    skip = False
-            if skip:
+            if parentId is None:
                 continue
-            fToCompare = toCompare[areaComp.index(min(areaComp))]
+            feature1 = contourTree.data(nodeId)
+            fToCompare = contourTree.data(parentId)
             if fToCompare[isDepressionField] == isNotDep:
                 if feature1[isDepressionField] == isNotDep:
                     if not (
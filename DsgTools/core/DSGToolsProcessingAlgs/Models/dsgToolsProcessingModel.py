@@ -37,6 +37,11 @@ from qgis.PyQt.QtCore import pyqtSignal, QCoreApplication
 from processing.tools import dataobjects
 import processing
 
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
+from DsgTools.core.DSGToolsProcessingAlgs.Models.frameTiledModelRunner import (
+    FrameTiledModelRunner,
+)
+
 
 class DsgToolsProcessingModel(QgsTask):
     """
@@ -132,6 +137,8 @@ class DsgToolsProcessingModel(QgsTask):
             return self.tr("Input model type is not supported (or missing).")
         if "data" not in parameters["source"] or not parameters["source"]["data"]:
             return self.tr("Input model source was not identified.")
+        if parameters.get("tiling"):
+            return FrameTiledModelRunner.validateTiling(parameters["tiling"])
         return ""
 
     @staticmethod
@@ -323,6 +330,17 @@ class DsgToolsProcessingModel(QgsTask):
         """
         return self.flags()["enableLocalFlags"] if self.flags() else False
 
+    def tiling(self):
+        """
+        Frame tiling settings of the model, if it should run once per frame
+        (see FrameTiledModelRunner). E.g. {"frameLayer": "moldura", "margin":
+        100.0, "maxWorkers": 4}.
+        :return: (dict) tiling settings, empty if the model runs untiled.
+        """
+        if not self._param:
+            return dict()
+        return self._param.get("tiling") or dict()
+
     def childAlgorithms(self, model=None):
         """
         A list of all algorithms' names nested into the model.
@@ -407,13 +425,22 @@ class DsgToolsProcessingModel(QgsTask):
         model = self.model()
         if self.isCanceled():
             return {}
-        context = dataobjects.createContext(feedback=feedback)
-        out = processing.run(
-            model,
-            {param: "memory:" for param in self.modelParameters(model)},
-            feedback=feedback,
-            context=context,
-        )
+        tiling = self.tiling()
+        if tiling:
+            out = FrameTiledModelRunner(
+                self,
+                tiling["frameLayer"],
+                margin=tiling.get("margin"),
+                maxWorkers=tiling.get("maxWorkers"),
+            ).run(feedback=feedback)
+        else:
+            context = dataobjects.createContext(feedback=feedback)
+            out = processing.run(
+                model,
+                {param: "memory:" for param in self.modelParameters(model)},
+                feedback=feedback,
+                context=context,
+            )
         # not sure exactly when, but on 3.16 LTR output from model runs include
         # new items on it. these new items break our implementation =)
         # hence the popitems
@@ -463,10 +490,13 @@ class DsgToolsProcessingModel(QgsTask):
         :return: (bool) task success status.
         """
         start = time()
+        profile = dict()
         try:
             if not self.feedback.isCanceled() or not self.isCanceled():
                 self.output = {"result": dict(), "status": True, "errorMessage": ""}
-                for paramName, vl in self.runModel(self.feedback).items():
+                with algProfiler.profileRun(self.name(), self.feedback) as profile:
+                    out = self.runModel(self.feedback)
+                for paramName, vl in out.items():
                     baseName = paramName.rsplit(":", 1)[-1]
                     name = baseName
                     idx = 1
@@ -486,6 +516,8 @@ class DsgToolsProcessingModel(QgsTask):
                 ),
             }
         self.output["executionTime"] = time() - start
+        if profile:
+            self.output["profile"] = profile
         return self.output["status"]
 
     def hasFlags(self):
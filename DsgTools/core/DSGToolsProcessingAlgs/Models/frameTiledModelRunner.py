@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-23
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import concurrent.futures
+import os
+
+import processing
+from osgeo import ogr
+from processing.tools import dataobjects
+from qgis.core import (
+    Qgis,
+    QgsCoordinateTransform,
+    QgsDataSourceUri,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsMessageLog,
+    QgsProcessingContext,
+    QgsProcessingUtils,
+    QgsProject,
+    QgsProviderRegistry,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QCoreApplication
+
+from DsgTools.core.DSGToolsProcessingAlgs.algRunner import AlgRunner
+
+
+class FrameTiledModelRunner(object):
+    """
+    Runs a DSGTools processing model once per frame of a frame layer (e.g.
+    the output of CreateFrameAlgorithm) and merges the outputs.
+
+    Each tile gets its own QgsProject holding clones of the project vector
+    layers, with the same names, restricted by a subset string to the frame
+    extent grown by a margin, so the model finds its inputs by name as usual
+    and feature ids are the ones of the original layers. Tiles run on a
+    bounded thread pool, each one with its own processing context.
+
+    Only models that raise flags can be tiled: child algorithms that return
+    their input layers (corrections made in place, such as snapping or
+    cleaning) would edit the shared data sources concurrently and their
+    results could not be merged, so such models are run once, untiled, with
+    a logged notice.
+
+    An output feature is kept only by the tile whose frame contains its
+    anchor point (point on surface), so flags raised on the margins are not
+    repeated; identical flags raised along the seams are removed.
+    """
+
+    # settings accepted on a model's (or workflow's) "tiling" entry
+    TILING_KEYS = ("frameLayer", "margin", "maxWorkers")
+
+    def __init__(self, dsgToolsModel, frameLayer, margin=0.0, maxWorkers=None):
+        """
+        :param dsgToolsModel: (DsgToolsProcessingModel) model to be run.
+        :param frameLayer: (str) name of the frame layer on the project.
+        :param margin: (float) distance, in the unit of each layer crs, the
+            frame extent is grown by when the tile layers are extracted.
+        :param maxWorkers: (int) number of threads. Defaults to the number
+            of cpus minus one.
+        """
+        self.dsgToolsModel = dsgToolsModel
+        self.frameLayerName = frameLayer
+        self.margin = float(margin or 0.0)
+        self.maxWorkers = maxWorkers or max(1, os.cpu_count() - 1)
+        self.project = QgsProject.instance()
+
+    def tr(self, string):
+        return QCoreApplication.translate("FrameTiledModelRunner", string)
+
+    def frames(self):
+        """
+        Reads the frames from the frame layer.
+        :return: (tuple) frame crs and list of (frame id, QgsGeometry).
+        """
+        layerList = self.project.mapLayersByName(self.frameLayerName)
+        if not layerList:
+            raise Exception(
+                self.tr("Frame layer {name} was not found.").format(
+                    name=self.frameLayerName
+                )
+            )
+        frameLyr = layerList[0]
+        frameList = [
+            (feat.id(), QgsGeometry(feat.geometry()))
+            for feat in frameLyr.getFeatures()
+            if feat.hasGeometry()
+        ]
+        return frameLyr.crs(), frameList
+
+    @staticmethod
+    def validateTiling(tiling):
+        """
+        Validates the tiling settings of a model or a workflow.
+        :param tiling: (dict) tiling settings (see TILING_KEYS).
+        :return: (str) invalidation reason.
+        """
+        if not isinstance(tiling, dict):
+            return QCoreApplication.translate(
+                "FrameTiledModelRunner", "Tiling settings must be a map."
+            )
+        unknownKeys = sorted(set(tiling) - set(FrameTiledModelRunner.TILING_KEYS))
+        if unknownKeys:
+            return QCoreApplication.translate(
+                "FrameTiledModelRunner", "Unknown tiling settings: {keys}."
+            ).format(keys=", ".join(unknownKeys))
+        if not tiling.get("frameLayer"):
+            return QCoreApplication.translate(
+                "FrameTiledModelRunner", "Tiling settings do not define a frame layer."
+            )
+        return ""
+
+    def runUntiled(self, model, feedback=None):
+        """
+        Runs the model once on the current project, as an untiled model does.
+        :return: (dict) map of output name to output.
+        """
+        context = dataobjects.createContext(feedback=feedback)
+        out = processing.run(
+            model,
+            {param: "memory:" for param in self.dsgToolsModel.modelParameters(model)},
+            feedback=feedback,
+            context=context,
+        )
+        out.pop("CHILD_INPUTS", None)
+        out.pop("CHILD_RESULTS", None)
+        return out
+
+    def prepareTileProject(self, frameGeom, frameCrs):
+        """
+        Builds a project with clones of the project vector layers restricted
+        to the frame extent grown by the margin. Clones read the committed
+        data of the original layers, with their feature ids.
+        """
+        tileProject = QgsProject()
+        tileProject.setCrs(self.project.crs())
+        for lyr in self.project.mapLayers().values():
+            if not isinstance(lyr, QgsVectorLayer) or not lyr.isValid():
+                continue
+            if lyr.providerType() == "memory":
+                # clones of memory layers are empty, so the layer itself is
+                # shared (not owned) by the tile projects, unrestricted
+                tileProject.addMapLayer(lyr, False, False)
+                continue
+            tileLyr = lyr.clone()
+            tileLyr.setName(lyr.name())
+            if lyr.isSpatial():
+                transform = QgsCoordinateTransform(
+                    frameCrs, lyr.crs(), self.project.transformContext()
+                )
+                rect = transform.transformBoundingBox(frameGeom.boundingBox())
+                rect.grow(self.margin)
+                self.restrictToRect(tileLyr, rect)
+            tileProject.addMapLayer(tileLyr)
+        return tileProject
+
+    def restrictToRect(self, tileLyr, rect):
+        """
+        Adds a bounding box filter to the subset string of tileLyr. Layers
+        whose provider cannot filter by extent are left unrestricted, as the
+        outputs out of each frame are discarded when merging anyway.
+        """
+        condition = None
+        if tileLyr.providerType() == "postgres":
+            uri = QgsDataSourceUri(tileLyr.source())
+            condition = '"{geom}" && ST_MakeEnvelope({xmin}, {ymin}, {xmax}, {ymax}, {srid})'.format(
+                geom=uri.geometryColumn(),
+                xmin=repr(rect.xMinimum()),
+                ymin=repr(rect.yMinimum()),
+                xmax=repr(rect.xMaximum()),
+                ymax=repr(rect.yMaximum()),
+                srid=tileLyr.crs().postgisSrid(),
+            )
+        elif (
+            tileLyr.providerType() == "ogr"
+            and tileLyr.dataProvider().storageType() == "GPKG"
+        ):
+            geometryColumn = self.ogrGeometryColumn(tileLyr)
+            if geometryColumn:
+                condition = 'ST_MaxX("{geom}") >= {xmin} AND ST_MinX("{geom}") <= {xmax} AND ST_MaxY("{geom}") >= {ymin} AND ST_MinY("{geom}") <= {ymax}'.format(
+                    geom=geometryColumn,
+                    xmin=repr(rect.xMinimum()),
+                    ymin=repr(rect.yMinimum()),
+                    xmax=repr(rect.xMaximum()),
+                    ymax=repr(rect.yMaximum()),
+                )
+        if condition is None:
+            return
+        subset = tileLyr.subsetString()
+        tileLyr.setSubsetString(
+            "({0}) AND ({1})".format(subset, condition) if subset else condition
+        )
+
+    def ogrGeometryColumn(self, lyr):
+        parts = QgsProviderRegistry.instance().decodeUri("ogr", lyr.source())
+        dataSource = ogr.Open(parts.get("path") or "")
+        if dataSource is None:
+            return None
+        ogrLayer = (
+            dataSource.GetLayerByName(parts["layerName"])
+            if parts.get("layerName")
+            else dataSource.GetLayer(0)
+        )
+        return ogrLayer.GetGeometryColumn() if ogrLayer is not None else None
+
+    def runTile(self, model, parameterNames, tileProject):
+        """
+        Runs the model on the tile project. Outputs owned by the local
+        context are copied, as the context is discarded afterwards.
+        :return: (dict) map of output name to QgsVectorLayer.
+        """
+        context = QgsProcessingContext()
+        context.setProject(tileProject)
+        out = processing.run(
+            model,
+            {param: "memory:" for param in parameterNames},
+            context=context,
+        )
+        out.pop("CHILD_INPUTS", None)
+        out.pop("CHILD_RESULTS", None)
+        outputDict = dict()
+        for name, value in out.items():
+            lyr = (
+                QgsProcessingUtils.mapLayerFromString(value, context)
+                if isinstance(value, str)
+                else value
+            )
+            if isinstance(lyr, QgsVectorLayer) and lyr.isValid():
+                outputDict[name] = lyr.materialize(QgsFeatureRequest())
+        return outputDict
+
+    def run(self, feedback=None):
+        """
+        Runs the model on every frame and merges the outputs.
+        :param feedback: (QgsProcessingFeedback) progress tracking object.
+        :return: (dict) map of output name to merged QgsVectorLayer.
+        """
+        model = self.dsgToolsModel.model()
+        algList = AlgRunner().inPlaceAlgorithms(model)
+        if algList:
+            message = self.tr(
+                "Model {model} edits layers in place ({algs}) and cannot be tiled; running it untiled."
+            ).format(
+                model=self.dsgToolsModel.displayName(),
+                algs=", ".join(sorted(set(algList))),
+            )
+            QgsMessageLog.logMessage(message, "DSGTools Plugin", Qgis.Info)
+            if feedback is not None:
+                feedback.pushInfo(message)
+            return self.runUntiled(model, feedback=feedback)
+        frameCrs, frameList = self.frames()
+        nTiles = len(frameList)
+        if feedback is not None:
+            feedback.pushInfo(
+                self.tr("Running {model} on {n} frames using {w} threads...").format(
+                    model=self.dsgToolsModel.displayName(), n=nTiles, w=self.maxWorkers
+                )
+            )
+
+        def compute(frameId, model, parameterNames, tileProject):
+            if feedback is not None and feedback.isCanceled():
+                return frameId, None, None
+            try:
+                return frameId, self.runTile(model, parameterNames, tileProject), None
+            except Exception as e:
+                return frameId, None, str(e)
+
+        tileOutputDict, errorList = dict(), []
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers)
+        futures = set()
+        frameIterator = iter(frameList)
+
+        def submitNext():
+            # tile layers are extracted here, on the calling thread, and at
+            # most two tiles per worker are kept in memory
+            for frameId, frameGeom in frameIterator:
+                model = self.dsgToolsModel.model()
+                futures.add(
+                    pool.submit(
+                        compute,
+                        frameId,
+                        model,
+                        self.dsgToolsModel.modelParameters(model),
+                        self.prepareTileProject(frameGeom, frameCrs),
+                    )
+                )
+                return
+
+        for _ in range(2 * self.maxWorkers):
+            submitNext()
+        while futures:
+            done, _ = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                futures.remove(future)
+                frameId, outputDict, error = future.result()
+                if error is not None:
+                    errorList.append((frameId, error))
+                elif outputDict is not None:
+                    tileOutputDict[frameId] = outputDict
+                if feedback is not None:
+                    feedback.setProgress(
+                        100 * (len(tileOutputDict) + len(errorList)) / nTiles
+                    )
+                if feedback is None or not feedback.isCanceled():
+                    submitNext()
+        pool.shutdown(wait=True)
+        if errorList:
+            raise Exception(
+                "\n".join(
+                    self.tr("Frame {frameId}: {error}").format(
+                        frameId=frameId, error=error
+                    )
+                    for frameId, error in errorList
+                )
+            )
+        return self.mergeOutputs(dict(frameList), frameCrs, tileOutputDict)
+
+    def mergeOutputs(self, frameDict, frameCrs, tileOutputDict):
+        """
+        Merges the outputs of every tile into a single layer per output.
+        :param frameDict: (dict) map of frame id to frame geometry.
+        :param tileOutputDict: (dict) map of frame id to the tile outputs.
+        :return: (dict) map of output name to merged QgsVectorLayer.
+        """
+        mergedDict = dict()
+        seenKeyDict = dict()
+        for frameId in sorted(tileOutputDict):
+            for name, tileLyr in tileOutputDict[frameId].items():
+                if name not in mergedDict:
+                    mergedDict[name] = self.createMergedLayer(name, tileLyr)
+                    seenKeyDict[name] = set()
+                frameEngine = None
+                if tileLyr.isSpatial():
+                    frameGeom = QgsGeometry(frameDict[frameId])
+                    if tileLyr.crs() != frameCrs:
+                        frameGeom.transform(
+                            QgsCoordinateTransform(
+                                frameCrs,
+                                tileLyr.crs(),
+                                self.project.transformContext(),
+                            )
+                        )
+                    frameEngine = QgsGeometry.createGeometryEngine(frameGeom.constGet())
+                    frameEngine.prepareGeometry()
+                mergedLyr = mergedDict[name]
+                featList = []
+                for feat in tileLyr.getFeatures():
+                    if not self.isOwnedByFrame(feat, frameEngine, tileLyr):
+                        continue
+                    key = (
+                        feat.geometry().asWkb().data() if feat.hasGeometry() else None,
+                        tuple(str(v) for v in feat.attributes()),
+                    )
+                    if key in seenKeyDict[name]:
+                        continue
+                    seenKeyDict[name].add(key)
+                    newFeat = QgsFeature(mergedLyr.fields())
+                    newFeat.setAttributes(feat.attributes())
+                    newFeat.setGeometry(feat.geometry())
+                    featList.append(newFeat)
+                mergedLyr.dataProvider().addFeatures(featList)
+        for mergedLyr in mergedDict.values():
+            mergedLyr.updateExtents()
+        return mergedDict
+
+    def isOwnedByFrame(self, feat, frameEngine, tileLyr):
+        if not tileLyr.isSpatial() or frameEngine is None or not feat.hasGeometry():
+            return True
+        geom = feat.geometry()
+        anchor = (
+            geom
+            if geom.type() == QgsWkbTypes.PointGeometry and not geom.isMultipart()
+            else geom.pointOnSurface()
+        )
+        return frameEngine.intersects(anchor.constGet())
+
+    def createMergedLayer(self, name, tileLyr):
+        mergedLyr = QgsVectorLayer(
+            QgsWkbTypes.displayString(tileLyr.wkbType())
+            if tileLyr.isSpatial()
+            else "None",
+            name,
+            "memory",
+        )
+        mergedLyr.setCrs(tileLyr.crs())
+        mergedLyr.dataProvider().addAttributes(tileLyr.fields().toList())
+        mergedLyr.updateFields()
+        return mergedLyr
@@ -35,6 +35,9 @@ from qgis.PyQt.QtCore import QObject, pyqtSignal
 from DsgTools.core.DSGToolsProcessingAlgs.Models.dsgToolsProcessingModel import (
     DsgToolsProcessingModel,
 )
+from DsgTools.core.DSGToolsProcessingAlgs.Models.frameTiledModelRunner import (
+    FrameTiledModelRunner,
+)
 
 
 class QualityAssuranceWorkflow(QObject):
@@ -82,6 +85,10 @@ class QualityAssuranceWorkflow(QObject):
             parameters["displayName"] = self.tr("DSGTools Validation Workflow")
         if "models" not in parameters or not parameters["models"]:
             return self.tr("Workflow seems to have no models associated with it.")
+        if parameters.get("tiling"):
+            reason = FrameTiledModelRunner.validateTiling(parameters["tiling"])
+            if reason:
+                return reason
         for modelName, modelParam in parameters["models"].items():
             model = DsgToolsProcessingModel(modelParam, modelName)
             if not model.isValid():
@@ -150,6 +157,24 @@ class QualityAssuranceWorkflow(QObject):
         """
         return self.displayName()
 
+    def tiling(self):
+        """
+        Frame tiling settings applied to every model that does not set its
+        own (see DsgToolsProcessingModel.tiling).
+        :return: (dict) tiling settings, empty if models run untiled.
+        """
+        return self._param.get("tiling") or dict()
+
+    def modelParameters(self, modelParam):
+        """
+        Adds the workflow tiling settings to a model's parameters.
+        :param modelParam: (dict) map of attributes for a model.
+        :return: (dict) map of attributes for a model.
+        """
+        if not self.tiling() or "tiling" in modelParam:
+            return modelParam
+        return dict(modelParam, tiling=self.tiling())
+
     def models(self):
         """
         Model parameters defined to run in this workflow.
@@ -162,7 +187,9 @@ class QualityAssuranceWorkflow(QObject):
         self._multiStepFeedback.setCurrentStep(0)
         for modelName, modelParam in self._param["models"].items():
             model = DsgToolsProcessingModel(
-                modelParam, modelName, feedback=self._multiStepFeedback
+                self.modelParameters(modelParam),
+                modelName,
+                feedback=self._multiStepFeedback,
             )
             if not model.isValid():
                 models["invalid"][modelName] = model.validateParameters(modelParam)
@@ -182,7 +209,9 @@ class QualityAssuranceWorkflow(QObject):
         self._multiStepFeedback.setCurrentStep(0)
         for idx, (modelName, modelParam) in enumerate(self._param["models"].items()):
             model = DsgToolsProcessingModel(
-                modelParam, modelName, feedback=self._multiStepFeedback
+                self.modelParameters(modelParam),
+                modelName,
+                feedback=self._multiStepFeedback,
             )
             if model.isValid():
                 models[modelName] = model
@@ -201,7 +230,9 @@ class QualityAssuranceWorkflow(QObject):
         self._multiStepFeedback.setCurrentStep(0)
         for modelName, modelParam in self._param["models"].items():
             model = DsgToolsProcessingModel(
-                modelParam, modelName, feedback=self._multiStepFeedback
+                self.modelParameters(modelParam),
+                modelName,
+                feedback=self._multiStepFeedback,
             )
             if not model.isValid():
                 models[modelName] = model.validateParameters(modelParam)
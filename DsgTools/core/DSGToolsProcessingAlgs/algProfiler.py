@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-21
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from qgis.core import Qgis, QgsMessageLog, QgsProcessingUtils
+
+
+class ProfileRun(object):
+    """
+    Spans and counters recorded during one profiled run.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.spanDict = defaultdict(
+            lambda: {"count": 0, "total": 0.0, "self": 0.0, "max": 0.0}
+        )
+        self.counterDict = defaultdict(int)
+        self.startTime = time.perf_counter()
+
+    def addSpan(self, name, elapsed, childrenTime):
+        with self.lock:
+            span = self.spanDict[name]
+            span["count"] += 1
+            span["total"] += elapsed
+            span["self"] += elapsed - childrenTime
+            span["max"] = max(span["max"], elapsed)
+
+    def increment(self, counterName, value):
+        with self.lock:
+            self.counterDict[counterName] += value
+
+    def report(self):
+        """
+        Returns the spans and counters of the run. Spans are sorted by self
+        time.
+        """
+        with self.lock:
+            spanList = [
+                dict(name=spanName, **values)
+                for spanName, values in self.spanDict.items()
+            ]
+            counters = dict(self.counterDict)
+            wallTime = time.perf_counter() - self.startTime
+        spanList.sort(key=lambda x: x["self"], reverse=True)
+        return {
+            "name": self.name,
+            "wall_time": wallTime,
+            "spans": spanList,
+            "counters": counters,
+        }
+
+
+class AlgProfiler(object):
+    """
+    Opt-in instrumentation of DSGTools algorithms. When enabled, it records
+    timing spans (AlgRunner child calls, handler methods and feature loops)
+    and counters (features read, provider requests, geometry predicates).
+
+    It is disabled by default and every hook returns right away in that
+    case. It is enabled by the environment variable DSGTOOLS_PROFILING
+    ("1" for spans and counters, "cprofile" to also capture a cProfile of
+    the thread that starts each run) or by setEnabled. Reports are written
+    as JSON to DSGTOOLS_PROFILING_DIR (or the processing temp folder).
+
+    Each run keeps its own spans and counters (ProfileRun), so concurrent
+    runs do not reset each other. Spans and counters go to the run started
+    by the current thread or, on threads that did not start a run (e.g.
+    thread pool workers), to every active run.
+    """
+
+    FEATURES_READ = "features_read"
+    PROVIDER_REQUESTS = "provider_requests"
+    GEOMETRY_PREDICATES = "geometry_predicates"
+
+    def __init__(self):
+        mode = os.environ.get("DSGTOOLS_PROFILING", "").lower()
+        self.enabled = mode not in ("", "0", "false")
+        self.captureCProfile = mode == "cprofile"
+        self.outputDir = os.environ.get("DSGTOOLS_PROFILING_DIR")
+        self.lock = threading.RLock()
+        self.threadLocal = threading.local()
+        self.activeRuns = []
+
+    def setEnabled(self, enabled, captureCProfile=False, outputDir=None):
+        self.enabled = enabled
+        self.captureCProfile = enabled and captureCProfile
+        if outputDir is not None:
+            self.outputDir = outputDir
+
+    def currentRuns(self):
+        """
+        Returns the runs that record the spans and counters of the current
+        thread.
+        """
+        runStack = getattr(self.threadLocal, "runStack", None)
+        if runStack:
+            return runStack[-1:]
+        with self.lock:
+            return list(self.activeRuns)
+
+    def spanStack(self):
+        stack = getattr(self.threadLocal, "stack", None)
+        if stack is None:
+            stack = []
+            self.threadLocal.stack = stack
+        return stack
+
+    def enterSpan(self):
+        # each stack item holds the time spent on its child spans
+        self.spanStack().append([0.0])
+        return time.perf_counter()
+
+    def exitSpan(self, name, start):
+        elapsed = time.perf_counter() - start
+        stack = self.spanStack()
+        childrenTime = stack.pop()[0]
+        if stack:
+            stack[-1][0] += elapsed
+        for run in self.currentRuns():
+            run.addSpan(name, elapsed, childrenTime)
+
+    @contextmanager
+    def span(self, name):
+        """
+        Times the enclosed block as the span name.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = self.enterSpan()
+        try:
+            yield
+        finally:
+            self.exitSpan(name, start)
+
+    def increment(self, counterName, value=1):
+        if not self.enabled:
+            return
+        for run in self.currentRuns():
+            run.increment(counterName, value)
+
+    def countFeatures(self, featureIterable, name="feature loop"):
+        """
+        Wraps a feature iterator (one provider request), counting the
+        features read and timing the time spent fetching them.
+        """
+        if not self.enabled:
+            return featureIterable
+        return self.iterateCounting(featureIterable, name)
+
+    def iterateCounting(self, featureIterable, name):
+        self.increment(self.PROVIDER_REQUESTS)
+        iterator = iter(featureIterable)
+        nFeatures = 0
+        try:
+            while True:
+                start = self.enterSpan()
+                try:
+                    feat = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.exitSpan(name, start)
+                nFeatures += 1
+                yield feat
+        finally:
+            self.increment(self.FEATURES_READ, nFeatures)
+
+    def profileFunction(self, name, func):
+        """
+        Returns func wrapped in a span. Generator functions are timed only
+        while they produce their items, not while the caller consumes them.
+        """
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def generatorWrapper(*args, **kwargs):
+                generator = func(*args, **kwargs)
+                if not self.enabled:
+                    return generator
+                return self.iterateTimed(generator, name)
+
+            return generatorWrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = self.enterSpan()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exitSpan(name, start)
+
+        return wrapper
+
+    def iterateTimed(self, generator, name):
+        while True:
+            start = self.enterSpan()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                self.exitSpan(name, start)
+            yield item
+
+    def profileMethods(self, prefix=None, methodPrefixes=None):
+        """
+        Class decorator that wraps the public methods of the class in spans
+        named prefix.methodName.
+        :param prefix: (str) span prefix, the class name if None.
+        :param methodPrefixes: (tuple) only methods starting with one of
+            these prefixes are wrapped. All public methods if None.
+        """
+
+        def decorator(cls):
+            spanPrefix = prefix or cls.__name__
+            for attrName, attr in list(vars(cls).items()):
+                if attrName.startswith("_") or not inspect.isfunction(attr):
+                    continue
+                if methodPrefixes is not None and not attrName.startswith(
+                    methodPrefixes
+                ):
+                    continue
+                setattr(
+                    cls,
+                    attrName,
+                    self.profileFunction("{0}.{1}".format(spanPrefix, attrName), attr),
+                )
+            return cls
+
+        return decorator
+
+    @contextmanager
+    def profileRun(self, name, feedback=None):
+        """
+        Records a run in a new ProfileRun; the report is logged and written
+        on exit. Yields a dict that is filled with the report when the run
+        finishes (it stays empty when disabled).
+        """
+        reportDict = dict()
+        if not self.enabled:
+            yield reportDict
+            return
+        run = ProfileRun(name)
+        runStack = getattr(self.threadLocal, "runStack", None)
+        if runStack is None:
+            runStack = []
+            self.threadLocal.runStack = runStack
+        runStack.append(run)
+        with self.lock:
+            self.activeRuns.append(run)
+        profiler = cProfile.Profile() if self.captureCProfile else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield reportDict
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            runStack.pop()
+            with self.lock:
+                self.activeRuns.remove(run)
+            reportDict.update(run.report())
+            outputPath = self.reportPath(name)
+            if profiler is not None:
+                reportDict["cprofile"] = self.dumpCProfile(
+                    profiler, os.path.splitext(outputPath)[0] + ".prof"
+                )
+            self.writeReport(reportDict, outputPath)
+            self.logReport(reportDict, feedback=feedback)
+
+    def reportPath(self, name):
+        outputDir = self.outputDir or QgsProcessingUtils.tempFolder()
+        fileName = "".join(c if c.isalnum() else "_" for c in name or "run")
+        return os.path.join(
+            outputDir,
+            "{0}_{1}.json".format(fileName, time.strftime("%Y%m%d_%H%M%S")),
+        )
+
+    def dumpCProfile(self, profiler, path, limit=30):
+        profiler.dump_stats(path)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(
+            limit
+        )
+        return {"path": path, "top": stream.getvalue().splitlines()}
+
+    def writeReport(self, report, path):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+        report["path"] = path
+
+    def formatReport(self, report, limit=15):
+        lineList = [
+            "Profile of {0}: {1:.3f} s".format(report["name"], report["wall_time"])
+        ]
+        lineList += [
+            "{name}: {count} calls, {total:.3f} s total, {self:.3f} s self".format(
+                **span
+            )
+            for span in report["spans"][:limit]
+        ]
+        lineList += [
+            "{0}: {1}".format(counterName, value)
+            for counterName, value in sorted(report["counters"].items())
+        ]
+        if "path" in report:
+            lineList.append("Report written to {0}".format(report["path"]))
+        return "\n".join(lineList)
+
+    def logReport(self, report, feedback=None):
+        message = self.formatReport(report)
+        if feedback is not None:
+            feedback.pushInfo(message)
+        QgsMessageLog.logMessage(message, "DSGTools Plugin", Qgis.Info)
+
+
+algProfiler = AlgProfiler()
@@ -23,9 +23,21 @@
 import uuid
 
 import processing
-from qgis.core import Qgis, QgsProcessingUtils, QgsProcessingFeatureSourceDefinition
+from qgis.core import (
+    Qgis,
+    QgsProcessingFeatureSourceDefinition,
+    QgsProcessingModelAlgorithm,
+    QgsProcessingOutputMapLayer,
+    QgsProcessingOutputMultipleLayers,
+    QgsProcessingOutputVectorLayer,
+    QgsProcessingUtils,
+)
 
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
+from DsgTools.core.DSGToolsProcessingAlgs.algRunnerCache import algRunnerCache
 
+
+@algProfiler.profileMethods(methodPrefixes=("run",))
 class AlgRunner:
     (
         Break,
@@ -53,6 +65,76 @@ class AlgRunner:
         )
         return output, error
 
+    def runCachedAlgorithm(
+        self,
+        algName,
+        parameters,
+        context,
+        feedback=None,
+        is_child_algorithm=False,
+    ):
+        """
+        Runs a processing algorithm that outputs a single layer, reusing the
+        output of a previous call with the same unchanged input layer and
+        parameters when available (see AlgRunnerCache).
+        :param algName: (str) processing algorithm id.
+        :param parameters: (dict) algorithm parameters.
+        :param context: (QgsProcessingContext) processing context.
+        :param feedback: (QgsProcessingFeedback) QGIS object to keep track of progress/cancelling option.
+        :param is_child_algorithm: (bool) whether the output must be returned as a layer id.
+        :return: (QgsVectorLayer or str) output layer.
+        """
+        key = algRunnerCache.getKey(algName, parameters, context)
+        cachedOutput = algRunnerCache.get(
+            key, context, is_child_algorithm=is_child_algorithm
+        )
+        if cachedOutput is not None:
+            algRunnerCache.logStatistics(context)
+            return cachedOutput
+        output = processing.run(
+            algName,
+            parameters,
+            context=context,
+            feedback=feedback,
+            is_child_algorithm=is_child_algorithm,
+        )
+        algRunnerCache.insert(key, output["OUTPUT"], context)
+        if key is not None:
+            algRunnerCache.logStatistics(context)
+        return output["OUTPUT"]
+
+    def inPlaceAlgorithms(self, alg):
+        """
+        Lists the algorithms that return layers which are not created by
+        them, i.e. that edit their inputs in place. Models are checked
+        through their child algorithms, nested models included.
+        :param alg: (QgsProcessingAlgorithm) algorithm or model to be checked.
+        :return: (list-of-str) ids of those algorithms.
+        """
+        if isinstance(alg, QgsProcessingModelAlgorithm):
+            algList = []
+            for child in alg.childAlgorithms().values():
+                if child.algorithm() is not None:
+                    algList += self.inPlaceAlgorithms(child.algorithm())
+            return algList
+        destinationNames = {
+            param.name() for param in alg.destinationParameterDefinitions()
+        }
+        if any(
+            isinstance(
+                output,
+                (
+                    QgsProcessingOutputMapLayer,
+                    QgsProcessingOutputMultipleLayers,
+                    QgsProcessingOutputVectorLayer,
+                ),
+            )
+            and output.name() not in destinationNames
+            for output in alg.outputDefinitions()
+        ):
+            return [alg.id()]
+        return []
+
     def getGrassReturn(self, outputDict, context, returnError=False):
         lyr = QgsProcessingUtils.mapLayerFromString(outputDict["output"], context)
         if returnError:
@@ -552,10 +634,9 @@ class AlgRunner:
     def runBoundary(self, inputLayer, context, feedback=None, outputLyr=None):
         outputLyr = "memory:" if outputLyr is None else outputLyr
         parameters = {"INPUT": inputLayer, "OUTPUT": outputLyr}
-        output = processing.run(
-            "native:boundary", parameters, context=context, feedback=feedback
+        return self.runCachedAlgorithm(
+            "native:boundary", parameters, context, feedback=feedback
         )
-        return output["OUTPUT"]
 
     def runMultipartToSingleParts(
         self,
@@ -751,38 +832,35 @@ class AlgRunner:
     ):
         outputLyr = "memory:" if outputLyr is None else outputLyr
         parameters = {"INPUT": inputLyr, "OUTPUT": outputLyr}
-        output = processing.run(
+        return self.runCachedAlgorithm(
             "native:polygonstolines"
             if Qgis.QGIS_VERSION_INT >= 30600
             else "qgis:polygonstolines",
             parameters,
-            context=context,
+            context,
             feedback=feedback,
             is_child_algorithm=is_child_algorithm,
         )
-        return output["OUTPUT"]
 
     def runExtractVertices(self, inputLyr, context, feedback=None, outputLyr=None):
         outputLyr = "memory:" if outputLyr is None else outputLyr
         parameters = {"INPUT": inputLyr, "OUTPUT": outputLyr}
-        output = processing.run(
-            "native:extractvertices", parameters, context=context, feedback=feedback
+        return self.runCachedAlgorithm(
+            "native:extractvertices", parameters, context, feedback=feedback
         )
-        return output["OUTPUT"]
 
     def runExplodeLines(
         self, inputLyr, context, feedback=None, outputLyr=None, is_child_algorithm=False
     ):
         outputLyr = "memory:" if outputLyr is None else outputLyr
         parameters = {"INPUT": inputLyr, "OUTPUT": outputLyr}
-        output = processing.run(
+        return self.runCachedAlgorithm(
             "native:explodelines",
             parameters,
-            context=context,
+            context,
             feedback=feedback,
             is_child_algorithm=is_child_algorithm,
         )
-        return output["OUTPUT"]
 
     def runMergeVectorLayers(
         self, inputList, context, feedback=None, outputLyr=None, crs=None
@@ -869,10 +947,9 @@ class AlgRunner:
     ):
         outputLyr = "memory:" if outputLyr is None else outputLyr
         parameters = {"INPUT": inputLyr, "KEEP_FIELDS": keepFields, "OUTPUT": outputLyr}
-        output = processing.run(
-            "qgis:polygonize", parameters, context=context, feedback=feedback
+        return self.runCachedAlgorithm(
+            "qgis:polygonize", parameters, context, feedback=feedback
         )
-        return output["OUTPUT"]
 
     def runJoinAttributesByLocation(
         self,
@@ -988,6 +1065,9 @@ class AlgRunner:
     def runCreateSpatialIndex(
         self, inputLyr, context, feedback=None, is_child_algorithm=False
     ):
+        if algRunnerCache.isIndexed(inputLyr, context):
+            # layers restored from the cache are already indexed
+            return None
         processing.run(
             "native:createspatialindex",
             {"INPUT": inputLyr},
@@ -1037,7 +1117,7 @@ class AlgRunner:
         is_child_algorithm=False,
     ):
         outputLyr = "memory:" if outputLyr is None else outputLyr
-        output = processing.run(
+        return self.runCachedAlgorithm(
             "native:fieldcalculator",
             {
                 "INPUT": inputLyr,
@@ -1047,11 +1127,10 @@ class AlgRunner:
                 "FORMULA": expression,
                 "OUTPUT": outputLyr,
             },
-            context=context,
+            context,
             feedback=feedback,
             is_child_algorithm=is_child_algorithm,
         )
-        return output["OUTPUT"]
 
     def runStringCsvToLayerList(self, stringCSV, context, feedback=None):
         output = processing.run(
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-12
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsDataSourceUri,
+    QgsExpression,
+    QgsFeatureRequest,
+    QgsMapLayer,
+    QgsMessageLog,
+    QgsProcessingParameterExpression,
+    QgsProcessingUtils,
+    QgsProviderRegistry,
+    QgsVectorLayer,
+)
+
+
+class AlgRunnerCache(object):
+    """
+    Bounded LRU cache of the memory layers produced by AlgRunner pre-steps
+    (field calculator, boundaries, vertices, polygonize, etc).
+
+    Entries are keyed by the source layer (id, provider uri, subset string,
+    change token and commit stamp), the algorithm id and its parameters.
+    Only layers with no pending edits whose data source gives a change token
+    are cached: files (modification time and size, including the GeoPackage
+    write ahead log and the shapefile sidecar files) and PostGIS tables (the
+    insert, update and delete counters of the statistics collector and the
+    table file node, which change on writes made by any client). Calls with
+    expressions that use variables, other layers or non deterministic
+    functions are not cached.
+
+    Hit and miss statistics are logged once per processing context, after
+    its first cached call.
+    """
+
+    # functions whose result depends on other layers or on when they run
+    uncacheableFunctions = {
+        "aggregate",
+        "relation_aggregate",
+        "get_feature",
+        "get_feature_by_id",
+        "layer_property",
+        "decode_uri",
+        "now",
+        "rand",
+        "randf",
+        "uuid",
+        "$now",
+    }
+    layerParameterTypes = {"source", "vector", "layer", "raster", "multilayer"}
+
+    shapefileExtensions = (".dbf", ".shx")
+    maxLoggedContexts = 1024
+
+    def __init__(self, maxEntries=32, maxFeatures=5000000, maxIndexedLayers=1024):
+        self.maxEntries = maxEntries
+        self.maxFeatures = maxFeatures
+        self.maxIndexedLayers = maxIndexedLayers
+        self.entries = OrderedDict()
+        self.layerCommitStamp = dict()
+        self.indexedLayerIds = OrderedDict()
+        self.loggedContextIds = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.enabled = True
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.indexedLayerIds.clear()
+
+    def layerStamp(self, layer):
+        """
+        Returns a hashable stamp that changes whenever the layer data may
+        have changed, or None if the layer cannot be cached.
+        :param layer: (QgsVectorLayer) source layer.
+        :return: (tuple) layer stamp.
+        """
+        if not isinstance(layer, QgsVectorLayer) or not layer.isValid():
+            return None
+        if layer.providerType() == "memory" or layer.isModified():
+            return None
+        changeToken = self.changeToken(layer)
+        if changeToken is None:
+            return None
+        self.watchLayer(layer)
+        return (
+            layer.id(),
+            layer.dataProvider().dataSourceUri(),
+            layer.subsetString(),
+            changeToken,
+            self.layerCommitStamp.get(layer.id(), 0),
+        )
+
+    def changeToken(self, layer):
+        """
+        Returns a value that changes whenever the data source of layer is
+        changed, by this or any other client, or None when the provider
+        gives no such value.
+        """
+        if layer.providerType() == "postgres":
+            return self.postgisChangeToken(layer)
+        path = (
+            QgsProviderRegistry.instance()
+            .decodeUri(layer.providerType(), layer.dataProvider().dataSourceUri())
+            .get("path")
+        )
+        if not path or not os.path.isfile(path):
+            return None
+        # GeoPackage (SQLite) writes go to the -wal file until a checkpoint,
+        # and attribute edits of a shapefile only touch its .dbf
+        filePathList = [path, path + "-wal"]
+        if path.lower().endswith(".shp"):
+            filePathList += [
+                os.path.splitext(path)[0] + extension
+                for extension in self.shapefileExtensions
+            ]
+        return tuple(
+            (stat.st_mtime_ns, stat.st_size)
+            for stat in (
+                os.stat(filePath)
+                for filePath in filePathList
+                if os.path.isfile(filePath)
+            )
+        )
+
+    def postgisChangeToken(self, layer):
+        """
+        Returns the file node and the insert, update and delete counters of
+        the table of layer, read from the catalog and the statistics
+        collector, so the table is not scanned. The counters are published
+        by the collector shortly after each commit. Views and queries are not
+        cached.
+        """
+        uri = QgsDataSourceUri(layer.source())
+        if not uri.table() or uri.table().startswith("("):
+            return None
+        sql = """SELECT c.relfilenode, s.n_tup_ins, s.n_tup_upd, s.n_tup_del FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace JOIN pg_stat_user_tables s ON s.relid = c.oid WHERE n.nspname = '{schema}' AND c.relname = '{table}' AND c.relkind = 'r'""".format(
+            schema=uri.schema().replace("'", "''"),
+            table=uri.table().replace("'", "''"),
+        )
+        try:
+            rowList = (
+                QgsProviderRegistry.instance()
+                .providerMetadata("postgres")
+                .createConnection(layer.source(), {})
+                .executeSql(sql)
+            )
+        except Exception:
+            return None
+        return tuple(rowList[0]) if rowList else None
+
+    def watchLayer(self, layer):
+        if layer.id() in self.layerCommitStamp:
+            return
+        self.layerCommitStamp[layer.id()] = 0
+        layerId = layer.id()
+        layer.afterCommitChanges.connect(lambda: self.invalidateLayer(layerId))
+        layer.dataSourceChanged.connect(lambda: self.invalidateLayer(layerId))
+        layer.subsetStringChanged.connect(lambda: self.invalidateLayer(layerId))
+
+    def invalidateLayer(self, layerId):
+        with self.lock:
+            self.layerCommitStamp[layerId] = self.layerCommitStamp.get(layerId, 0) + 1
+            for key in [k for k in self.entries if k[1][0] == layerId]:
+                self.entries.pop(key)
+
+    def isCacheableExpression(self, expressionText):
+        """
+        Tells if an expression gives the same result on every run over the
+        same features: no variables, no other layers and no non
+        deterministic functions.
+        """
+        if "@" in expressionText:
+            return False
+        expression = QgsExpression(expressionText)
+        if expression.hasParserError():
+            return True
+        return not any(
+            name in self.uncacheableFunctions or name.startswith("overlay_")
+            for name in expression.referencedFunctions()
+        )
+
+    def getKey(
+        self, algName, parameters, context, inputKey="INPUT", outputKey="OUTPUT"
+    ):
+        """
+        Builds the cache key of an algorithm call. Returns None when the call
+        must not be cached (non memory output, selected features only input,
+        editable or temporary input, non hashable parameters, uncacheable
+        expressions or other layers without a change token).
+        """
+        if not self.enabled:
+            return None
+        if parameters.get(outputKey, "memory:") != "memory:":
+            return None
+        inputLyr = parameters.get(inputKey)
+        if isinstance(inputLyr, str):
+            inputLyr = QgsProcessingUtils.mapLayerFromString(inputLyr, context)
+        stamp = self.layerStamp(inputLyr)
+        if stamp is None:
+            return None
+        alg = QgsApplication.processingRegistry().algorithmById(algName)
+        parameterItems = []
+        for name, value in sorted(parameters.items()):
+            if name in (inputKey, outputKey):
+                continue
+            definition = alg.parameterDefinition(name) if alg is not None else None
+            if isinstance(value, str) and (
+                isinstance(definition, QgsProcessingParameterExpression)
+                or name in ("FORMULA", "EXPRESSION")
+            ):
+                if not self.isCacheableExpression(value):
+                    return None
+            elif (
+                isinstance(value, str)
+                and definition is not None
+                and definition.type() in self.layerParameterTypes
+            ):
+                value = QgsProcessingUtils.mapLayerFromString(value, context)
+            if isinstance(value, QgsMapLayer):
+                value = self.layerStamp(value)
+                if value is None:
+                    return None
+            elif isinstance(value, (list, tuple)):
+                if not all(isinstance(i, (str, int, float, bool)) for i in value):
+                    return None
+                value = tuple(value)
+            elif value is not None and not isinstance(value, (str, int, float, bool)):
+                return None
+            parameterItems.append((name, value))
+        return (algName, stamp, tuple(parameterItems))
+
+    def get(self, key, context, is_child_algorithm=False):
+        """
+        Returns a copy of the cached layer of key, or None on a cache miss.
+        The copy is owned by the context when is_child_algorithm is True, in
+        which case its id is returned, as processing.run would do.
+        """
+        if key is None:
+            return None
+        with self.lock:
+            cachedLyr = self.entries.get(key)
+            if cachedLyr is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        outputLyr = cachedLyr.materialize(QgsFeatureRequest())
+        outputLyr.dataProvider().createSpatialIndex()
+        self.addIndexedLayer(outputLyr)
+        if not is_child_algorithm:
+            return outputLyr
+        context.temporaryLayerStore().addMapLayer(outputLyr)
+        return outputLyr.id()
+
+    def insert(self, key, output, context):
+        """
+        Stores a copy of the output of an algorithm call.
+        :param key: (tuple) key built by getKey.
+        :param output: (QgsVectorLayer or str) algorithm output.
+        :param context: (QgsProcessingContext) context that owns the output.
+        """
+        if key is None:
+            return
+        if isinstance(output, str):
+            output = QgsProcessingUtils.mapLayerFromString(output, context)
+        if not isinstance(output, QgsVectorLayer) or not output.isValid():
+            return
+        if output.featureCount() > self.maxFeatures:
+            return
+        cachedLyr = output.materialize(QgsFeatureRequest())
+        with self.lock:
+            self.entries[key] = cachedLyr
+            self.entries.move_to_end(key)
+            self.evict()
+
+    def evict(self):
+        while len(self.entries) > self.maxEntries or (
+            len(self.entries) > 1 and self.cachedFeatureCount() > self.maxFeatures
+        ):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def cachedFeatureCount(self):
+        return sum(lyr.featureCount() for lyr in self.entries.values())
+
+    def addIndexedLayer(self, layer):
+        layerId = layer.id()
+        with self.lock:
+            self.indexedLayerIds[layerId] = True
+            while len(self.indexedLayerIds) > self.maxIndexedLayers:
+                self.indexedLayerIds.popitem(last=False)
+        layer.destroyed.connect(lambda: self.indexedLayerIds.pop(layerId, None))
+
+    def isIndexed(self, inputLyr, context):
+        if isinstance(inputLyr, str):
+            inputLyr = QgsProcessingUtils.mapLayerFromString(inputLyr, context)
+        return isinstance(inputLyr, QgsVectorLayer) and (
+            inputLyr.id() in self.indexedLayerIds
+        )
+
+    def statistics(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+        }
+
+    def logStatistics(self, context):
+        """
+        Logs the cache statistics the first time it is called with context,
+        so each processing run logs them once.
+        """
+        contextId = id(context)
+        with self.lock:
+            if contextId in self.loggedContextIds:
+                return
+            self.loggedContextIds[contextId] = True
+            while len(self.loggedContextIds) > self.maxLoggedContexts:
+                self.loggedContextIds.popitem(last=False)
+            statistics = self.statistics()
+        QgsMessageLog.logMessage(
+            "AlgRunner cache (hits: {hits}, misses: {misses}, evictions: {evictions}, entries: {entries})".format(
+                **statistics
+            ),
+            "DSGTools Plugin",
+            Qgis.Info,
+        )
+
+
+algRunnerCache = AlgRunnerCache()
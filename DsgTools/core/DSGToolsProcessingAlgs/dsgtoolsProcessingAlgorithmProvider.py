@@ -155,6 +155,9 @@ from DsgTools.core.DSGToolsProcessingAlgs.Algs.OtherAlgs.ruleStatisticsAlgorithm
 from DsgTools.core.DSGToolsProcessingAlgs.Algs.OtherAlgs.runFMESAPAlgorithm import (
     RunFMESAPAlgorithm,
 )
+from DsgTools.core.DSGToolsProcessingAlgs.Algs.OtherAlgs.runIncrementalValidationAlgorithm import (
+    RunIncrementalValidationAlgorithm,
+)
 from DsgTools.core.DSGToolsProcessingAlgs.Algs.OtherAlgs.runRemoteFMEAlgorithm import (
     ParameterFMEManagerType,
     RunRemoteFMEAlgorithm,
@@ -391,6 +394,9 @@ from DsgTools.core.DSGToolsProcessingAlgs.Algs.ValidationAlgs.streamOrder import
 from DsgTools.core.DSGToolsProcessingAlgs.Algs.OtherAlgs.createReviewGridAlgorithm import (
     CreateReviewGridAlgorithm,
 )
+from DsgTools.core.DSGToolsProcessingAlgs.editHistoryTracker import (
+    editHistoryTracker,
+)
 
 
 class DSGToolsProcessingAlgorithmProvider(QgsProcessingProvider):
@@ -476,6 +482,7 @@ class DSGToolsProcessingAlgorithmProvider(QgsProcessingProvider):
             AssignActionsToLayersAlgorithm(),
             BuildJoinsOnLayersAlgorithm(),
             BatchRunAlgorithm(),
+            RunIncrementalValidationAlgorithm(),
             StringCsvToLayerListAlgorithm(),
             IdentifyWrongBuildingAnglesAlgorithm(),
             IdentifyVertexNearEdgesAlgorithm(),
@@ -553,6 +560,7 @@ class DSGToolsProcessingAlgorithmProvider(QgsProcessingProvider):
         QgsApplication.instance().processingRegistry().addParameterType(
             self.parameterSpatialRulesSetType
         )
+        editHistoryTracker.watchProject()
         self.refreshAlgorithms()
         return True
 
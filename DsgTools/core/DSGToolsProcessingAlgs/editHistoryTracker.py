@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-22
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import threading
+from collections import defaultdict
+
+from qgis.core import (
+    QgsCoordinateTransform,
+    QgsExpression,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsProject,
+    QgsRectangle,
+    QgsVectorLayer,
+)
+
+
+class EditHistoryTracker(object):
+    """
+    Records the regions changed on each watched layer, so each check (an
+    algorithm with its parameters) can be run only where the data changed
+    since the last time that check validated the layer.
+
+    Edits are tracked through the layer edit buffer signals: the ids of the
+    touched features are kept while the layer is being edited and, right
+    before the commit, the bounding boxes of their committed (old) and
+    edited (new) geometries are stored as dirty rectangles. Rolled back
+    edits are discarded. Changes that do not go through the edit buffer
+    (e.g. writes straight to the data provider or a data source change)
+    cannot be located, so they mark the layer for a full validation.
+
+    The dirty rectangles of a layer form a journal. Each check keeps, per
+    layer, the position of the journal it has validated and the full
+    validation generation of the layer at that time, so validating a layer
+    with one check does not clear the changes still pending for the others.
+    Entries already validated by every check of the layer are dropped.
+    """
+
+    minimumGrowth = 1e-6
+
+    def __init__(self):
+        self.dirtyRectDict = defaultdict(list)
+        self.journalOffsetDict = defaultdict(int)
+        self.generationDict = defaultdict(int)
+        self.validatedDict = dict()
+        self.touchedFidDict = defaultdict(set)
+        self.commitRectDict = dict()
+        self.watchedLayerIds = set()
+        self.lock = threading.RLock()
+
+    def watchProject(self, project=None):
+        """
+        Watches every vector layer of the project, and the ones added later.
+        """
+        project = QgsProject.instance() if project is None else project
+        self.watchLayers(project.mapLayers().values())
+        project.layersAdded.connect(self.watchLayers)
+
+    def watchLayers(self, layerList):
+        for layer in layerList:
+            if isinstance(layer, QgsVectorLayer):
+                self.watchLayer(layer)
+
+    def watchLayer(self, layer):
+        """
+        Starts tracking layer. A layer that was not watched before has no
+        history, so every check needs a full validation first.
+        :return: (bool) True if the layer was already watched.
+        """
+        layerId = layer.id()
+        with self.lock:
+            if layerId in self.watchedLayerIds:
+                return True
+            self.watchedLayerIds.add(layerId)
+            self.requireFullValidation(layerId)
+        layer.featureAdded.connect(lambda fid: self.touch(layerId, fid))
+        layer.featureDeleted.connect(lambda fid: self.touch(layerId, fid))
+        layer.geometryChanged.connect(lambda fid, geom: self.touch(layerId, fid))
+        layer.attributeValueChanged.connect(
+            lambda fid, idx, value: self.touch(layerId, fid)
+        )
+        layer.beforeCommitChanges.connect(lambda: self.prepareCommit(layer))
+        layer.afterCommitChanges.connect(lambda: self.finishCommit(layerId))
+        layer.afterRollBack.connect(lambda: self.rollBack(layerId))
+        layer.dataSourceChanged.connect(lambda: self.requireFullValidation(layerId))
+        layer.subsetStringChanged.connect(lambda: self.requireFullValidation(layerId))
+        layer.willBeDeleted.connect(lambda: self.forgetLayer(layerId))
+        return False
+
+    def touch(self, layerId, fid):
+        with self.lock:
+            self.touchedFidDict[layerId].add(fid)
+
+    def touchedRects(self, layer):
+        """
+        Returns the bounding boxes, before and after the edit, of the
+        features touched on the current edit session of layer.
+        """
+        with self.lock:
+            fidList = list(self.touchedFidDict.get(layer.id(), []))
+        if not fidList:
+            return []
+        rectList = []
+        committedFids = [fid for fid in fidList if fid >= 0]
+        if committedFids:
+            # the provider still holds the geometries from before the edit
+            rectList += self.boundingBoxes(
+                layer.dataProvider().getFeatures(
+                    QgsFeatureRequest().setFilterFids(committedFids).setNoAttributes()
+                )
+            )
+        rectList += self.boundingBoxes(
+            layer.getFeatures(
+                QgsFeatureRequest().setFilterFids(fidList).setNoAttributes()
+            )
+        )
+        return rectList
+
+    def boundingBoxes(self, featureIterable):
+        return [
+            feat.geometry().boundingBox()
+            for feat in featureIterable
+            if feat.hasGeometry() and not feat.geometry().isEmpty()
+        ]
+
+    def prepareCommit(self, layer):
+        rectList = self.touchedRects(layer)
+        with self.lock:
+            self.commitRectDict[layer.id()] = rectList
+
+    def finishCommit(self, layerId):
+        with self.lock:
+            self.dirtyRectDict[layerId] += self.commitRectDict.pop(layerId, [])
+            self.touchedFidDict.pop(layerId, None)
+
+    def rollBack(self, layerId):
+        with self.lock:
+            self.commitRectDict.pop(layerId, None)
+            self.touchedFidDict.pop(layerId, None)
+
+    def requireFullValidation(self, layerId):
+        """
+        Starts a new generation of the layer history. Markers of the previous
+        generations are outdated, so every check validates the whole layer
+        and the journal is no longer needed.
+        """
+        with self.lock:
+            self.generationDict[layerId] += 1
+            self.dropJournal(layerId, len(self.dirtyRectDict.get(layerId, [])))
+
+    def dropJournal(self, layerId, nEntries):
+        if nEntries <= 0:
+            return
+        del self.dirtyRectDict[layerId][:nEntries]
+        self.journalOffsetDict[layerId] += nEntries
+
+    def forgetLayer(self, layerId):
+        with self.lock:
+            self.watchedLayerIds.discard(layerId)
+            self.dirtyRectDict.pop(layerId, None)
+            self.journalOffsetDict.pop(layerId, None)
+            self.generationDict.pop(layerId, None)
+            self.touchedFidDict.pop(layerId, None)
+            self.commitRectDict.pop(layerId, None)
+            for key in [key for key in self.validatedDict if key[1] == layerId]:
+                self.validatedDict.pop(key)
+
+    def needsFullValidation(self, layer, checkKey):
+        """
+        Tells if checkKey has to validate the whole layer: the layer is not
+        watched, was never validated by the check or its history was reset
+        since then.
+        """
+        with self.lock:
+            if layer.id() not in self.watchedLayerIds:
+                return True
+            marker = self.validatedDict.get((checkKey, layer.id()))
+            return marker is None or marker[0] != self.generationDict[layer.id()]
+
+    def auditRects(self, layer, auditField, since):
+        """
+        Returns the bounding boxes of the features whose audit column
+        (e.g. an updated_at column filled by a PostGIS trigger) is later
+        than since. Deleted features are not found this way.
+        :param auditField: (str) name of the audit column.
+        :param since: (QDateTime) start of the period.
+        """
+        expression = "{field} >= to_datetime({since})".format(
+            field=QgsExpression.quotedColumnRef(auditField),
+            since=QgsExpression.quotedString(since.toString("yyyy-MM-ddThh:mm:ss")),
+        )
+        return self.boundingBoxes(
+            layer.getFeatures(
+                QgsFeatureRequest()
+                .setFilterExpression(expression)
+                .setSubsetOfAttributes([auditField], layer.fields())
+            )
+        )
+
+    def changedRects(self, layer, checkKey, auditField=None, since=None):
+        """
+        Returns the dirty rectangles of layer, in the layer crs: changes
+        committed since checkKey last validated it, pending edits and,
+        optionally, the features changed according to an audit column.
+        """
+        with self.lock:
+            _, position = self.validatedDict[(checkKey, layer.id())]
+            rectList = self.dirtyRectDict.get(layer.id(), [])[
+                position - self.journalOffsetDict[layer.id()] :
+            ]
+        rectList += self.touchedRects(layer)
+        if auditField and since is not None and layer.fields().indexOf(auditField) >= 0:
+            rectList += self.auditRects(layer, auditField, since)
+        return rectList
+
+    def changedRegion(
+        self, layerList, crs, checkKey, searchRadius=0.0, auditField=None, since=None
+    ):
+        """
+        Returns the union of the dirty rectangles of the layers for checkKey,
+        grown by searchRadius, as a QgsGeometry in crs. Returns an empty
+        geometry when nothing changed, or None when at least one of the
+        layers needs a full validation.
+        :param checkKey: (str) identifies the check (algorithm and parameters).
+        """
+        if any(self.needsFullValidation(layer, checkKey) for layer in layerList):
+            return None
+        geomList = []
+        for layer in layerList:
+            transform = QgsCoordinateTransform(
+                layer.crs(), crs, QgsProject.instance().transformContext()
+            )
+            for rect in self.changedRects(
+                layer, checkKey, auditField=auditField, since=since
+            ):
+                rect = QgsRectangle(rect)
+                rect.grow(searchRadius)
+                if rect.isEmpty():
+                    # keeps point changes when there is no search radius
+                    rect.grow(self.minimumGrowth)
+                geom = QgsGeometry.fromRect(rect)
+                if not transform.isShortCircuited():
+                    geom.transform(transform)
+                geomList.append(geom)
+        return QgsGeometry.unaryUnion(geomList) if geomList else QgsGeometry()
+
+    def validationMarkers(self, layerList):
+        """
+        Returns the current journal position of each layer. It must be taken
+        before the check runs, so the changes committed during the run are
+        left for the next one.
+        :return: (dict) {layer id: (generation, position)}.
+        """
+        with self.lock:
+            return {
+                layer.id(): (
+                    self.generationDict[layer.id()],
+                    self.journalOffsetDict[layer.id()]
+                    + len(self.dirtyRectDict.get(layer.id(), [])),
+                )
+                for layer in layerList
+            }
+
+    def markValidated(self, checkKey, markerDict):
+        """
+        Records that checkKey validated the layers up to the markers returned
+        by validationMarkers. The history of the other checks is kept.
+        Pending edits are kept, as they are not committed yet.
+        """
+        with self.lock:
+            for layerId, marker in markerDict.items():
+                if layerId not in self.watchedLayerIds:
+                    continue
+                self.validatedDict[(checkKey, layerId)] = marker
+                generation = self.generationDict[layerId]
+                positionList = [
+                    position
+                    for (_, markerLayerId), (
+                        markerGeneration,
+                        position,
+                    ) in self.validatedDict.items()
+                    if markerLayerId == layerId and markerGeneration == generation
+                ]
+                if positionList:
+                    self.dropJournal(
+                        layerId, min(positionList) - self.journalOffsetDict[layerId]
+                    )
+
+
+editHistoryTracker = EditHistoryTracker()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-29
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict, defaultdict
+
+from qgis.core import Qgis, QgsDataSourceUri, QgsMessageLog, QgsProviderRegistry
+from qgis.PyQt.QtXml import QDomDocument
+
+
+class StyleCache(object):
+    """
+    Keeps parsed QML documents keyed by the hash of their content, so the
+    same style applied to many layers, or on many runs, is parsed once.
+
+    Styles stored on PostGIS and GeoPackage databases are fetched with a
+    single query per database and style name, instead of listing and
+    reading the styles of each layer. Database rows are not kept between
+    calls, as styles may be edited on the database; only the parsed
+    documents are.
+    """
+
+    def __init__(self, maxDocuments=2000):
+        self.maxDocuments = maxDocuments
+        self.documentDict = OrderedDict()
+        self.fileHashDict = dict()
+        self.lock = threading.Lock()
+
+    def cachedDocument(self, key):
+        with self.lock:
+            doc = self.documentDict.get(key)
+            if doc is not None:
+                self.documentDict.move_to_end(key)
+            return doc
+
+    def document(self, qml):
+        """
+        Returns the parsed QDomDocument of the qml text.
+        """
+        key = hashlib.sha1(qml.encode("utf-8")).hexdigest()
+        doc = self.cachedDocument(key)
+        if doc is not None:
+            return doc
+        doc = QDomDocument("qgis")
+        doc.setContent(qml)
+        with self.lock:
+            self.documentDict[key] = doc
+            while len(self.documentDict) > self.maxDocuments:
+                self.documentDict.popitem(last=False)
+        return doc
+
+    def fileDocument(self, path):
+        """
+        Returns the parsed QDomDocument of a qml file. The file is read again
+        only when its size or modification time change.
+        """
+        stat = os.stat(path)
+        fileKey = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            key = self.fileHashDict.get(fileKey)
+        doc = self.cachedDocument(key) if key is not None else None
+        if doc is not None:
+            return doc
+        with open(path, "r", encoding="utf-8") as f:
+            qml = f.read()
+        with self.lock:
+            self.fileHashDict[fileKey] = hashlib.sha1(qml.encode("utf-8")).hexdigest()
+        return self.document(qml)
+
+    def clear(self):
+        with self.lock:
+            self.documentDict.clear()
+            self.fileHashDict.clear()
+
+    def databaseKey(self, lyr):
+        """
+        Returns the database of lyr and the key of its table on the
+        layer_styles table, or None if styles cannot be fetched in bulk
+        from its provider.
+        """
+        providerType = lyr.providerType()
+        if providerType == "postgres":
+            uri = QgsDataSourceUri(lyr.source())
+            return (
+                (providerType, uri.connectionInfo(False)),
+                (uri.schema(), uri.table(), uri.geometryColumn() or ""),
+            )
+        if providerType == "ogr" and lyr.dataProvider().storageType() == "GPKG":
+            parts = QgsProviderRegistry.instance().decodeUri("ogr", lyr.source())
+            return (
+                (providerType, parts.get("path")),
+                ("", parts.get("layerName") or "", ""),
+            )
+        return None
+
+    def databaseStylesSql(self, providerType, styleName):
+        prefixLength = len(styleName) + 1
+        styleName = styleName.replace("'", "''")
+        sql = """SELECT f_table_schema, f_table_name, f_geometry_column, stylename, styleqml FROM {table} WHERE {catalogFilter}(stylename = '{styleName}' OR substr(stylename, 1, {prefixLength}) = '{styleName}/') ORDER BY update_time DESC"""
+        return sql.format(
+            table="public.layer_styles"
+            if providerType == "postgres"
+            else "layer_styles",
+            catalogFilter="f_table_catalog = current_database() AND "
+            if providerType == "postgres"
+            else "",
+            styleName=styleName,
+            prefixLength=prefixLength,
+        )
+
+    def databaseStyles(self, lyrList, styleName):
+        """
+        Fetches the styles named styleName, or styleName/layer name, of the
+        layers of lyrList, with one query per database. As in
+        listStylesInDatabase, styles saved for other tables are used when the
+        table of the layer has none with that name.
+        :return: (tuple) dict {layer id: qml text} of the layers with a
+            style and list of the layers whose styles could not be fetched
+            in bulk (other providers or failed queries).
+        """
+        layerDict = defaultdict(list)
+        unresolvedList = []
+        for lyr in lyrList:
+            key = self.databaseKey(lyr)
+            if key is None:
+                unresolvedList.append(lyr)
+                continue
+            layerDict[key[0]].append((lyr, key[1]))
+        styleDict = dict()
+        for (providerType, connectionInfo), layerList in layerDict.items():
+            try:
+                rowList = (
+                    QgsProviderRegistry.instance()
+                    .providerMetadata(providerType)
+                    .createConnection(
+                        layerList[0][0].source()
+                        if providerType == "postgres"
+                        else connectionInfo,
+                        {},
+                    )
+                    .executeSql(self.databaseStylesSql(providerType, styleName))
+                )
+            except Exception as e:
+                QgsMessageLog.logMessage(
+                    "Styles could not be fetched in bulk: {0}".format(e),
+                    "DSGTools Plugin",
+                    Qgis.Warning,
+                )
+                unresolvedList += [lyr for lyr, _ in layerList]
+                continue
+            # rows are ordered from the latest, so the latest style is kept
+            rowDict = dict()
+            nameDict = dict()
+            for schema, table, geometryColumn, rowStyleName, qml in rowList:
+                if providerType != "postgres":
+                    schema, geometryColumn = "", ""
+                rowDict.setdefault(
+                    (
+                        (schema or "", table or "", geometryColumn or ""),
+                        rowStyleName,
+                    ),
+                    qml,
+                )
+                nameDict.setdefault(rowStyleName, qml)
+            for lyr, tableKey in layerList:
+                layerStyleName = "{style_name}/{layer_name}".format(
+                    style_name=styleName, layer_name=lyr.name()
+                )
+                qml = (
+                    rowDict.get((tableKey, styleName))
+                    or rowDict.get((tableKey, layerStyleName))
+                    or nameDict.get(styleName)
+                    or nameDict.get(layerStyleName)
+                )
+                if qml:
+                    styleDict[lyr.id()] = qml
+        return styleDict, unresolvedList
+
+
+styleCache = StyleCache()
@@ -20,6 +20,10 @@
  *                                                                         *
  ***************************************************************************/
 """
+
+import hashlib
+import os
+import re
 from builtins import str, range, abs, round
 from math import floor, ceil, pow
 from qgis.core import (
@@ -35,7 +39,13 @@ from qgis.core import (
     QgsRuleBasedRenderer,
     QgsPoint,
     QgsGeometry,
-    QgsGeometryGeneratorSymbolLayer,
+    QgsFeature,
+    QgsFields,
+    QgsWkbTypes,
+    QgsVectorFileWriter,
+    QgsProcessingUtils,
+    QgsMessageLog,
+    Qgis,
 )
 from qgis.core import (
     QgsRuleBasedLabeling,
@@ -117,24 +127,12 @@ class GridAndLabelCreator(object):
         p2 = QgsPoint(xmin_source + px * u + dx, ymin_source + py * t + dy)
         self.utmLLtransform(utmcheck, p1, trLLUTM)
         self.utmLLtransform(utmcheck, p2, trLLUTM)
-        properties = {"color": "black"}
-        line_temp = QgsLineSymbol.createSimple(properties)
-        line_temp.setWidth(0.05)
-        symb = QgsGeometryGeneratorSymbolLayer.create(properties)
-        symb.setSymbolType(1)
-        symb.setSubSymbol(line_temp)
-        symb.setGeometryExpression(
-            "make_line(make_point("
-            + str(p1.x())
-            + ",("
-            + str(p1.y())
-            + ")),make_point("
-            + str(p2.x())
-            + ",("
-            + str(p2.y())
-            + ")))"
+        return self.makeLine(p1, p2)
+
+    def makeLine(self, p1, p2):
+        return QgsGeometry.fromPolyline(
+            [QgsPoint(p1.x(), p1.y()), QgsPoint(p2.x(), p2.y())]
         )
-        return symb
 
     def gridLinesymbolMaker(
         self,
@@ -167,15 +165,11 @@ class GridAndLabelCreator(object):
             self.utmLLtransform(utmcheck, p2, trLLUTM)
         return [a1, a2, p1, p2]
 
-    def utm_symb_generator(
+    def utmGridLineGenerator(
         self,
         grid_spacing,
         trUTMLL,
         trLLUTM,
-        grid_symb,
-        properties,
-        geo_number_x,
-        geo_number_y,
         UTM_num_x,
         UTM_num_y,
         t,
@@ -193,17 +187,12 @@ class GridAndLabelCreator(object):
         xmax_UTM = float(bound_UTM_bb.split()[3])
         ymax_UTM = float(bound_UTM_bb.split()[4])
         test_line = [None] * 2
-        properties = {"color": "black"}
-        line_temp = QgsLineSymbol.createSimple(properties)
-        line_temp.setWidth(0.05)
-        symb = QgsGeometryGeneratorSymbolLayer.create(properties)
-        symb.setSymbolType(1)
-        symb.setSubSymbol(line_temp)
-
-        # Test First And Last Grid Lines
-        # Vertical
-        if (t == 1 and u == 0) or (t == UTM_num_x and u == 0):
-            # Symbol vertices
+        isVertical = u == 0
+        isBorderLine = (isVertical and t in (1, UTM_num_x)) or (
+            not isVertical and u in (1, UTM_num_y)
+        )
+        # Symbol vertices
+        if isVertical:
             auxPointlist = self.gridLinesymbolMaker(
                 ((floor(xmin_UTM / grid_spacing) + t) * grid_spacing),
                 ymin_UTM,
@@ -218,100 +207,7 @@ class GridAndLabelCreator(object):
                 utmcheck,
                 True,
             )
-            # 0: left bound; 1: right bound
-            test_line[0] = QgsGeometry.fromWkt(
-                "LINESTRING ("
-                + str(xmin_source)
-                + " "
-                + str(ymin_source)
-                + ","
-                + str(xmin_source)
-                + " "
-                + str(ymax_source)
-                + ")"
-            )
-            test_line[1] = QgsGeometry.fromWkt(
-                "LINESTRING ("
-                + str(xmax_source)
-                + " "
-                + str(ymin_source)
-                + ","
-                + str(xmax_source)
-                + " "
-                + str(ymax_source)
-                + ")"
-            )
-            test_grid = QgsGeometry.fromPolyline([auxPointlist[0], auxPointlist[1]])
-            if test_line[0].intersects(test_grid):
-                mid_point = test_line[0].intersection(test_grid).vertexAt(0)
-                self.utmLLtransform(utmcheck, mid_point, trLLUTM)
-                if auxPointlist[0].x() > auxPointlist[1].x():
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(auxPointlist[2].x())
-                        + ","
-                        + str(auxPointlist[2].y())
-                        + "), make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "))"
-                    )
-                else:
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "), make_point("
-                        + str(auxPointlist[3].x())
-                        + ","
-                        + str(auxPointlist[3].y())
-                        + "))"
-                    )
-            elif test_line[1].intersects(test_grid):
-                mid_point = test_line[1].intersection(test_grid).vertexAt(0)
-                self.utmLLtransform(utmcheck, mid_point, trLLUTM)
-                if auxPointlist[0].x() < auxPointlist[1].x():
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(auxPointlist[2].x())
-                        + ","
-                        + str(auxPointlist[2].y())
-                        + "), make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "))"
-                    )
-                else:
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "), make_point("
-                        + str(auxPointlist[3].x())
-                        + ","
-                        + str(auxPointlist[3].y())
-                        + "))"
-                    )
-            else:
-                symb.setGeometryExpression(
-                    "make_line(make_point("
-                    + str(auxPointlist[2].x())
-                    + ","
-                    + str(auxPointlist[2].y())
-                    + "), make_point("
-                    + str(auxPointlist[3].x())
-                    + ","
-                    + str(auxPointlist[3].y())
-                    + "))"
-                )
-
-        # Horizontal
-        elif (u == 1 and t == 0) or (u == UTM_num_y and t == 0):
-            # Symbol vertices
+        else:
             auxPointlist = self.gridLinesymbolMaker(
                 xmin_UTM,
                 ((floor(ymin_UTM / grid_spacing) + u) * grid_spacing),
@@ -326,155 +222,40 @@ class GridAndLabelCreator(object):
                 utmcheck,
                 False,
             )
-            # 0: bottom bound; 1: upper bound
-            test_line[0] = QgsGeometry.fromWkt(
-                "LINESTRING ("
-                + str(xmin_source)
-                + " "
-                + str(ymin_source)
-                + ","
-                + str(xmax_source)
-                + " "
-                + str(ymin_source)
-                + ")"
-            )
-            test_line[1] = QgsGeometry.fromWkt(
-                "LINESTRING ("
-                + str(xmin_source)
-                + " "
-                + str(ymax_source)
-                + ","
-                + str(xmax_source)
-                + " "
-                + str(ymax_source)
-                + ")"
-            )
-            test_grid = QgsGeometry.fromPolyline([auxPointlist[0], auxPointlist[1]])
-            if test_line[0].intersects(test_grid):
-                mid_point = test_line[0].intersection(test_grid).vertexAt(0)
-                self.utmLLtransform(utmcheck, mid_point, trLLUTM)
-                if auxPointlist[0].y() > auxPointlist[1].y():
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(auxPointlist[2].x())
-                        + ","
-                        + str(auxPointlist[2].y())
-                        + "), make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "))"
-                    )
-                else:
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "), make_point("
-                        + str(auxPointlist[3].x())
-                        + ","
-                        + str(auxPointlist[3].y())
-                        + "))"
-                    )
-            elif test_line[1].intersects(test_grid):
-                mid_point = test_line[1].intersection(test_grid).vertexAt(0)
-                self.utmLLtransform(utmcheck, mid_point, trLLUTM)
-                if auxPointlist[0].y() < auxPointlist[1].y():
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(auxPointlist[2].x())
-                        + ","
-                        + str(auxPointlist[2].y())
-                        + "), make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "))"
-                    )
-                else:
-                    symb.setGeometryExpression(
-                        "make_line(make_point("
-                        + str(mid_point.x())
-                        + ","
-                        + str(mid_point.y())
-                        + "), make_point("
-                        + str(auxPointlist[3].x())
-                        + ","
-                        + str(auxPointlist[3].y())
-                        + "))"
-                    )
-            else:
-                symb.setGeometryExpression(
-                    "make_line(make_point("
-                    + str(auxPointlist[2].x())
-                    + ","
-                    + str(auxPointlist[2].y())
-                    + "), make_point("
-                    + str(auxPointlist[3].x())
-                    + ","
-                    + str(auxPointlist[3].y())
-                    + "))"
-                )
+        if not isBorderLine:
+            return self.makeLine(auxPointlist[2], auxPointlist[3])
 
-        # Inner Grid Lines
-        # Vertical
-        elif (not (t == 1)) and (not (t == UTM_num_x)) and u == 0:
-            auxPointlist = self.gridLinesymbolMaker(
-                ((floor(xmin_UTM / grid_spacing) + t) * grid_spacing),
-                ymin_UTM,
-                ((floor(xmin_UTM / grid_spacing) + t) * grid_spacing),
-                ymax_UTM,
-                xmax_source,
-                xmin_source,
-                ymax_source,
-                ymin_source,
-                trUTMLL,
-                trLLUTM,
-                utmcheck,
-                True,
+        # Test First And Last Grid Lines
+        if isVertical:
+            # 0: left bound; 1: right bound
+            test_line[0] = QgsGeometry.fromPolyline(
+                [QgsPoint(xmin_source, ymin_source), QgsPoint(xmin_source, ymax_source)]
             )
-            symb.setGeometryExpression(
-                "make_line(make_point("
-                + str(auxPointlist[2].x())
-                + ","
-                + str(auxPointlist[2].y())
-                + "), make_point("
-                + str(auxPointlist[3].x())
-                + ","
-                + str(auxPointlist[3].y())
-                + "))"
+            test_line[1] = QgsGeometry.fromPolyline(
+                [QgsPoint(xmax_source, ymin_source), QgsPoint(xmax_source, ymax_source)]
             )
-        # Horizontal
-        elif (not (u == 1)) and (not (u == UTM_num_y)) and t == 0:
-            auxPointlist = self.gridLinesymbolMaker(
-                xmin_UTM,
-                ((floor(ymin_UTM / grid_spacing) + u) * grid_spacing),
-                xmax_UTM,
-                ((floor(ymin_UTM / grid_spacing) + u) * grid_spacing),
-                xmax_source,
-                xmin_source,
-                ymax_source,
-                ymin_source,
-                trUTMLL,
-                trLLUTM,
-                utmcheck,
-                False,
+            startsAfterEnd = auxPointlist[0].x() > auxPointlist[1].x()
+            startsBeforeEnd = auxPointlist[0].x() < auxPointlist[1].x()
+        else:
+            # 0: bottom bound; 1: upper bound
+            test_line[0] = QgsGeometry.fromPolyline(
+                [QgsPoint(xmin_source, ymin_source), QgsPoint(xmax_source, ymin_source)]
             )
-            symb.setGeometryExpression(
-                "make_line(make_point("
-                + str(auxPointlist[2].x())
-                + ","
-                + str(auxPointlist[2].y())
-                + "), make_point("
-                + str(auxPointlist[3].x())
-                + ","
-                + str(auxPointlist[3].y())
-                + "))"
+            test_line[1] = QgsGeometry.fromPolyline(
+                [QgsPoint(xmin_source, ymax_source), QgsPoint(xmax_source, ymax_source)]
             )
-
-        grid_symb.appendSymbolLayer(symb)
-        return grid_symb
+            startsAfterEnd = auxPointlist[0].y() > auxPointlist[1].y()
+            startsBeforeEnd = auxPointlist[0].y() < auxPointlist[1].y()
+        test_grid = QgsGeometry.fromPolyline([auxPointlist[0], auxPointlist[1]])
+        for boundIndex, keepStart in ((0, startsAfterEnd), (1, startsBeforeEnd)):
+            if not test_line[boundIndex].intersects(test_grid):
+                continue
+            mid_point = test_line[boundIndex].intersection(test_grid).vertexAt(0)
+            self.utmLLtransform(utmcheck, mid_point, trLLUTM)
+            if keepStart:
+                return self.makeLine(auxPointlist[2], mid_point)
+            return self.makeLine(mid_point, auxPointlist[3])
+        return self.makeLine(auxPointlist[2], auxPointlist[3])
 
     def grid_labeler(
         self,
@@ -779,7 +560,7 @@ class GridAndLabelCreator(object):
             7: "\u2077",
             8: "\u2078",
             9: "\u2079",
-            "m": "\u1D50",
+            "m": "\u1d50",
         }
         full_label = [char for char in full_label]
         for j in range(0, len(full_label)):
@@ -885,7 +666,6 @@ class GridAndLabelCreator(object):
 
     def geoGridcreator(
         self,
-        grid_symb,
         geo_bound_bb,
         geo_number_x,
         geo_number_y,
@@ -900,69 +680,33 @@ class GridAndLabelCreator(object):
 
         px = (xmax_source - xmin_source) / (geo_number_x + 1)
         py = (ymax_source - ymin_source) / (geo_number_y + 1)
-
-        for u in range(1, (geo_number_x + 2)):
-            for t in range(0, (geo_number_y + 2)):
-                symb_cross = self.crossLinegenerator(
-                    xmin_source,
-                    ymin_source,
-                    px,
-                    py,
-                    u,
-                    t,
-                    -0.00002145 * scale,
-                    0,
-                    utmcheck,
-                    trLLUTM,
-                )
-                grid_symb.appendSymbolLayer(symb_cross)
-        for u in range(0, (geo_number_x + 2)):
-            for t in range(1, (geo_number_y + 2)):
-                symb_cross = self.crossLinegenerator(
-                    xmin_source,
-                    ymin_source,
-                    px,
-                    py,
-                    u,
-                    t,
-                    0,
-                    -0.00002145 * scale,
-                    utmcheck,
-                    trLLUTM,
-                )
-                grid_symb.appendSymbolLayer(symb_cross)
-        for u in range(0, (geo_number_x + 1)):
-            for t in range(0, (geo_number_y + 2)):
-                symb_cross = self.crossLinegenerator(
-                    xmin_source,
-                    ymin_source,
-                    px,
-                    py,
-                    u,
-                    t,
-                    0.00002145 * scale,
-                    0,
-                    utmcheck,
-                    trLLUTM,
-                )
-                grid_symb.appendSymbolLayer(symb_cross)
-        for u in range(0, (geo_number_x + 2)):
-            for t in range(0, (geo_number_y + 1)):
-                symb_cross = self.crossLinegenerator(
-                    xmin_source,
-                    ymin_source,
-                    px,
-                    py,
-                    u,
-                    t,
-                    0,
-                    0.00002145 * scale,
-                    utmcheck,
-                    trLLUTM,
-                )
-                grid_symb.appendSymbolLayer(symb_cross)
-
-        return grid_symb
+        crossSize = 0.00002145 * scale
+        # (u range, t range, dx, dy) of each arm of the crosses
+        crossArms = [
+            (range(1, geo_number_x + 2), range(0, geo_number_y + 2), -crossSize, 0),
+            (range(0, geo_number_x + 2), range(1, geo_number_y + 2), 0, -crossSize),
+            (range(0, geo_number_x + 1), range(0, geo_number_y + 2), crossSize, 0),
+            (range(0, geo_number_x + 2), range(0, geo_number_y + 1), 0, crossSize),
+        ]
+        crossGeometryList = []
+        for uRange, tRange, dx, dy in crossArms:
+            for u in uRange:
+                for t in tRange:
+                    crossGeometryList.append(
+                        self.crossLinegenerator(
+                            xmin_source,
+                            ymin_source,
+                            px,
+                            py,
+                            u,
+                            t,
+                            dx,
+                            dy,
+                            utmcheck,
+                            trLLUTM,
+                        )
+                    )
+        return crossGeometryList
 
     def geoGridlabelPlacer(
         self,
@@ -1348,6 +1092,123 @@ class GridAndLabelCreator(object):
 
         return root_rule
 
+    def gridCacheKey(
+        self, frameGeometry, grid_spacing, geo_number_x, geo_number_y, scale, utmcheck
+    ):
+        """
+        Builds the key that identifies the grid of a frame. The cached grid
+        is only regenerated when the frame geometry, the scale or the grid
+        spacing change.
+        """
+        frameHash = hashlib.md5(bytes(frameGeometry.asWkb())).hexdigest()
+        return "{0}|{1}|{2}|{3}|{4}|{5}".format(
+            frameHash, grid_spacing, geo_number_x, geo_number_y, scale, utmcheck
+        )
+
+    def getGridCacheLayer(self, frameLayer, id_value):
+        """
+        Returns the layer that holds the grid of the given frame, creating
+        and adding it to the project if it does not exist yet. The grid is
+        stored in a GeoPackage (see gridCachePath) so that it is saved and
+        reloaded with the project; a memory layer is only used when the
+        GeoPackage cannot be written.
+        :param frameLayer: (QgsVectorLayer) frame layer;
+        :param id_value: (int) id of the frame feature;
+        :return: (QgsVectorLayer) grid layer.
+        """
+        frameKey = "{0}:{1}".format(frameLayer.id(), id_value)
+        for lyr in list(QgsProject.instance().mapLayers().values()):
+            if lyr.customProperty("dsgtools/grid_frame") != frameKey:
+                continue
+            if lyr.isValid() and lyr.dataProvider() is not None:
+                return lyr
+            # a broken cache layer (e.g. missing file) is rebuilt
+            QgsProject.instance().removeMapLayer(lyr.id())
+        layerName = "{0}_grid_{1}".format(frameLayer.name(), id_value)
+        gridLayer = self.createGridCacheFileLayer(frameLayer.crs(), layerName)
+        if gridLayer is None:
+            gridLayer = QgsVectorLayer(
+                "LineString?crs={0}".format(frameLayer.crs().authid()),
+                layerName,
+                "memory",
+            )
+        gridLayer.setCustomProperty("dsgtools/grid_frame", frameKey)
+        QgsProject.instance().addMapLayer(gridLayer, addToLegend=False)
+        QgsProject.instance().layerTreeRoot().insertLayer(0, gridLayer)
+        return gridLayer
+
+    def gridCachePath(self):
+        """
+        Returns the GeoPackage that stores the grid layers: next to the
+        project file when the project is saved, in the processing temporary
+        folder otherwise.
+        :return: (str) path to the GeoPackage.
+        """
+        project = QgsProject.instance()
+        if project.fileName():
+            return os.path.join(
+                project.absolutePath(),
+                "{0}_grid_cache.gpkg".format(project.baseName()),
+            )
+        return os.path.join(QgsProcessingUtils.tempFolder(), "dsgtools_grid_cache.gpkg")
+
+    def createGridCacheFileLayer(self, crs, layerName):
+        """
+        Creates (or overwrites) an empty line table named after layerName in
+        the grid cache GeoPackage and loads it.
+        :param crs: (QgsCoordinateReferenceSystem) grid crs;
+        :param layerName: (str) name of the grid layer;
+        :return: (QgsVectorLayer) the loaded layer or None on failure.
+        """
+        path = self.gridCachePath()
+        tableName = re.sub(r"\W+", "_", layerName).lower()
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "GPKG"
+        options.layerName = tableName
+        options.actionOnExistingFile = (
+            QgsVectorFileWriter.CreateOrOverwriteLayer
+            if os.path.exists(path)
+            else QgsVectorFileWriter.CreateOrOverwriteFile
+        )
+        writer = QgsVectorFileWriter.create(
+            path,
+            QgsFields(),
+            QgsWkbTypes.LineString,
+            crs,
+            QgsProject.instance().transformContext(),
+            options,
+        )
+        hasError = writer.hasError() != QgsVectorFileWriter.NoError
+        errorMessage = writer.errorMessage()
+        del writer
+        gridLayer = (
+            None
+            if hasError
+            else QgsVectorLayer(
+                "{0}|layername={1}".format(path, tableName), layerName, "ogr"
+            )
+        )
+        if gridLayer is None or not gridLayer.isValid():
+            QgsMessageLog.logMessage(
+                "Could not store the grid in {0} ({1}); using a memory layer "
+                "that will not be saved with the project.".format(path, errorMessage),
+                "DSGTools Plugin",
+                Qgis.Warning,
+            )
+            return None
+        return gridLayer
+
+    def populateGridCacheLayer(self, gridLayer, gridGeometryList):
+        provider = gridLayer.dataProvider()
+        provider.truncate()
+        featureList = []
+        for geom in gridGeometryList:
+            feat = QgsFeature(gridLayer.fields())
+            feat.setGeometry(geom)
+            featureList.append(feat)
+        provider.addFeatures(featureList)
+        gridLayer.updateExtents()
+
     def styleCreator(
         self,
         layer,
@@ -1432,10 +1293,7 @@ class GridAndLabelCreator(object):
             QgsProject.instance(),
         )
 
-        # Defining UTM Grid Symbology Type
-        renderer = layer.renderer()
-        properties = {"color": "black"}
-        grid_symb = QgsFillSymbol.createSimple(properties)
+        # Defining Frame Symbology Type
         symb_out = QgsSimpleFillSymbolLayer()
         symb_out.setStrokeColor(QColor("black"))
         symb_out.setFillColor(QColor("white"))
@@ -1450,61 +1308,80 @@ class GridAndLabelCreator(object):
         ymin_UTM = float(bound_UTM_bb.split()[2])
         xmax_UTM = float(bound_UTM_bb.split()[3])
         ymax_UTM = float(bound_UTM_bb.split()[4])
-
         if grid_spacing > 0:
             UTM_num_x = floor(xmax_UTM / grid_spacing) - floor(xmin_UTM / grid_spacing)
             UTM_num_y = floor(ymax_UTM / grid_spacing) - floor(ymin_UTM / grid_spacing)
-            # Generating Vertical Lines
-            for x in range(1, UTM_num_x + 1):
-                grid_symb = self.utm_symb_generator(
-                    grid_spacing,
-                    trUTMLL,
-                    trLLUTM,
-                    grid_symb,
-                    properties,
-                    geo_number_x,
-                    geo_number_y,
-                    UTM_num_x,
-                    UTM_num_y,
-                    x,
-                    0,
-                    geo_bound_bb,
-                    bound_UTM_bb,
-                    utmcheck,
-                )
-            # Generating Horizontal Lines
-            for y in range(1, UTM_num_y + 1):
-                grid_symb = self.utm_symb_generator(
-                    grid_spacing,
-                    trUTMLL,
-                    trLLUTM,
-                    grid_symb,
-                    properties,
-                    geo_number_x,
-                    geo_number_y,
-                    UTM_num_x,
-                    UTM_num_y,
-                    0,
-                    y,
-                    geo_bound_bb,
-                    bound_UTM_bb,
-                    utmcheck,
-                )
 
-        """ Creating Geo Grid """
-        grid_symb = self.geoGridcreator(
-            grid_symb,
-            geo_bound_bb,
+        gridLayer = self.getGridCacheLayer(layer_bound, id_value)
+        cacheKey = self.gridCacheKey(
+            feature_bound.geometry(),
+            grid_spacing,
             geo_number_x,
             geo_number_y,
             scale,
             utmcheck,
-            trLLUTM,
         )
+        # an empty layer is a miss, e.g. a memory layer restored by a project
+        if (
+            gridLayer.customProperty("dsgtools/grid_cache_key") != cacheKey
+            or gridLayer.featureCount() == 0
+        ):
+            gridGeometryList = []
+            if grid_spacing > 0:
+                # Generating Vertical Lines
+                for x in range(1, UTM_num_x + 1):
+                    gridGeometryList.append(
+                        self.utmGridLineGenerator(
+                            grid_spacing,
+                            trUTMLL,
+                            trLLUTM,
+                            UTM_num_x,
+                            UTM_num_y,
+                            x,
+                            0,
+                            geo_bound_bb,
+                            bound_UTM_bb,
+                            utmcheck,
+                        )
+                    )
+                # Generating Horizontal Lines
+                for y in range(1, UTM_num_y + 1):
+                    gridGeometryList.append(
+                        self.utmGridLineGenerator(
+                            grid_spacing,
+                            trUTMLL,
+                            trLLUTM,
+                            UTM_num_x,
+                            UTM_num_y,
+                            0,
+                            y,
+                            geo_bound_bb,
+                            bound_UTM_bb,
+                            utmcheck,
+                        )
+                    )
+
+            """ Creating Geo Grid """
+            gridGeometryList += self.geoGridcreator(
+                geo_bound_bb,
+                geo_number_x,
+                geo_number_y,
+                scale,
+                utmcheck,
+                trLLUTM,
+            )
+            self.populateGridCacheLayer(gridLayer, gridGeometryList)
+            gridLayer.setCustomProperty("dsgtools/grid_cache_key", cacheKey)
 
         """ Rendering UTM and Geographic Grid """
-        # Changing UTM Grid Color
-        grid_symb.setColor(color)
+        # Grid lines are plain features of the cache layer, so rendering does
+        # not depend on the number of grid ticks.
+        grid_line_symb = QgsLineSymbol.createSimple({"color": "black"})
+        grid_line_symb.setWidth(0.05)
+        grid_line_symb.setColor(color)
+        gridLayer.setRenderer(QgsSingleSymbolRenderer(grid_line_symb))
+        gridLayer.triggerRepaint()
+        grid_symb = QgsFillSymbol.createSimple({"color": "black"})
         grid_symb.changeSymbolLayer(0, symb_out)
         # Creating Rule Based Renderer (Rule For The Other Features)
         properties = {"color": "white"}
@@ -60,6 +60,13 @@ class DbCreator(QObject):
         # Abstract method.
         pass
 
+    def clonesFirstCreatedDb(self):
+        """
+        Returns True if batch creation uses the first created database as
+        template for the next ones.
+        """
+        return True
+
     def buildDatabaseName(self, dbBaseName, prefix=None, sufix=None):
         attrNameList = []
         if prefix:
@@ -99,7 +106,7 @@ class DbCreator(QObject):
                         paramDict=paramDict,
                         parentWidget=self.parentWidget,
                     )
-                    templateDb = dbName
+                    templateDb = dbName if self.clonesFirstCreatedDb() else None
                 else:
                     paramDict["templateDb"] = templateDb
                     newDb = self.createDb(
@@ -132,44 +139,23 @@ class DbCreator(QObject):
     def createDbFromMIList(
         self, miList, srid, prefix=None, sufix=None, createFrame=False, paramDict=dict()
     ):
-        outputDbDict = dict()
-        errorDict = dict()
-        templateDb = None
-        if self.parentWidget:
-            progress = ProgressWidget(
-                1,
-                2 * len(miList) + 1,
-                self.tr("Creating databases... "),
-                parent=self.parentWidget,
-            )
-            progress.initBar()
-            progress.step()
-        for mi in miList:
-            dbName = self.buildDatabaseName(mi, prefix, sufix)
-            try:
-                if not templateDb:
-                    newDb = self.createDb(
-                        dbName, srid, paramDict, parentWidget=self.parentWidget
-                    )
-                    templateDb = dbName
-                else:
-                    paramDict["templateDb"] = templateDb
-                    newDb = self.createDb(
-                        dbName, srid, paramDict, parentWidget=self.parentWidget
-                    )
-                outputDbDict[dbName] = newDb
-            except Exception as e:
-                if dbName not in list(errorDict.keys()):
-                    errorDict[dbName] = ":".join(e.args)
-                else:
-                    errorDict[dbName] += "\n" + ":".join(e.args)
-            if self.parentWidget:
-                progress.step()
+        dbNameMiDict = {self.buildDatabaseName(mi, prefix, sufix): mi for mi in miList}
+        outputDbDict, errorDict = self.batchCreateDb(
+            list(dbNameMiDict.keys()), srid, paramDict=paramDict
+        )
         if createFrame:
+            if self.parentWidget:
+                progress = ProgressWidget(
+                    1,
+                    len(outputDbDict),
+                    self.tr("Creating frames... "),
+                    parent=self.parentWidget,
+                )
+                progress.initBar()
             for dbName in list(outputDbDict.keys()):
                 try:
+                    mi = dbNameMiDict[dbName]
                     scale = self.scaleMIDict[len(mi.split("-"))]
-                    mi = [i for i in miList if i in dbName][0]
                     outputDbDict[dbName].createFrame(
                         "mi", scale, mi, paramDict=paramDict
                     )
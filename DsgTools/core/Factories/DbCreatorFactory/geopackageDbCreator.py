@@ -21,9 +21,12 @@
  ***************************************************************************/
 """
 
-import os, sqlite3
+import concurrent.futures
+import os, shutil, sqlite3
 from os.path import expanduser
 
+from qgis.core import QgsCoordinateReferenceSystem
+
 from DsgTools.core.Factories.DbFactory.dbFactory import DbFactory
 from DsgTools.core.Factories.DbCreatorFactory.dbCreator import DbCreator
 from DsgTools.gui.CustomWidgets.BasicInterfaceWidgets.progressWidget import (
@@ -36,6 +39,7 @@ class GeopackageDbCreator(DbCreator):
     def __init__(self, createParam, parentWidget=None):
         super(GeopackageDbCreator, self).__init__(createParam)
         self.parentWidget = parentWidget
+        self.maxWorkers = max(1, os.cpu_count() - 1)
 
     def instantiateNewDb(self, dbPath):
         newDb = self.dbFactory.createDbFactory(DsgEnums.DriverGeopackage)
@@ -70,29 +74,20 @@ class GeopackageDbCreator(DbCreator):
         return ""
 
     def createDb(self, dbName, srid, paramDict=dict(), parentWidget=None):
-        destination = os.path.join(self.outputDir, dbName + ".gpkg")
         if "version" not in list(paramDict.keys()):
             raise Exception("Undefined database version")
         edgvPath = self.getTemplateLocation(paramDict["version"])
-        f = open(edgvPath, "rb")
-        g = open(destination, "wb")
-        x = f.readlines()
         if parentWidget:
             progress = ProgressWidget(
                 1,
-                len(x) + 2,
+                2,
                 self.tr("Creating Geopackage {0}... ").format(dbName),
                 parent=parentWidget,
             )
             progress.initBar()
-        for i in x:
-            g.write(i)
-            if parentWidget:
-                progress.step()
-        g.close()
-        f.close()
-        # TODO: put defineSrid into AbstractDb
-        self.defineSrid(destination, srid)
+        destination = self.createFile(
+            dbName, srid, edgvPath, self.getSrsDefinition(srid)
+        )
         if parentWidget:
             progress.step()
         newDb = self.instantiateNewDb(destination)
@@ -100,12 +95,111 @@ class GeopackageDbCreator(DbCreator):
             progress.step()
         return newDb
 
-    def defineSrid(self, destination, srid):
+    def createFile(self, dbName, srid, templatePath, srsDefinition=None):
+        """
+        Clones the template into the output dir and sets its srid. It does
+        not use Qt objects, so it may run on worker threads.
+        :return: (str) path to the new file.
+        """
+        destination = os.path.join(self.outputDir, dbName + ".gpkg")
+        self.cloneTemplate(templatePath, destination)
+        # TODO: put defineSrid into AbstractDb
+        self.defineSrid(destination, srid, srsDefinition=srsDefinition)
+        return destination
+
+    def cloneTemplate(self, templatePath, destination, useBackupApi=False):
+        """
+        Copies the template file in blocks. With useBackupApi, the SQLite
+        online backup API is used instead, which gives a consistent copy
+        even if the template is open elsewhere.
+        """
+        if not useBackupApi:
+            shutil.copyfile(templatePath, destination)
+            return
+        source = sqlite3.connect(templatePath)
+        target = sqlite3.connect(destination)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+    def getSrsDefinition(self, srid):
+        """
+        Returns the gpkg_spatial_ref_sys row of srid, or None if srid is not
+        a valid EPSG code.
+        """
+        crs = QgsCoordinateReferenceSystem("EPSG:{0}".format(srid))
+        if not crs.isValid():
+            return None
+        return (crs.description(), srid, "EPSG", srid, crs.toWkt())
+
+    def defineSrid(self, destination, srid, srsDefinition=None):
+        """
+        Sets srid on the geometry columns and on the feature contents of
+        the file, in a single transaction. srsDefinition is inserted into
+        gpkg_spatial_ref_sys when the template does not have srid.
+        """
         con = sqlite3.connect(destination)
-        cursor = con.cursor()
-        cursor.execute(
-            "UPDATE gpkg_geometry_columns SET srs_id={srid}".format(srid=srid)
-        )
-        con.commit()
-        cursor.close()
-        con.close()
+        try:
+            with con:
+                if srsDefinition is not None:
+                    con.execute(
+                        "INSERT OR IGNORE INTO gpkg_spatial_ref_sys "
+                        "(srs_name, srs_id, organization, organization_coordsys_id, definition) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        srsDefinition,
+                    )
+                con.execute("UPDATE gpkg_geometry_columns SET srs_id = ?", (srid,))
+                con.execute(
+                    "UPDATE gpkg_contents SET srs_id = ?, "
+                    "last_change = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') "
+                    "WHERE data_type = 'features'",
+                    (srid,),
+                )
+        finally:
+            con.close()
+
+    def batchCreateDb(self, dbNameList, srid, paramDict=dict()):
+        """
+        Creates the files on a pool of threads, as copying and patching
+        them is disk bound and releases the GIL. The databases are then
+        instantiated on the calling thread, as Qt sql connections belong to
+        the thread that opens them.
+        """
+        if "version" not in list(paramDict.keys()):
+            return dict(), {
+                dbName: "Undefined database version" for dbName in dbNameList
+            }
+        edgvPath = self.getTemplateLocation(paramDict["version"])
+        srsDefinition = self.getSrsDefinition(srid)
+        outputDbDict = dict()
+        errorDict = dict()
+        if self.parentWidget:
+            progress = ProgressWidget(
+                1,
+                len(dbNameList),
+                self.tr("Creating databases... "),
+                parent=self.parentWidget,
+            )
+            progress.initBar()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers) as pool:
+            futureDict = {
+                pool.submit(
+                    self.createFile, dbName, srid, edgvPath, srsDefinition
+                ): dbName
+                for dbName in dbNameList
+            }
+            for future in concurrent.futures.as_completed(futureDict):
+                dbName = futureDict[future]
+                try:
+                    outputDbDict[dbName] = self.instantiateNewDb(future.result())
+                except Exception as e:
+                    errorDict[dbName] = ":".join(map(str, e.args))
+                if self.parentWidget:
+                    progress.step()
+        return {
+            dbName: outputDbDict[dbName]
+            for dbName in dbNameList
+            if dbName in outputDbDict
+        }, errorDict
@@ -21,6 +21,10 @@
  ***************************************************************************/
 """
 
+import json
+
+from qgis.core import Qgis, QgsMessageLog
+
 from .dbCreator import DbCreator
 from ....gui.CustomWidgets.BasicInterfaceWidgets.progressWidget import ProgressWidget
 from DsgTools.core.dsgEnums import DsgEnums
@@ -30,6 +34,12 @@ class PostgisDbCreator(DbCreator):
     def __init__(self, createParam, parentWidget=None):
         super(self.__class__, self).__init__(createParam)
         self.parentWidget = parentWidget
+        # creates databases from per (template, srid) templates instead of
+        # updating the srid of every new database
+        self.useSridTemplateCache = True
+
+    def clonesFirstCreatedDb(self):
+        return not self.useSridTemplateCache
 
     def instantiateNewDb(self, dbName):
         host = self.abstractDb.db.hostName()
@@ -61,6 +71,76 @@ class PostgisDbCreator(DbCreator):
                 templateDb = self.instantiateNewDb(templateName)
                 templateDb.setStructureFromSql(version, 4674)
 
+    def getSridTemplateName(self, templateName, srid):
+        return "{0}_{1}".format(templateName, srid)
+
+    def getTemplateFingerprint(self, templateName):
+        """
+        Identifies the current state of a master template: its oid changes
+        when it is recreated, its implementation version when its structure
+        is upgraded and its digest when its columns or contents are edited
+        in place.
+        """
+        templateDb = self.instantiateNewDb(templateName)
+        try:
+            try:
+                implementationVersion = templateDb.getImplementationVersion()
+            except Exception:
+                implementationVersion = None
+            digest = templateDb.getStructureDigest()
+        finally:
+            templateDb.closeDatabase()
+        return json.dumps(
+            {
+                "template": templateName,
+                "oid": self.abstractDb.getDbOID(dbName=templateName),
+                "implementationVersion": implementationVersion,
+                "digest": digest,
+            },
+            sort_keys=True,
+        )
+
+    def checkAndCreateSridTemplate(self, templateName, srid, parentWidget=None):
+        """
+        Returns the name of a template database that is a copy of
+        templateName with srid already set. It is built on the first call
+        and rebuilt when templateName changes, as the fingerprint of the
+        master template it was built from is stored on its comment. Returns
+        None when an outdated template cannot be dropped (e.g. the user is
+        not a superuser), so the caller does not use the cache.
+        """
+        sridTemplateName = self.getSridTemplateName(templateName, srid)
+        fingerprint = self.getTemplateFingerprint(templateName)
+        isTemplate = self.abstractDb.checkIfTemplate(sridTemplateName)
+        if isTemplate is not None:
+            if (
+                isTemplate
+                and self.abstractDb.getDatabaseComment(sridTemplateName) == fingerprint
+            ):
+                return sridTemplateName
+            # outdated, or left behind by an interrupted build
+            try:
+                self.abstractDb.dropDatabase(sridTemplateName, dropTemplate=isTemplate)
+            except Exception as e:
+                QgsMessageLog.logMessage(
+                    self.tr(
+                        "Outdated template {0} could not be dropped, databases are created from {1}: {2}"
+                    ).format(sridTemplateName, templateName, e),
+                    "DSGTools Plugin",
+                    Qgis.Warning,
+                )
+                return None
+        self.abstractDb.createDbFromTemplate(
+            sridTemplateName, templateName=templateName, parentWidget=parentWidget
+        )
+        sridTemplateDb = self.instantiateNewDb(sridTemplateName)
+        sridTemplateDb.updateDbSRID(srid, parentWidget=parentWidget)
+        sridTemplateDb.checkAndCreateStyleTable()
+        sridTemplateDb.closeDatabase()
+        self.abstractDb.setDatabaseComment(sridTemplateName, fingerprint)
+        self.abstractDb.setDbAsTemplate(dbName=sridTemplateName)
+        return sridTemplateName
+
     def createDb(self, dbName, srid, paramDict=dict(), parentWidget=None):
         """
         dbName: new database name
@@ -78,6 +158,16 @@ class PostgisDbCreator(DbCreator):
             # 2. if edgv template is not created, create it
             if paramDict["isTemplateEdgv"]:
                 self.checkAndCreateTemplate(paramDict["version"])
+            if self.useSridTemplateCache:
+                # 3. create db from the template with srid already set
+                sridTemplateName = self.checkAndCreateSridTemplate(
+                    paramDict["templateName"], srid, parentWidget=parentWidget
+                )
+                if sridTemplateName is not None:
+                    self.abstractDb.createDbFromTemplate(
+                        dbName, templateName=sridTemplateName, parentWidget=parentWidget
+                    )
+                    return self.instantiateNewDb(dbName)
             # 3. create db from template
             self.abstractDb.createDbFromTemplate(
                 dbName,
@@ -2099,9 +2099,9 @@ class PostgisDb(AbstractDb):
         while query.next():
             return query.value(0)
 
-    def getDbOID(self):
+    def getDbOID(self, dbName=None):
         self.checkAndOpenDb()
-        sql = self.gen.getDbOID(self.db.databaseName())
+        sql = self.gen.getDbOID(dbName or self.db.databaseName())
         query = QSqlQuery(sql, self.db)
         if not query.isActive():
             raise Exception(
@@ -3509,6 +3509,42 @@ class PostgisDb(AbstractDb):
         while query.next():
             return query.value(0)
 
+    def getDatabaseComment(self, dbName):
+        self.checkAndOpenDb()
+        sql = self.gen.getDatabaseComment(dbName)
+        query = QSqlQuery(sql, self.db)
+        if not query.isActive():
+            raise Exception(
+                self.tr("Problem getting database comment: ") + query.lastError().text()
+            )
+        while query.next():
+            return query.value(0)
+
+    def setDatabaseComment(self, dbName, comment):
+        self.checkAndOpenDb()
+        sql = self.gen.setDatabaseComment(dbName, comment)
+        query = QSqlQuery(self.db)
+        if not query.exec_(sql):
+            raise Exception(
+                self.tr("Problem setting database comment: ") + query.lastError().text()
+            )
+
+    def getStructureDigest(self):
+        """
+        Returns a md5 digest of the columns of the database, of the storage
+        files of its relations (changed by truncates and table rewrites) and
+        of its row change counters.
+        """
+        self.checkAndOpenDb()
+        sql = self.gen.getStructureDigest()
+        query = QSqlQuery(sql, self.db)
+        if not query.isActive():
+            raise Exception(
+                self.tr("Problem getting structure digest: ") + query.lastError().text()
+            )
+        while query.next():
+            return query.value(0)
+
     def getCreationSqlPath(self, version):
         currentPath = os.path.dirname(__file__)
         edgvPath = ""
@@ -1530,6 +1530,22 @@ class PostGISSqlGenerator(SqlGenerator):
         )
         return sql
 
+    def getDatabaseComment(self, dbName):
+        sql = """select shobj_description(oid, 'pg_database') from pg_database where datname = '{0}'""".format(
+            dbName
+        )
+        return sql
+
+    def setDatabaseComment(self, dbName, comment):
+        sql = """COMMENT ON DATABASE "{0}" IS '{1}';""".format(
+            dbName, comment.replace("'", "''")
+        )
+        return sql
+
+    def getStructureDigest(self):
+        sql = """select md5(concat_ws('|', (select string_agg(concat_ws(':', table_schema, table_name, column_name, data_type, column_default, is_nullable), ',' order by table_schema, table_name, ordinal_position) from information_schema.columns where table_schema not in ('pg_catalog', 'information_schema')), (select string_agg(concat_ws(':', n.nspname, c.relname, c.relfilenode), ',' order by n.nspname, c.relname) from pg_class c join pg_namespace n on n.oid = c.relnamespace where n.nspname not in ('pg_catalog', 'information_schema', 'pg_toast')), (select sum(n_tup_ins + n_tup_upd + n_tup_del) from pg_stat_user_tables)))"""
+        return sql
+
     def alterSearchPath(self, dbName, version):
         if version == "2.1.3":
             sql = "ALTER DATABASE \"{0}\" SET search_path = \"$user\", public, topology,'cb','complexos','dominios';".format(
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-16
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from collections import defaultdict, deque
+
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
+
+from .preparedGeometryIndex import PreparedGeometryIndex
+
+
+class ContourTree(object):
+    """
+    Containment tree of the areas enclosed by contour rings (closed
+    contours or contours closed by the frame boundary).
+
+    Each node is an area; its parent is the smallest area whose filled
+    outer ring contains the filled outer ring of the node. The tree is built
+    once, with prepared geometries, and the contour stacking check is done
+    as a traversal instead of pairwise geometric tests.
+    """
+
+    def __init__(self):
+        self.shellIndex = PreparedGeometryIndex()
+        self.areaDict = dict()
+        self.dataDict = dict()
+        self.parentDict = dict()
+        self.childrenDict = defaultdict(list)
+
+    def addNode(self, nodeId, geom, data=None):
+        """
+        Adds an area to the tree. The tree must be built after all areas are
+        added.
+        :param nodeId: (int) node id, usually the id of the area feature.
+        :param geom: (QgsGeometry) polygon of the area.
+        :param data: (object) data attached to the node.
+        """
+        if geom is None or geom.isNull() or geom.isEmpty():
+            return
+        shell = geom.removeInteriorRings()
+        self.shellIndex.addGeometry(nodeId, shell)
+        self.areaDict[nodeId] = shell.area()
+        self.dataDict[nodeId] = data
+
+    def addFeatures(self, featureIterable, dataFunc=None, feedback=None):
+        for feat in featureIterable:
+            if feedback is not None and feedback.isCanceled():
+                break
+            self.addNode(
+                feat.id(),
+                feat.geometry(),
+                data=feat if dataFunc is None else dataFunc(feat),
+            )
+
+    def build(self, feedback=None):
+        """
+        Finds the parent of every node. Nodes are visited from the smallest
+        to the largest area and candidates are tested from the smallest to
+        the largest, so the first candidate that contains the node is its
+        parent.
+        """
+        self.parentDict.clear()
+        self.childrenDict.clear()
+        nNodes = len(self.areaDict)
+        size = 100 / nNodes if nNodes else 0
+        for current, nodeId in enumerate(
+            sorted(self.areaDict, key=lambda x: self.areaDict[x])
+        ):
+            if feedback is not None and feedback.isCanceled():
+                break
+            shell = self.shellIndex.geometry(nodeId)
+            nodeArea = self.areaDict[nodeId]
+            candidateIds = sorted(
+                (
+                    i
+                    for i in self.shellIndex.candidateIds(shell.boundingBox())
+                    if self.areaDict[i] > nodeArea
+                ),
+                key=lambda x: self.areaDict[x],
+            )
+            shellAbstract = shell.constGet()
+            parentId = None
+            for i in candidateIds:
+                algProfiler.increment(algProfiler.GEOMETRY_PREDICATES)
+                if self.shellIndex.engine(i).contains(shellAbstract):
+                    parentId = i
+                    break
+            self.parentDict[nodeId] = parentId
+            self.childrenDict[parentId].append(nodeId)
+            if feedback is not None:
+                feedback.setProgress(current * size)
+        return self
+
+    def parent(self, nodeId):
+        return self.parentDict.get(nodeId)
+
+    def children(self, nodeId):
+        return self.childrenDict.get(nodeId, [])
+
+    def roots(self):
+        return self.children(None)
+
+    def data(self, nodeId):
+        return self.dataDict[nodeId]
+
+    def shell(self, nodeId):
+        return self.shellIndex.geometry(nodeId)
+
+    def area(self, nodeId):
+        return self.areaDict[nodeId]
+
+    def traverse(self):
+        """
+        Yields (nodeId, parentId) in breadth first order, from the outermost
+        areas to the innermost ones.
+        """
+        queue = deque((nodeId, None) for nodeId in self.roots())
+        while queue:
+            nodeId, parentId = queue.popleft()
+            yield nodeId, parentId
+            queue.extend((childId, nodeId) for childId in self.children(nodeId))
+
+    def __len__(self):
+        return len(self.areaDict)
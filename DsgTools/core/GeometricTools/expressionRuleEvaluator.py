@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-28
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.core import (
+    QgsExpression,
+    QgsExpressionContext,
+    QgsExpressionContextUtils,
+    QgsExpressionNode,
+    QgsExpressionNodeBinaryOperator,
+    QgsExpressionNodeUnaryOperator,
+    QgsFeatureRequest,
+    QgsFields,
+    QgsSettings,
+)
+
+
+class ExpressionRuleEvaluator(object):
+    """
+    Tells which filter expressions (rules) are matched by at least one
+    feature of a layer, without using the layer selection.
+
+    On PostGIS and GeoPackage layers, rules made only of provider columns,
+    literals and the operators every QGIS expression compiler translates are
+    run as a request limited to one feature, which the provider sends to the
+    database as a WHERE ... LIMIT 1 query. The other rules of the layer are
+    evaluated together, in a single pass over its features that stops once
+    every rule is matched.
+    """
+
+    compiledProviders = ("postgres", "ogr")
+    compiledBinaryOperators = (
+        QgsExpressionNodeBinaryOperator.boOr,
+        QgsExpressionNodeBinaryOperator.boAnd,
+        QgsExpressionNodeBinaryOperator.boEQ,
+        QgsExpressionNodeBinaryOperator.boNE,
+        QgsExpressionNodeBinaryOperator.boLE,
+        QgsExpressionNodeBinaryOperator.boGE,
+        QgsExpressionNodeBinaryOperator.boLT,
+        QgsExpressionNodeBinaryOperator.boGT,
+        QgsExpressionNodeBinaryOperator.boLike,
+        QgsExpressionNodeBinaryOperator.boNotLike,
+        QgsExpressionNodeBinaryOperator.boIs,
+        QgsExpressionNodeBinaryOperator.boIsNot,
+        QgsExpressionNodeBinaryOperator.boPlus,
+        QgsExpressionNodeBinaryOperator.boMinus,
+        QgsExpressionNodeBinaryOperator.boMul,
+    )
+    compiledUnaryOperators = (
+        QgsExpressionNodeUnaryOperator.uoNot,
+        QgsExpressionNodeUnaryOperator.uoMinus,
+    )
+
+    def matchingRules(self, layer, ruleList, feedback=None):
+        """
+        :param layer: (QgsVectorLayer) layer to be checked.
+        :param ruleList: (list) filter expressions.
+        :param feedback: (QgsFeedback) cancels the evaluation.
+        :return: (dict) {rule: True if at least one feature matches it}.
+            Invalid rules match nothing.
+        """
+        resultDict = dict()
+        pendingList = []
+        canCompile = self.canCompile(layer)
+        for rule in dict.fromkeys(ruleList):
+            if feedback is not None and feedback.isCanceled():
+                return resultDict
+            expression = QgsExpression(rule)
+            if expression.hasParserError():
+                resultDict[rule] = False
+            elif canCompile and self.isCompilable(expression, layer):
+                resultDict[rule] = self.hasMatch(layer, expression)
+            else:
+                pendingList.append(rule)
+        resultDict.update(self.singlePassMatch(layer, pendingList, feedback=feedback))
+        return resultDict
+
+    def canCompile(self, layer):
+        if layer.providerType() not in self.compiledProviders:
+            return False
+        if (
+            layer.providerType() == "ogr"
+            and layer.dataProvider().storageType() != "GPKG"
+        ):
+            return False
+        return QgsSettings().value("/qgis/compileExpressions", True, type=bool)
+
+    def isCompilable(self, expression, layer):
+        """
+        Checks, conservatively, if every node of expression is translated to
+        sql by the expression compilers of the PostGIS and OGR providers.
+        """
+        providerFieldNames = {
+            field.name()
+            for idx, field in enumerate(layer.fields())
+            if layer.fields().fieldOrigin(idx) == QgsFields.OriginProvider
+        }
+        nodeList = [expression.rootNode()]
+        while nodeList:
+            node = nodeList.pop()
+            nodeType = node.nodeType()
+            if nodeType == QgsExpressionNode.ntLiteral:
+                continue
+            if nodeType == QgsExpressionNode.ntColumnRef:
+                if node.name() not in providerFieldNames:
+                    return False
+            elif nodeType == QgsExpressionNode.ntBinaryOperator:
+                if node.op() not in self.compiledBinaryOperators:
+                    return False
+                nodeList += [node.opLeft(), node.opRight()]
+            elif nodeType == QgsExpressionNode.ntUnaryOperator:
+                if node.op() not in self.compiledUnaryOperators:
+                    return False
+                nodeList.append(node.operand())
+            elif nodeType == QgsExpressionNode.ntInOperator:
+                nodeList.append(node.node())
+                nodeList += node.list().list()
+            else:
+                return False
+        return True
+
+    def hasMatch(self, layer, expression):
+        request = (
+            QgsFeatureRequest()
+            .setFilterExpression(expression.expression())
+            .setFlags(QgsFeatureRequest.NoGeometry)
+            .setNoAttributes()
+            .setLimit(1)
+        )
+        for _ in layer.getFeatures(request):
+            return True
+        return False
+
+    def singlePassMatch(self, layer, ruleList, feedback=None):
+        """
+        Evaluates every rule of ruleList in one pass over the features of
+        layer, fetching only the attributes and geometries they need.
+        """
+        if not ruleList:
+            return dict()
+        context = QgsExpressionContext(
+            QgsExpressionContextUtils.globalProjectLayerScopes(layer)
+        )
+        pendingDict = dict()
+        columnSet = set()
+        needsGeometry = False
+        for rule in ruleList:
+            expression = QgsExpression(rule)
+            expression.prepare(context)
+            pendingDict[rule] = expression
+            columnSet |= expression.referencedColumns()
+            needsGeometry = needsGeometry or expression.needsGeometry()
+        request = QgsFeatureRequest()
+        if not needsGeometry:
+            request.setFlags(QgsFeatureRequest.NoGeometry)
+        if QgsFeatureRequest.ALL_ATTRIBUTES not in columnSet:
+            request.setSubsetOfAttributes(list(columnSet), layer.fields())
+        resultDict = {rule: False for rule in ruleList}
+        for feat in layer.getFeatures(request):
+            if feedback is not None and feedback.isCanceled():
+                break
+            context.setFeature(feat)
+            for rule, expression in list(pendingDict.items()):
+                if expression.evaluate(context):
+                    resultDict[rule] = True
+                    pendingDict.pop(rule)
+            if not pendingDict:
+                break
+        return resultDict
@@ -23,8 +23,8 @@
 from __future__ import absolute_import
 from builtins import range
 import itertools
-import sys
-import os
+from collections import deque
+
 from qgis.core import (
     QgsMessageLog,
     QgsVectorLayer,
@@ -47,8 +47,8 @@ from qgis.PyQt.Qt import QObject, QVariant
 
 from .geometryHandler import GeometryHandler
 from .attributeHandler import AttributeHandler
+from .preparedGeometryIndex import PreparedGeometryIndex
 from DsgTools.core.Utils.FrameTools.map_index import UtmGrid
-import concurrent.futures
 
 
 class FeatureHandler(QObject):
@@ -405,59 +405,160 @@ class FeatureHandler(QObject):
         predicate=None,
     ):
         """
-        TODO: Progress
+        Appends to featureList the systematic grid features of stopScale
+        that satisfy predicate against the features of inputLyr (see
+        iterateSystematicGridFeaturesWithConstraint).
+        """
+        featureList.extend(
+            self.iterateSystematicGridFeaturesWithConstraint(
+                inputLyr,
+                stopScale,
+                coordinateTransformer,
+                fields,
+                xSubdivisions=xSubdivisions,
+                ySubdivisions=ySubdivisions,
+                feedback=feedback,
+                predicate=predicate,
+            )
+        )
+
+    def iterateSystematicGridFeaturesWithConstraint(
+        self,
+        inputLyr,
+        stopScale,
+        coordinateTransformer,
+        fields,
+        xSubdivisions=3,
+        ySubdivisions=3,
+        feedback=None,
+        predicate=None,
+    ):
+        """
+        Yields the systematic grid features of stopScale that satisfy
+        predicate (a QgsGeometryEngine predicate that implies intersection,
+        such as intersects, within, contains or overlaps) against the
+        features of inputLyr.
+        Cells are visited breadth first, from the 1:1,000,000 cells that
+        cover the layer extent, and tested against prepared engines of the
+        constraint geometries. A cell disjoint from every constraint
+        geometry is pruned with its whole subtree. When the predicate is
+        intersects or within, the subtree of a cell fully inside a
+        constraint geometry is output without further tests.
+        :param inputLyr: (QgsVectorLayer) constraint layer;
+        :param stopScale: (int) scale of the output frames (e.g. 25 for 1:25,000);
+        :param coordinateTransformer: (QgsCoordinateTransform) transform from
+            the geographic crs to the output crs;
+        :param fields: (QgsFields) fields of the output features;
+        :param feedback: (QgsProcessingFeedback) processing feedback;
+        :param predicate: (str) predicate name, intersects if None.
         """
-        if feedback is not None and feedback.isCanceled():
-            return
         predicate = "intersects" if predicate is None else predicate
         multiStepFeedback = QgsProcessingMultiStepFeedback(2, feedback)
         multiStepFeedback.setCurrentStep(0)
-        multiStepFeedback.pushInfo(self.tr("Creating spatial index"))
-        spatialIdx, idDict = self.buildSpatialIndexAndIdDict(
-            inputLyr, feedback=multiStepFeedback
+        multiStepFeedback.pushInfo(self.tr("Preparing constraint geometries"))
+        constraintIndex = PreparedGeometryIndex(
+            inputLyr.getFeatures(), feedback=multiStepFeedback
         )
         multiStepFeedback.pushInfo(self.tr("Getting candidate start indexes"))
-        xmin, ymin, xmax, ymax = self.getLyrUnprojectedGeographicBounds(inputLyr)
-        inomenList = self.utmGrid.get_INOM_range_from_BB(xmin, ymin, xmax, ymax)
+        xmin, xmax, ymin, ymax = self.getLyrUnprojectedGeographicBounds(inputLyr)
+        startInomenList = sorted(
+            self.utmGrid.get_INOM_range_from_BB(xmin, ymin, xmax, ymax)
+        )
         multiStepFeedback.setCurrentStep(1)
         multiStepFeedback.pushInfo(self.tr("Building grid"))
-        gridMultistepFeedback = QgsProcessingMultiStepFeedback(
-            len(inomenList), multiStepFeedback
-        )
-        constraintDict = {
-            "spatialIdx": spatialIdx,
-            "idDict": idDict,
-            "predicate": predicate,
-        }
-        sys.setrecursionlimit(10**7)
-
-        def compute(x):
-            self.getSystematicGridFeatures(
-                featureList,
-                x,
-                stopScale,
+        subtreeIsInside = predicate in ("intersects", "within")
+        size = 100 / len(startInomenList) if startInomenList else 0
+
+        def getFrame(index):
+            return self.createGridItem(
+                index,
                 coordinateTransformer,
-                fields,
+                None,
                 xSubdivisions=xSubdivisions,
                 ySubdivisions=ySubdivisions,
-                constraintDict=constraintDict,
-                feedback=gridMultistepFeedback,
             )
 
-        pool = concurrent.futures.ThreadPoolExecutor(os.cpu_count())
-        futures = []
-        current_idx = 0
-        for inomen in inomenList:
-            # gridMultistepFeedback.setCurrentStep(i)
-            if gridMultistepFeedback.isCanceled():
-                break
-            futures.append(pool.submit(compute, inomen))
-
-        for x in concurrent.futures.as_completed(futures):
-            if gridMultistepFeedback.isCanceled():
-                break
-            gridMultistepFeedback.setCurrentStep(current_idx)
-            current_idx += 1
+        for current, startInomen in enumerate(startInomenList):
+            queue = deque([startInomen])
+            while queue:
+                if multiStepFeedback.isCanceled():
+                    return
+                index = queue.popleft()
+                frameGeom = getFrame(index)
+                intersectingIds, isInside = self.getGridCellConstraintRelation(
+                    frameGeom, constraintIndex, checkInside=subtreeIsInside
+                )
+                if not intersectingIds:
+                    continue
+                if self.utmGrid.getScale(index) == stopScale:
+                    if self.gridCellSatisfiesPredicate(
+                        frameGeom, constraintIndex, intersectingIds, predicate, isInside
+                    ):
+                        yield self.getNewGridFeat(index, frameGeom, fields)
+                    continue
+                if isInside and subtreeIsInside:
+                    for childIndex in self.iterateGridDescendants(index, stopScale):
+                        if multiStepFeedback.isCanceled():
+                            return
+                        yield self.getNewGridFeat(
+                            childIndex, getFrame(childIndex), fields
+                        )
+                    continue
+                queue.extend(self.getGridChildren(index))
+            multiStepFeedback.setProgress(size * (current + 1))
+
+    def getGridChildren(self, index):
+        scaleId = self.utmGrid.getScaleIdFromiNomen(index)
+        return [
+            "{oldInomem}-{newPart}".format(oldInomem=index, newPart=sufix)
+            for sufix in itertools.chain.from_iterable(
+                self.utmGrid.scaleText[scaleId + 1]
+            )
+        ]
+
+    def iterateGridDescendants(self, index, stopScale):
+        """
+        Yields the indexes of stopScale inside the cell of index, in breadth
+        first order.
+        """
+        queue = deque([index])
+        while queue:
+            current = queue.popleft()
+            if self.utmGrid.getScale(current) == stopScale:
+                yield current
+                continue
+            queue.extend(self.getGridChildren(current))
+
+    def getGridCellConstraintRelation(self, frameGeom, constraintIndex, checkInside):
+        """
+        Returns the ids of the constraint geometries that intersect the cell
+        and whether the cell is fully inside one of them.
+        """
+        frameAbstract = frameGeom.constGet()
+        intersectingIds = [
+            fid
+            for fid in constraintIndex.candidateIds(frameGeom.boundingBox())
+            if constraintIndex.engine(fid).intersects(frameAbstract)
+        ]
+        isInside = checkInside and any(
+            constraintIndex.engine(fid).contains(frameAbstract)
+            for fid in intersectingIds
+        )
+        return intersectingIds, isInside
+
+    def gridCellSatisfiesPredicate(
+        self, frameGeom, constraintIndex, intersectingIds, predicate, isInside
+    ):
+        if predicate == "intersects":
+            return True
+        if predicate == "within":
+            return isInside
+        engine = QgsGeometry.createGeometryEngine(frameGeom.constGet())
+        engine.prepareGeometry()
+        return any(
+            getattr(engine, predicate)(constraintIndex.geometry(fid).constGet())
+            for fid in intersectingIds
+        )
 
     def buildSpatialIndexAndIdDict(self, inputLyr, feedback=None, featureRequest=None):
         """
@@ -34,6 +34,7 @@ from processing.tools import dataobjects
 
 import concurrent.futures
 
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
 from DsgTools.core.DSGToolsProcessingAlgs.algRunner import AlgRunner
 from DsgTools.core.Utils.FrameTools.map_index import UtmGrid
 from qgis.analysis import QgsGeometrySnapper, QgsInternalGeometrySnapper
@@ -65,8 +66,10 @@ from qgis.PyQt.Qt import QObject, QVariant
 
 from .featureHandler import FeatureHandler
 from .geometryHandler import GeometryHandler
+from .segmentIndex import SegmentIndex
 
 
+@algProfiler.profileMethods()
 class LayerHandler(QObject):
     def __init__(self, iface=None, parent=None):
         super(LayerHandler, self).__init__()
@@ -88,18 +91,11 @@ class LayerHandler(QObject):
         :param (bool) returnIterator: if true, returns the iterator object;
         :param (bool) returnSize: if true, return the featureList and size.
         """
-        if onlySelected:
-            featureList = (
-                lyr.getSelectedFeatures()
-                if returnIterator
-                else [i for i in lyr.getSelectedFeatures()]
-            )
-            size = lyr.selectedFeatureCount()
-        else:
-            featureList = (
-                lyr.getFeatures() if returnIterator else [i for i in lyr.getFeatures()]
-            )
-            size = lyr.featureCount()
+        iterator = algProfiler.countFeatures(
+            lyr.getSelectedFeatures() if onlySelected else lyr.getFeatures()
+        )
+        featureList = iterator if returnIterator else [i for i in iterator]
+        size = lyr.selectedFeatureCount() if onlySelected else lyr.featureCount()
         if returnSize:
             return featureList, size
         else:
@@ -335,7 +331,7 @@ class LayerHandler(QObject):
                 localTotal = (
                     100 / inputLyr.featureCount() if inputLyr.featureCount() else 0
                 )
-        for current, feature in enumerate(iterator):
+        for current, feature in enumerate(algProfiler.countFeatures(iterator)):
             if feedback and feedback.isCanceled():
                 break
             key = feature[pk] if pk else feature.id()
@@ -352,7 +348,7 @@ class LayerHandler(QObject):
     ):
         iterator = lyr.getFeatures(request) if request else lyr.getFeatures()
         localTotal = 100 / lyr.featureCount() if lyr.featureCount() else 0
-        for current, feat in enumerate(iterator):
+        for current, feat in enumerate(algProfiler.countFeatures(iterator)):
             if feedback:
                 if feedback.isCanceled():
                     break
@@ -1553,7 +1549,7 @@ class LayerHandler(QObject):
         ignoreErrorsOnSameFeat=False,
     ):
         """
-        Identifies vertexes that are too close to a vertex.
+        Identifies vertexes that are too close to an edge.
         :param inputLyr: (QgsVectorLayer) layer to run the identification.
         :param onlySelected: (Boolean) If true, gets only selected layer
         :param tol: (float) search radius
@@ -1561,88 +1557,67 @@ class LayerHandler(QObject):
         """
         if inputLyr.geometryType() == QgsWkbTypes.PointGeometry:
             raise Exception("Vertex near edge not defined for point geometry")
-        algRunner = AlgRunner() if algRunner is None else algRunner
-        context = (
-            dataobjects.createContext(feedback=feedback) if context is None else context
-        )
-        multiStepFeedback = QgsProcessingMultiStepFeedback(3, feedback)
+        multiStepFeedback = QgsProcessingMultiStepFeedback(2, feedback)
         multiStepFeedback.setCurrentStep(0)
-        multiStepFeedback.pushInfo(self.tr("Creating index"))
-        usedInput = (
-            inputLyr
-            if not onlySelected
-            else QgsProcessingFeatureSourceDefinition(inputLyr.id(), True)
-        )
-        incrementedLayer = algRunner.runAddAutoIncrementalField(
-            usedInput, context, feedback=multiStepFeedback
-        )
-        multiStepFeedback.setCurrentStep(1)
         multiStepFeedback.pushInfo(self.tr("Building auxiliar search structures"))
-        edgeSpatialIdx, edgeIdDict = self.buildEdgesAuxStructure(
-            incrementedLayer,
+        segmentIndex = self.buildEdgesAuxStructure(
+            [inputLyr],
+            tol,
+            onlySelected=onlySelected,
             feedback=multiStepFeedback,
-            algRunner=algRunner,
-            context=context,
+            ownerKeyFunc=lambda lyr, feat: feat.id(),
         )
-        multiStepFeedback.setCurrentStep(2)
+        multiStepFeedback.setCurrentStep(1)
         multiStepFeedback.pushInfo(self.tr("Getting flags"))
-        vertexNearEdgeFlagDict = self.getVertexNearEdgeFlagDict(
-            incrementedLayer,
-            edgeSpatialIdx,
-            edgeIdDict,
-            tol,
+        return self.getVertexNearEdgeFlagDict(
+            segmentIndex,
             feedback=multiStepFeedback,
-            algRunner=algRunner,
-            context=context,
             ignoreErrorsOnSameFeat=ignoreErrorsOnSameFeat,
         )
-        return vertexNearEdgeFlagDict
 
     def buildEdgesAuxStructure(
-        self, inputLyr, algRunner=None, feedback=None, context=None
+        self, inputLyrList, tol, onlySelected=False, feedback=None, ownerKeyFunc=None
     ):
         """
-        returns a spatialIndex of lines and a dict of the features
-        :param inputLyr: (QgsVectorLayer) layer to run build the aux structure.
+        returns a SegmentIndex with the vertexes and edges of the layers.
+        Geometries are read directly from the layers, no exploded line layer
+        is built.
+        :param inputLyrList: (list of QgsVectorLayer) line or polygon layers.
+        :param tol: (float) search radius
+        :param onlySelected: (bool) if true, only selected features are used.
         :param feedback (QgsProcessingFeedback) QGIS object to keep track of progress/cancelling option.
-        """
-        nSteps = 3 if inputLyr.geometryType() == QgsWkbTypes.PolygonGeometry else 2
-        algRunner = AlgRunner() if algRunner is None else algRunner
-        context = (
-            dataobjects.createContext(feedback=feedback) if context is None else context
-        )
-        multiStepFeedback = QgsProcessingMultiStepFeedback(nSteps, feedback)
-        currentStep = 0
-        multiStepFeedback.setCurrentStep(currentStep)
-        edgeLyr = (
-            inputLyr
-            if inputLyr.geometryType() == QgsWkbTypes.LineGeometry
-            else algRunner.runPolygonsToLines(
-                inputLyr, context, feedback=multiStepFeedback
+        :param ownerKeyFunc: (function) receives the layer and the feature and
+            returns the key used in the flag dict. Defaults to
+            (layer name, feature id).
+        """
+        ownerKeyFunc = (
+            (lambda lyr, feat: (lyr.name(), feat.id()))
+            if ownerKeyFunc is None
+            else ownerKeyFunc
+        )
+        segmentIndex = SegmentIndex(tol)
+        request = QgsFeatureRequest().setNoAttributes()
+        nLayers = len(inputLyrList)
+        for current, lyr in enumerate(inputLyrList):
+            if feedback is not None and feedback.isCanceled():
+                break
+            iterator = (
+                lyr.getSelectedFeatures(request)
+                if onlySelected
+                else lyr.getFeatures(request)
             )
-        )
-        currentStep += 1
-        multiStepFeedback.setCurrentStep(currentStep)
-        explodedEdges = algRunner.runExplodeLines(
-            edgeLyr, context, feedback=multiStepFeedback
-        )
-        currentStep += 1
-        multiStepFeedback.setCurrentStep(currentStep)
-        spatialIdx, idDict = self.buildSpatialIndexAndIdDict(
-            explodedEdges, feedback=multiStepFeedback
-        )
-        return spatialIdx, idDict
+            segmentIndex.addFeatures(
+                iterator,
+                ownerKeyFunc=partial(ownerKeyFunc, lyr),
+                feedback=feedback,
+            )
+            if feedback is not None:
+                feedback.setProgress(100 * (current + 1) / nLayers)
+        segmentIndex.build()
+        return segmentIndex
 
     def getVertexNearEdgeFlagDict(
-        self,
-        inputLyr,
-        edgeSpatialIdx,
-        edgeIdDict,
-        searchRadius,
-        feedback=None,
-        algRunner=None,
-        context=None,
-        ignoreErrorsOnSameFeat=False,
+        self, segmentIndex, feedback=None, ignoreErrorsOnSameFeat=False
     ):
         """
         returns a dict in the following format:
@@ -1654,58 +1629,36 @@ class LayerHandler(QObject):
 
             }
             }
-        :param inputLyr: (QgsVectorLayer) layer to run build the aux structure.
-        :param edgeSpatialIdx: (QgsSpatialIndex) spatial index to perform the search
-        :param edgeIdDict: (dict) dictionary in the format {featid:QgsFeature}
-        :param searchRadius: (float) search radius
+        A vertex is flagged when it is within the search radius of an edge
+        that does not have it as one of its endpoints.
+        :param segmentIndex: (SegmentIndex) index built by buildEdgesAuxStructure.
         :param feedback (QgsProcessingFeedback) QGIS object to keep track of progress/cancelling option.
+        :param ignoreErrorsOnSameFeat: (bool) if true, edges of the same
+            feature of the vertex are not considered.
         """
         flagDict = defaultdict(lambda: defaultdict(lambda: {"edges": set()}))
-        algRunner = AlgRunner() if algRunner is None else algRunner
-        context = (
-            dataobjects.createContext(feedback=feedback) if context is None else context
-        )
-        multiStepFeedback = QgsProcessingMultiStepFeedback(2, feedback)
-        # step 1: extract vertexes
-        multiStepFeedback.setCurrentStep(0)
-        vertexLyr = algRunner.runExtractVertices(
-            inputLyr, context, feedback=multiStepFeedback
-        )
-        # step 2: for each vertex, get the buffer, the buffer BoundingBox and
-        # assess wich edge intersects the buffer. If there is any, this is a flag
-        multiStepFeedback.setCurrentStep(1)
-        iterator, size = self.getFeatureList(
-            vertexLyr, returnIterator=True, onlySelected=False
-        )
+        size = segmentIndex.vertexCount()
         if size == 0:
             return {}
-        stepSize = 100 / size
-        for current, pointFeat in enumerate(iterator):
-            if multiStepFeedback.isCanceled():
+        edgeGeomDict = dict()
+        for vertexIdxArray, segmentIdxArray, processed in segmentIndex.iterateNearPairs(
+            ignoreSameOwner=ignoreErrorsOnSameFeat
+        ):
+            if feedback is not None and feedback.isCanceled():
                 break
-            pointGeom = pointFeat.geometry()
-            buffer = pointGeom.buffer(searchRadius, -1)
-            bufferBB = buffer.boundingBox()
-            featId = pointFeat["featid"]
-            # pointWkt is used as a key because it is unique and hashable
-            pointWkt = pointGeom.asWkt()
-            for candidateId in edgeSpatialIdx.intersects(bufferBB):
-                if multiStepFeedback.isCanceled():
-                    break
-                edgeGeom = edgeIdDict[candidateId].geometry()
-                # must ignore search within the same feature and
-                # must be with not adjacent edges
-                if pointGeom.touches(edgeGeom) or (
-                    ignoreErrorsOnSameFeat
-                    and featId == edgeIdDict[candidateId]["featid"]
-                    and pointFeat["layer"] == edgeIdDict[candidateId]["layer"]
-                ):
-                    continue
-                if buffer.intersects(edgeGeom):
-                    flagDict[featId][pointWkt]["flagGeom"] = pointGeom
-                    flagDict[featId][pointWkt]["edges"].add(edgeGeom)
-            # make progress
-            multiStepFeedback.setProgress(current * stepSize)
+            for vertexIdx, segmentIdx in zip(
+                vertexIdxArray.tolist(), segmentIdxArray.tolist()
+            ):
+                pointGeom = segmentIndex.vertexGeometry(vertexIdx)
+                # pointWkt is used as a key because it is unique and hashable
+                pointWkt = pointGeom.asWkt()
+                featId = segmentIndex.vertexOwnerKey(vertexIdx)
+                if segmentIdx not in edgeGeomDict:
+                    edgeGeomDict[segmentIdx] = segmentIndex.segmentGeometry(segmentIdx)
+                flagDict[featId][pointWkt]["flagGeom"] = pointGeom
+                flagDict[featId][pointWkt]["edges"].add(edgeGeomDict[segmentIdx])
+            if feedback is not None:
+                feedback.setProgress(100 * processed / size)
         return flagDict
 
     def getUnsharedVertexOnSharedEdgesDict(
@@ -1733,31 +1686,19 @@ class LayerHandler(QObject):
         :param searchRadius: (float) search radius
         :param feedback (QgsProcessingFeedback) QGIS object to keep track of progress/cancelling option.
         """
-        inputList = inputLineLyrList
-        algRunner = AlgRunner() if algRunner is None else algRunner
-        context = (
-            dataobjects.createContext(feedback=feedback) if context is None else context
-        )
-        multiStepFeedback = QgsProcessingMultiStepFeedback(3, feedback)
+        multiStepFeedback = QgsProcessingMultiStepFeedback(2, feedback)
         multiStepFeedback.setCurrentStep(0)
-        multiStepFeedback.pushInfo(self.tr("Getting lines"))
-        linesLyr = self.getLinesLayerFromPolygonsAndLinesLayers(
-            inputLineLyrList,
-            inputPolygonLyrList,
+        multiStepFeedback.pushInfo(self.tr("Building auxiliar search structures"))
+        segmentIndex = self.buildEdgesAuxStructure(
+            inputLineLyrList + inputPolygonLyrList,
+            searchRadius,
             onlySelected=onlySelected,
             feedback=multiStepFeedback,
-            context=context,
         )
         multiStepFeedback.setCurrentStep(1)
         multiStepFeedback.pushInfo(self.tr("Building vertex near edge dict"))
-        # only selected should not be filled because it was already used to build the line lyr
-        return self.getVertexNearEdgeDict(
-            linesLyr,
-            searchRadius,
-            algRunner=algRunner,
-            feedback=multiStepFeedback,
-            context=context,
-            ignoreErrorsOnSameFeat=True,
+        return self.getVertexNearEdgeFlagDict(
+            segmentIndex, feedback=multiStepFeedback, ignoreErrorsOnSameFeat=False
         )
 
     def getUnsharedVertexOnIntersections(
@@ -1769,127 +1710,80 @@ class LayerHandler(QObject):
         feedback=None,
         context=None,
         algRunner=None,
+        tolerance=1e-8,
     ):
         """
-        returns a dict in the following format:
-            {
-                '--flag Wkt--' : {
-                    'layer1' : --layer 1 name--',
-                    'layer2' : --layer 2 name--'
-                }
-            }
+        returns a set with the wkb of the intersections between the input
+        lines and polygon boundaries that are not vertexes of the input
+        geometries.
+        :param pointLineLyrList: (list of QgsVectorLayers) point layers. Not
+            used: input points are not intersections, so they add no flags.
         :param inputLineLyrList: (list of QgsVectorLayers) line layers to run build the aux structure.
         :param inputPolygonLyrList: (list of QgsVectorLayers) line polygon layers to run build the aux structure.
-        :param searchRadius: (float) search radius
+        :param tolerance: (float) snapping tolerance used to decide if a vertex is shared.
         :param feedback (QgsProcessingFeedback) QGIS object to keep track of progress/cancelling option.
         """
-        algRunner = AlgRunner() if algRunner is None else algRunner
-        context = (
-            dataobjects.createContext(feedback=feedback) if context is None else context
-        )
-        stepCount = 6 if pointLineLyrList else 5
-        multiStepFeedback = QgsProcessingMultiStepFeedback(stepCount, feedback)
-        currentStep = 0
-        multiStepFeedback.setCurrentStep(currentStep)
-        multiStepFeedback.pushInfo(self.tr("Getting lines"))
-        linesLyr = self.getLinesLayerFromPolygonsAndLinesLayers(
-            inputLineLyrList,
-            inputPolygonLyrList,
-            onlySelected=onlySelected,
-            feedback=multiStepFeedback,
-            context=context,
-        )
-        currentStep += 1
-        multiStepFeedback.setCurrentStep(currentStep)
-        multiStepFeedback.pushInfo(self.tr("Building point merged layer"))
-        pointsLyr = (
-            algRunner.runMergeVectorLayers(
-                pointLineLyrList, context, feedback=multiStepFeedback
-            )
-            if pointLineLyrList
-            else None
-        )
-        currentStep += 1
-
-        if pointsLyr is not None:
-            multiStepFeedback.setCurrentStep(currentStep)
-            pointsLyr = algRunner.runMultipartToSingleParts(
-                inputLayer=pointsLyr,
-                context=context,
-                feedback=multiStepFeedback,
-                outputLyr="TEMPORARY_OUTPUT",
+        return set(
+            geom.asWkb()
+            for geom in self.iterateUnsharedVertexOnIntersections(
+                inputLineLyrList,
+                inputPolygonLyrList,
+                onlySelected=onlySelected,
+                feedback=feedback,
+                tolerance=tolerance,
             )
-            pointsSet = set([i for i in pointsLyr.getFeatures()])
-            currentStep += 1
-        else:
-            pointsSet = set()
-
-        multiStepFeedback.setCurrentStep(currentStep)
-        multiStepFeedback.pushInfo(self.tr("Building intersections"))
-        intersectionLyr = algRunner.runLineIntersections(
-            linesLyr, linesLyr, feedback=multiStepFeedback, context=context
-        )
-        currentStep += 1
-
-        multiStepFeedback.setCurrentStep(currentStep)
-        multiStepFeedback.pushInfo(self.tr("Finding vertexes"))
-        vertexLyr = algRunner.runExtractVertices(
-            linesLyr, feedback=multiStepFeedback, context=context
-        )
-        currentStep += 1
-
-        multiStepFeedback.setCurrentStep(currentStep)
-        multiStepFeedback.pushInfo(self.tr("Finding unshared vertexes"))
-        intersectionDict = {
-            feat.geometry().asWkb(): feat for feat in intersectionLyr.getFeatures()
-        }
-        unsharedPointsSet = self.getUnsharedPointsSetFromPointsLyr(
-            algRunner, pointsSet, linesLyr, context, multiStepFeedback
         )
-        vertexSet = set(feat.geometry().asWkb() for feat in vertexLyr.getFeatures())
-        return set(intersectionDict.keys()).difference(
-            vertexSet
-        ) | unsharedPointsSet.difference(vertexSet)
 
-    def getUnsharedPointsSetFromPointsLyr(
-        self, algRunner, pointsSet, linesLyr, context, feedback
+    def iterateUnsharedVertexOnIntersections(
+        self,
+        inputLineLyrList,
+        inputPolygonLyrList,
+        onlySelected=False,
+        feedback=None,
+        tolerance=1e-8,
     ):
-        if pointsSet == set():
-            return set()
+        """
+        Returns an iterator over the point geometries (QgsGeometry) of the
+        unshared vertexes on intersections, ordered by their x and y
+        coordinates. An intersection is shared when there is a vertex of the
+        input lines or polygons within tolerance of it. Every intersection is
+        computed, deduplicated and sorted before the first geometry is
+        yielded; only the QgsGeometry objects are built lazily.
+        :param inputLineLyrList: (list of QgsVectorLayers) line layers to run build the aux structure.
+        :param inputPolygonLyrList: (list of QgsVectorLayers) line polygon layers to run build the aux structure.
+        :param tolerance: (float) snapping tolerance used to decide if a vertex is shared.
+        :param feedback (QgsProcessingFeedback) QGIS object to keep track of progress/cancelling option.
+        """
         multiStepFeedback = QgsProcessingMultiStepFeedback(2, feedback)
         multiStepFeedback.setCurrentStep(0)
-        algRunner.runCreateSpatialIndex(linesLyr, context, feedback=multiStepFeedback)
+        multiStepFeedback.pushInfo(self.tr("Building auxiliar search structures"))
+        segmentIndex = self.buildEdgesAuxStructure(
+            inputLineLyrList + inputPolygonLyrList,
+            tolerance,
+            onlySelected=onlySelected,
+            feedback=multiStepFeedback,
+        )
         multiStepFeedback.setCurrentStep(1)
-
-        def compute(feat):
-            geom = feat.geometry()
-            geomWkb = geom.asWkb()
-            buffer = geom.buffer(1e-8, -1)
-            geomEngine = QgsGeometry.createGeometryEngine(buffer.constGet())
-            for lineFeat in linesLyr.getFeatures(geom.boundingBox()):
-                lineGeom = lineFeat.geometry()
-                if not geomEngine.intersects(lineGeom.constGet()):
-                    continue
-                for i in lineFeat.geometry().vertices():
-                    v = QgsGeometry(i)
-                    if geom.equals(v):
-                        return geomWkb
-            return None
-
-        pool = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() - 1)
-        futures = set()
-        vertexSet = set()
-        for feat in pointsSet:
-            futures.add(pool.submit(compute, feat))
-            # result = compute(feat)
-            # if result is not None:
-            #     vertexSet.add(result)
-        vertexSet = set(
-            future.result()
-            for future in concurrent.futures.as_completed(futures)
-            if future.result() is not None
-        )
-        return vertexSet
+        multiStepFeedback.pushInfo(
+            self.tr("Finding unshared vertexes on intersections")
+        )
+        flagDict = dict()
+        for xArray, yArray, progress in segmentIndex.iterateIntersections():
+            if multiStepFeedback.isCanceled():
+                return
+            unshared = ~segmentIndex.hasVertexWithin(xArray, yArray)
+            for x, y in zip(xArray[unshared].tolist(), yArray[unshared].tolist()):
+                # intersections computed from different pairs of segments
+                # may differ by floating point noise
+                key = (
+                    (round(x / tolerance), round(y / tolerance))
+                    if tolerance > 0
+                    else (x, y)
+                )
+                flagDict.setdefault(key, (x, y))
+            multiStepFeedback.setProgress(100 * progress)
+        for x, y in sorted(flagDict.values()):
+            yield segmentIndex.pointGeometry(x, y)
 
     def getLinesLayerFromPolygonsAndLinesLayers(
         self,
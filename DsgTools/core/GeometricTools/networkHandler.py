@@ -25,6 +25,9 @@ from builtins import range
 from itertools import combinations, chain
 import math
 from math import pi
+
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
+
 from .geometryHandler import GeometryHandler
 from .layerHandler import LayerHandler
 from qgis.core import (
@@ -52,6 +55,7 @@ from qgis.PyQt.Qt import QObject
 from qgis.PyQt.QtCore import QVariant
 
 
+@algProfiler.profileMethods()
 class NetworkHandler(QObject):
     (
         Flag,
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-19
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from collections import OrderedDict
+
+import numpy
+
+from qgis.core import QgsWkbTypes
+
+from .segmentIndex import SegmentIndex
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+class PositionalAccuracyEngine(object):
+    """
+    Computes the positional discrepancies between a tested dataset and a
+    reference dataset.
+
+    Reference points are loaded once into a KD-tree (scipy's cKDTree when it
+    is available, otherwise a uniform grid with the maximum distance as cell
+    size). Reference lines and polygon boundaries are loaded into a
+    SegmentIndex, so distances are measured to the segments themselves.
+    Tested lines and polygons are sampled on their densified vertexes.
+    Every distance is computed in vectorized batches.
+    """
+
+    # planimetric PEC-PCD (Decreto 89.817 and ET-CQDG) in map millimeters:
+    # class: (PEC, standard error)
+    PEC_PLANIMETRIC = OrderedDict(
+        [
+            ("A", (0.28, 0.17)),
+            ("B", (0.5, 0.3)),
+            ("C", (0.8, 0.5)),
+            ("D", (1.0, 0.6)),
+        ]
+    )
+
+    def __init__(self, maxDistance, sampleDistance=None, batchSize=500000):
+        """
+        :param maxDistance: (float) discrepancies larger than this distance
+            are considered as unmatched.
+        :param sampleDistance: (float) densification distance of the tested
+            lines and polygons. If None, half of maxDistance is used.
+        """
+        self.maxDistance = float(maxDistance)
+        self.sampleDistance = (
+            float(sampleDistance) if sampleDistance else self.maxDistance / 2
+        )
+        self.batchSize = batchSize
+        self.referenceX, self.referenceY = [], []
+        self.segmentIndex = SegmentIndex(self.maxDistance)
+        self.hasReferenceSegments = False
+        self.pointTree = None
+
+    def addReferenceFeatures(self, featureIterable, feedback=None):
+        for feat in featureIterable:
+            if feedback is not None and feedback.isCanceled():
+                break
+            geom = feat.geometry()
+            if geom is None or geom.isNull() or geom.isEmpty():
+                continue
+            if geom.type() == QgsWkbTypes.PointGeometry:
+                for point in geom.constParts():
+                    self.referenceX.append(point.x())
+                    self.referenceY.append(point.y())
+                continue
+            self.segmentIndex.addGeometry(geom, feat.id())
+            self.hasReferenceSegments = True
+
+    def build(self):
+        self.referenceX = numpy.array(self.referenceX, dtype=float)
+        self.referenceY = numpy.array(self.referenceY, dtype=float)
+        if self.hasReferenceSegments:
+            self.segmentIndex.build()
+        if len(self.referenceX) == 0:
+            return
+        if cKDTree is not None:
+            self.pointTree = cKDTree(
+                numpy.column_stack((self.referenceX, self.referenceY))
+            )
+            return
+        self.buildPointGrid()
+
+    def buildPointGrid(self):
+        self.cellSize = self.maxDistance if self.maxDistance > 0 else 1.0
+        self.originX, self.originY = self.referenceX.min(), self.referenceY.min()
+        self.nCols = int((self.referenceX.max() - self.originX) // self.cellSize) + 1
+        keys = self.pointCellKeys(self.referenceX, self.referenceY)
+        self.pointOrder = numpy.argsort(keys, kind="stable")
+        self.pointKeys = keys[self.pointOrder]
+
+    def pointCellKeys(self, px, py, colOffset=0, rowOffset=0):
+        col = numpy.floor((px - self.originX) / self.cellSize).astype(numpy.int64)
+        row = numpy.floor((py - self.originY) / self.cellSize).astype(numpy.int64)
+        col, row = col + colOffset, row + rowOffset
+        inside = (col >= 0) & (col < self.nCols) & (row >= 0)
+        return numpy.where(inside, row * self.nCols + col, -1)
+
+    def nearestPointDistances(self, px, py):
+        distances = numpy.full(len(px), numpy.inf)
+        if len(self.referenceX) == 0:
+            return distances
+        if self.pointTree is not None:
+            distances, _ = self.pointTree.query(
+                numpy.column_stack((px, py)),
+                distance_upper_bound=self.maxDistance,
+            )
+            return distances
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                keys = self.pointCellKeys(px, py, colOffset=i, rowOffset=j)
+                pointIdx, entryIdx = self.segmentIndex.expandCells(keys, self.pointKeys)
+                refIdx = self.pointOrder[entryIdx]
+                pairDistances = numpy.hypot(
+                    px[pointIdx] - self.referenceX[refIdx],
+                    py[pointIdx] - self.referenceY[refIdx],
+                )
+                numpy.minimum.at(distances, pointIdx, pairDistances)
+        distances[distances > self.maxDistance] = numpy.inf
+        return distances
+
+    def nearestSegmentDistances(self, px, py):
+        distances = numpy.full(len(px), numpy.inf)
+        if not self.hasReferenceSegments:
+            return distances
+        pointIdx, segIdx = self.segmentIndex.nearSegmentPairs(px, py)
+        pairDistances = numpy.sqrt(
+            self.segmentIndex.squaredDistances(px[pointIdx], py[pointIdx], segIdx)
+        )
+        numpy.minimum.at(distances, pointIdx, pairDistances)
+        return distances
+
+    def nearestDistances(self, px, py):
+        """
+        Returns the distance of each point to the nearest reference
+        geometry, or inf when there is no reference geometry within
+        maxDistance.
+        """
+        distances = numpy.full(len(px), numpy.inf)
+        for start in range(0, len(px), self.batchSize):
+            end = min(start + self.batchSize, len(px))
+            distances[start:end] = numpy.minimum(
+                self.nearestPointDistances(px[start:end], py[start:end]),
+                self.nearestSegmentDistances(px[start:end], py[start:end]),
+            )
+        return distances
+
+    def sampleCoordinates(self, geom):
+        """
+        Returns the coordinates of the points, or of the densified vertexes
+        of the lines and polygons, of geom.
+        """
+        if geom.type() != QgsWkbTypes.PointGeometry and self.sampleDistance > 0:
+            geom = geom.densifyByDistance(self.sampleDistance)
+        xList, yList = [], []
+        for vertex in geom.vertices():
+            xList.append(vertex.x())
+            yList.append(vertex.y())
+        return xList, yList
+
+    def evaluateFeatures(self, featureIterable, feedback=None):
+        """
+        Computes the residual of each tested feature.
+        :param featureIterable: (iterable) tested features.
+        :return: (list) list of tuples (feature, residual, maxResidual,
+            nSamples, nMatchedSamples). residual is the distance of a point,
+            or the root mean square of the matched samples of a line or
+            polygon; it is None when no sample was matched.
+        """
+        featList, xList, yList, ownerList = [], [], [], []
+        for feat in featureIterable:
+            if feedback is not None and feedback.isCanceled():
+                return []
+            geom = feat.geometry()
+            if geom is None or geom.isNull() or geom.isEmpty():
+                continue
+            xs, ys = self.sampleCoordinates(geom)
+            xList.extend(xs)
+            yList.extend(ys)
+            ownerList.extend([len(featList)] * len(xs))
+            featList.append(feat)
+        owners = numpy.array(ownerList, dtype=numpy.int64)
+        distances = self.nearestDistances(
+            numpy.array(xList, dtype=float), numpy.array(yList, dtype=float)
+        )
+        matched = numpy.isfinite(distances)
+        nFeats = len(featList)
+        nSamples = numpy.bincount(owners, minlength=nFeats)
+        nMatched = numpy.bincount(owners[matched], minlength=nFeats)
+        squaredSum = numpy.bincount(
+            owners[matched], weights=distances[matched] ** 2, minlength=nFeats
+        )
+        maxResidual = numpy.zeros(nFeats)
+        numpy.maximum.at(maxResidual, owners[matched], distances[matched])
+        resultList = []
+        for i, feat in enumerate(featList):
+            residual = (
+                float(numpy.sqrt(squaredSum[i] / nMatched[i])) if nMatched[i] else None
+            )
+            resultList.append(
+                (
+                    feat,
+                    residual,
+                    float(maxResidual[i]) if nMatched[i] else None,
+                    int(nSamples[i]),
+                    int(nMatched[i]),
+                )
+            )
+        return resultList
+
+    @staticmethod
+    def statistics(residualList, frequency=0.9):
+        """
+        Returns a dict with the count, mean, rms and percentile of the
+        residuals, or None if the list is empty.
+        """
+        if not residualList:
+            return None
+        residuals = numpy.array(residualList, dtype=float)
+        return {
+            "count": len(residuals),
+            "mean": float(residuals.mean()),
+            "rms": float(numpy.sqrt((residuals**2).mean())),
+            "percentile": float(numpy.percentile(residuals, 100 * frequency)),
+        }
+
+    @classmethod
+    def pecClass(cls, rms, percentile, scale):
+        """
+        Returns the best planimetric PEC-PCD class met by the statistics, or
+        None. Both the percentile 90 of the residuals must be within the PEC
+        and the rms must be within the standard error of the class.
+        :param scale: (float) scale denominator.
+        """
+        for pecClass, (pec, standardError) in cls.PEC_PLANIMETRIC.items():
+            if percentile <= pec * scale / 1000 and rms <= standardError * scale / 1000:
+                return pecClass
+        return None
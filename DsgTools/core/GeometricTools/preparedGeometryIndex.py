@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-14
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import threading
+from collections import OrderedDict
+
+from qgis.core import QgsGeometry, QgsRectangle, QgsSpatialIndex
+
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
+
+
+class PreparedGeometryIndex(object):
+    """
+    In-memory R-tree of the geometries of a feature iterable, with prepared
+    geometry engines created on demand for each indexed geometry.
+
+    Engines are cached per thread, because GEOS prepared geometries build
+    their internal indexes lazily and must not be queried concurrently.
+    Each thread keeps at most maxEngines engines, the least recently used
+    ones are dropped, so the memory of the caches is bounded no matter how
+    many threads query the index.
+    """
+
+    def __init__(self, featureIterable=None, feedback=None, maxEngines=2048):
+        self.maxEngines = maxEngines
+        self.spatialIdx = QgsSpatialIndex()
+        self.geometryDict = dict()
+        self.threadLocal = threading.local()
+        if featureIterable is not None:
+            self.addFeatures(featureIterable, feedback=feedback)
+
+    def addFeatures(self, featureIterable, feedback=None):
+        for feat in featureIterable:
+            if feedback is not None and feedback.isCanceled():
+                break
+            self.addGeometry(feat.id(), feat.geometry())
+
+    def addGeometry(self, featId, geom):
+        if geom is None or geom.isNull() or geom.isEmpty():
+            return
+        self.geometryDict[featId] = QgsGeometry(geom)
+        self.spatialIdx.addFeature(featId, geom.boundingBox())
+
+    def geometry(self, featId):
+        return self.geometryDict[featId]
+
+    def engine(self, featId):
+        """
+        Returns the prepared QgsGeometryEngine of the indexed geometry of
+        featId, kept on the least recently used cache of the thread.
+        """
+        engineDict = getattr(self.threadLocal, "engineDict", None)
+        if engineDict is None:
+            engineDict = OrderedDict()
+            self.threadLocal.engineDict = engineDict
+        engine = engineDict.get(featId)
+        if engine is not None:
+            engineDict.move_to_end(featId)
+            return engine
+        engine = QgsGeometry.createGeometryEngine(self.geometryDict[featId].constGet())
+        engine.prepareGeometry()
+        engineDict[featId] = engine
+        if len(engineDict) > self.maxEngines:
+            engineDict.popitem(last=False)
+        return engine
+
+    def candidateIds(self, rect):
+        return self.spatialIdx.intersects(rect)
+
+    def idsWithinDistance(self, geom, distance):
+        """
+        Returns the ids of the indexed geometries whose distance to geom is
+        less than or equal to distance.
+        :param geom: (QgsGeometry) reference geometry.
+        :param distance: (float) search distance.
+        :return: (list) list of feature ids.
+        """
+        rect = QgsRectangle(geom.boundingBox())
+        rect.grow(distance)
+        geomAbstract = geom.constGet()
+        candidateIds = self.candidateIds(rect)
+        algProfiler.increment(algProfiler.GEOMETRY_PREDICATES, len(candidateIds))
+        return [
+            featId
+            for featId in candidateIds
+            if self.engine(featId).distance(geomAbstract) <= distance
+        ]
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-27
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import concurrent.futures
+import math
+import threading
+from collections import OrderedDict
+
+from qgis.core import QgsRaster, QgsRasterInterface, QgsRectangle
+
+
+class RasterValueService(object):
+    """
+    Serves raster band values at points from decoded blocks kept in memory,
+    instead of asking the data provider for every lookup (e.g. on every
+    mouse move).
+
+    The raster is split into blocks of blockSize x blockSize pixels, read at
+    native resolution. Decoded blocks are kept in an LRU cache bounded by
+    maxBytes. When a block is read, its neighbours are read on a background
+    thread, using a clone of the data provider, as providers must not be
+    shared between threads. Rasters whose provider has no pixel size (e.g.
+    WMS) are served by identify.
+    """
+
+    def __init__(self, blockSize=256, maxBytes=64 * 1024**2, prefetch=True):
+        self.blockSize = blockSize
+        self.maxBytes = maxBytes
+        self.prefetch = prefetch
+        self.cache = OrderedDict()
+        self.cachedBytes = 0
+        self.lock = threading.RLock()
+        self.layerDict = dict()
+        self.connectedLayerIds = set()
+        self.pendingKeys = set()
+        self.pool = None
+        self.hits = 0
+        self.misses = 0
+
+    def layerInfo(self, rasterLayer):
+        """
+        Returns the grid of rasterLayer, or None when it cannot be read by
+        blocks. The clone used for prefetching is created here, on the
+        thread that owns the layer.
+        """
+        layerId = rasterLayer.id()
+        source = rasterLayer.source()
+        info = self.layerDict.get(layerId)
+        if info is not None and info["source"] == source:
+            return info
+        if info is not None:
+            self.invalidate(rasterLayer)
+        provider = rasterLayer.dataProvider()
+        if (
+            provider is None
+            or not provider.capabilities() & QgsRasterInterface.Size
+            or provider.xSize() <= 0
+            or provider.ySize() <= 0
+        ):
+            return None
+        extent = provider.extent()
+        info = {
+            "source": source,
+            "extent": QgsRectangle(extent),
+            "width": provider.xSize(),
+            "height": provider.ySize(),
+            "xRes": extent.width() / provider.xSize(),
+            "yRes": extent.height() / provider.ySize(),
+            "bands": list(range(1, provider.bandCount() + 1)),
+            "prefetchProvider": provider.clone() if self.prefetch else None,
+        }
+        self.layerDict[layerId] = info
+        if layerId not in self.connectedLayerIds:
+            self.connectedLayerIds.add(layerId)
+            rasterLayer.willBeDeleted.connect(lambda: self.invalidate(layerId=layerId))
+            rasterLayer.dataChanged.connect(lambda: self.invalidate(layerId=layerId))
+        return info
+
+    def invalidate(self, rasterLayer=None, layerId=None):
+        """
+        Drops the cached blocks of a layer, or of every layer if no layer is
+        given.
+        """
+        layerId = rasterLayer.id() if rasterLayer is not None else layerId
+        with self.lock:
+            for key in list(self.cache.keys()):
+                if layerId is None or key[0] == layerId:
+                    self.cachedBytes -= self.cache.pop(key)["bytes"]
+            if layerId is None:
+                self.layerDict.clear()
+            else:
+                self.layerDict.pop(layerId, None)
+
+    def values(self, rasterLayer, point):
+        """
+        Returns the band values of rasterLayer at point, in the same way as
+        identify with QgsRaster.IdentifyFormatValue.
+        :param point: (QgsPointXY) point in the raster crs.
+        :return: (list) value of each band (None for no data), or None if
+            point is outside the raster.
+        """
+        info = self.layerInfo(rasterLayer)
+        if info is None:
+            return self.identify(rasterLayer, point)
+        extent = info["extent"]
+        col = int(math.floor((point.x() - extent.xMinimum()) / info["xRes"]))
+        row = int(math.floor((extent.yMaximum() - point.y()) / info["yRes"]))
+        if not (0 <= col < info["width"] and 0 <= row < info["height"]):
+            return None
+        blockCol, blockRow = col // self.blockSize, row // self.blockSize
+        key = (rasterLayer.id(), blockCol, blockRow)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            entry = self.readBlock(rasterLayer.dataProvider(), info, blockCol, blockRow)
+            self.store(key, entry)
+        if self.prefetch:
+            self.prefetchNeighbours(rasterLayer.id(), info, blockCol, blockRow)
+        localRow = row - entry["row"]
+        localCol = col - entry["col"]
+        return [
+            None
+            if block is None or block.isNoData(localRow, localCol)
+            else block.value(localRow, localCol)
+            for block in entry["blocks"]
+        ]
+
+    def identify(self, rasterLayer, point):
+        result = rasterLayer.dataProvider().identify(
+            point, QgsRaster.IdentifyFormatValue
+        )
+        if not result.isValid():
+            return None
+        return list(result.results().values())
+
+    def blockBounds(self, info, blockCol, blockRow):
+        col = blockCol * self.blockSize
+        row = blockRow * self.blockSize
+        width = min(self.blockSize, info["width"] - col)
+        height = min(self.blockSize, info["height"] - row)
+        extent = info["extent"]
+        rect = QgsRectangle(
+            extent.xMinimum() + col * info["xRes"],
+            extent.yMaximum() - (row + height) * info["yRes"],
+            extent.xMinimum() + (col + width) * info["xRes"],
+            extent.yMaximum() - row * info["yRes"],
+        )
+        return col, row, width, height, rect
+
+    def readBlock(self, provider, info, blockCol, blockRow):
+        """
+        Reads every band of a block at native resolution.
+        """
+        col, row, width, height, rect = self.blockBounds(info, blockCol, blockRow)
+        blockList, nBytes = [], 0
+        for band in info["bands"]:
+            block = provider.block(band, rect, width, height)
+            if block is None or not block.isValid():
+                blockList.append(None)
+                continue
+            blockList.append(block)
+            nBytes += block.dataTypeSize() * width * height
+        return {"col": col, "row": row, "blocks": blockList, "bytes": nBytes}
+
+    def store(self, key, entry):
+        with self.lock:
+            if key in self.cache:
+                return
+            self.cache[key] = entry
+            self.cachedBytes += entry["bytes"]
+            # keeps at least the block just stored
+            while self.cachedBytes > self.maxBytes and len(self.cache) > 1:
+                self.cachedBytes -= self.cache.popitem(last=False)[1]["bytes"]
+
+    def prefetchNeighbours(self, layerId, info, blockCol, blockRow):
+        provider = info["prefetchProvider"]
+        if provider is None:
+            return
+        nCols = math.ceil(info["width"] / self.blockSize)
+        nRows = math.ceil(info["height"] / self.blockSize)
+        with self.lock:
+            keyList = [
+                (layerId, c, r)
+                for r in range(blockRow - 1, blockRow + 2)
+                for c in range(blockCol - 1, blockCol + 2)
+                if 0 <= c < nCols
+                and 0 <= r < nRows
+                and (layerId, c, r) not in self.cache
+                and (layerId, c, r) not in self.pendingKeys
+            ]
+            if not keyList:
+                return
+            self.pendingKeys.update(keyList)
+            if self.pool is None:
+                # a single worker, as the prefetch provider is not thread safe
+                self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.pool.submit(self.prefetchBlocks, provider, info, keyList)
+
+    def prefetchBlocks(self, provider, info, keyList):
+        for key in keyList:
+            try:
+                with self.lock:
+                    stale = self.layerDict.get(key[0]) is not info
+                if not stale:
+                    self.store(key, self.readBlock(provider, info, key[1], key[2]))
+            finally:
+                with self.lock:
+                    self.pendingKeys.discard(key)
+
+    def shutdown(self):
+        """
+        Stops the prefetch thread and drops every cached block.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        self.invalidate()
+
+
+rasterValueService = RasterValueService()
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-15
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from array import array
+
+import numpy
+
+from qgis.core import QgsGeometry, QgsLineString, QgsPoint, QgsPointXY, QgsWkbTypes
+
+
+class SegmentIndex(object):
+    """
+    Packed index of the segments and vertices of a set of line or polygon
+    geometries, built to answer vertex near segment queries without creating
+    one QgsFeature per segment.
+
+    Coordinates are stored in flat arrays with an owner id per vertex and per
+    segment. Segments are bulk loaded into a uniform grid whose cell size is
+    at least twice the search tolerance: long segments are split into pieces
+    no longer than a cell, so each segment is registered in a bounded number
+    of cells and every vertex only needs to look at its own cell. Candidate
+    pairs are evaluated in vectorized batches.
+    """
+
+    def __init__(self, tolerance):
+        self.tolerance = float(tolerance)
+        self.owners = []
+        self.vx, self.vy, self.vOwner = array("d"), array("d"), array("l")
+        self.sx1, self.sy1 = array("d"), array("d")
+        self.sx2, self.sy2 = array("d"), array("d")
+        self.sOwner = array("l")
+        self.built = False
+
+    def addGeometry(self, geom, ownerKey):
+        """
+        Adds the vertices and segments of geom.
+        :param geom: (QgsGeometry) line or polygon geometry.
+        :param ownerKey: (hashable) identifier of the geometry owner, usually
+            the feature id or a (layer name, feature id) tuple.
+        """
+        if geom is None or geom.isNull() or geom.isEmpty():
+            return
+        if QgsWkbTypes.isCurvedType(geom.wkbType()):
+            geom = QgsGeometry(geom.constGet().segmentize())
+        ownerId = len(self.owners)
+        self.owners.append(ownerKey)
+        for part in geom.constParts():
+            if isinstance(part, QgsLineString):
+                self.addLineString(part, ownerId)
+                continue
+            self.addLineString(part.exteriorRing(), ownerId)
+            for i in range(part.numInteriorRings()):
+                self.addLineString(part.interiorRing(i), ownerId)
+        self.built = False
+
+    def addLineString(self, lineString, ownerId):
+        if lineString is None or lineString.numPoints() < 2:
+            return
+        xs, ys = lineString.xVector(), lineString.yVector()
+        self.sx1.extend(xs[:-1])
+        self.sy1.extend(ys[:-1])
+        self.sx2.extend(xs[1:])
+        self.sy2.extend(ys[1:])
+        self.sOwner.extend([ownerId] * (len(xs) - 1))
+        # the closing vertex of a ring is the same as its first one
+        nVertexes = len(xs) - 1 if lineString.isClosed() else len(xs)
+        self.vx.extend(xs[:nVertexes])
+        self.vy.extend(ys[:nVertexes])
+        self.vOwner.extend([ownerId] * nVertexes)
+
+    def addFeatures(self, featureIterable, ownerKeyFunc=None, feedback=None):
+        """
+        Adds the geometries of a feature iterable. ownerKeyFunc receives a
+        feature and returns its owner key; the feature id is used when it is
+        None.
+        """
+        for feat in featureIterable:
+            if feedback is not None and feedback.isCanceled():
+                break
+            ownerKey = feat.id() if ownerKeyFunc is None else ownerKeyFunc(feat)
+            self.addGeometry(feat.geometry(), ownerKey)
+
+    def build(self):
+        """
+        Packs the accumulated coordinates into numpy arrays and bulk loads
+        the segment grid.
+        """
+        self.vertexX = numpy.frombuffer(self.vx, dtype=numpy.float64).copy()
+        self.vertexY = numpy.frombuffer(self.vy, dtype=numpy.float64).copy()
+        self.vertexOwner = numpy.array(self.vOwner, dtype=numpy.int64)
+        x1 = numpy.frombuffer(self.sx1, dtype=numpy.float64)
+        y1 = numpy.frombuffer(self.sy1, dtype=numpy.float64)
+        x2 = numpy.frombuffer(self.sx2, dtype=numpy.float64)
+        y2 = numpy.frombuffer(self.sy2, dtype=numpy.float64)
+        # zero length segments have no interior to be near to
+        valid = (x1 != x2) | (y1 != y2)
+        self.x1, self.y1 = x1[valid], y1[valid]
+        self.x2, self.y2 = x2[valid], y2[valid]
+        self.segmentOwner = numpy.array(self.sOwner, dtype=numpy.int64)[valid]
+        self.vx, self.vy, self.vOwner = array("d"), array("d"), array("l")
+        self.sx1, self.sy1 = array("d"), array("d")
+        self.sx2, self.sy2 = array("d"), array("d")
+        self.sOwner = array("l")
+        self.buildGrid()
+        self.built = True
+
+    def buildGrid(self):
+        self.cellKeys = numpy.zeros(0, dtype=numpy.int64)
+        self.cellSegments = numpy.zeros(0, dtype=numpy.int64)
+        if len(self.x1) == 0 or len(self.vertexX) == 0:
+            return
+        lengths = numpy.hypot(self.x2 - self.x1, self.y2 - self.y1)
+        self.cellSize = max(2 * self.tolerance, float(numpy.median(lengths)))
+        self.originX = min(self.x1.min(), self.x2.min(), self.vertexX.min())
+        self.originY = min(self.y1.min(), self.y2.min(), self.vertexY.min())
+        maxX = max(self.x1.max(), self.x2.max(), self.vertexX.max())
+        maxY = max(self.y1.max(), self.y2.max(), self.vertexY.max())
+        self.nCols = int((maxX - self.originX) // self.cellSize) + 3
+        self.nRows = int((maxY - self.originY) // self.cellSize) + 3
+        # split each segment into pieces no longer than a cell
+        nPieces = numpy.maximum(
+            numpy.ceil(lengths / self.cellSize).astype(numpy.int64), 1
+        )
+        segIdx = numpy.repeat(numpy.arange(len(self.x1), dtype=numpy.int64), nPieces)
+        pieceIdx = numpy.arange(len(segIdx), dtype=numpy.int64) - numpy.repeat(
+            numpy.cumsum(nPieces) - nPieces, nPieces
+        )
+        t0 = pieceIdx / nPieces[segIdx]
+        t1 = (pieceIdx + 1) / nPieces[segIdx]
+        dx, dy = self.x2 - self.x1, self.y2 - self.y1
+        px0 = self.x1[segIdx] + t0 * dx[segIdx]
+        px1 = self.x1[segIdx] + t1 * dx[segIdx]
+        py0 = self.y1[segIdx] + t0 * dy[segIdx]
+        py1 = self.y1[segIdx] + t1 * dy[segIdx]
+        # a piece grown by the tolerance spans at most 3 cells on each axis,
+        # one more is allowed to absorb rounding errors
+        minCol = self.cellOf(numpy.minimum(px0, px1) - self.tolerance, self.originX)
+        maxCol = self.cellOf(numpy.maximum(px0, px1) + self.tolerance, self.originX)
+        minRow = self.cellOf(numpy.minimum(py0, py1) - self.tolerance, self.originY)
+        maxRow = self.cellOf(numpy.maximum(py0, py1) + self.tolerance, self.originY)
+        keyList, segList = [], []
+        for i in range(4):
+            for j in range(4):
+                mask = (minCol + i <= maxCol) & (minRow + j <= maxRow)
+                keyList.append(self.cellKey(minCol[mask] + i, minRow[mask] + j))
+                segList.append(segIdx[mask])
+        keys = numpy.concatenate(keyList)
+        segs = numpy.concatenate(segList)
+        order = numpy.lexsort((segs, keys))
+        keys, segs = keys[order], segs[order]
+        unique = numpy.ones(len(keys), dtype=bool)
+        unique[1:] = (keys[1:] != keys[:-1]) | (segs[1:] != segs[:-1])
+        self.cellKeys = keys[unique]
+        self.cellSegments = segs[unique]
+        vertexKeys = self.gridKeys(self.vertexX, self.vertexY)
+        self.vertexCellOrder = numpy.argsort(vertexKeys, kind="stable")
+        self.vertexCellKeys = vertexKeys[self.vertexCellOrder]
+
+    def cellOf(self, values, origin):
+        return numpy.floor((values - origin) / self.cellSize).astype(numpy.int64) + 1
+
+    def cellKey(self, col, row):
+        return row * self.nCols + col
+
+    def pointGeometry(self, x, y):
+        return QgsGeometry.fromPointXY(QgsPointXY(x, y))
+
+    def vertexCount(self):
+        return len(self.vertexX) if self.built else len(self.vx)
+
+    def iterateNearPairs(self, ignoreSameOwner=False, batchSize=200000):
+        """
+        Yields, in batches, the pairs of vertexes and segments whose distance
+        is less than or equal to the tolerance. Segments that have the vertex
+        as one of their endpoints are not reported.
+        :param ignoreSameOwner: (bool) if True, pairs of vertex and segment of
+            the same owner are not reported.
+        :param batchSize: (int) number of vertexes evaluated at once.
+        :return: (generator) tuples (vertexIdxArray, segmentIdxArray,
+            processedVertexCount).
+        """
+        if not self.built:
+            self.build()
+        nVertexes = len(self.vertexX)
+        for start in range(0, nVertexes, batchSize):
+            end = min(start + batchSize, nVertexes)
+            vertexIdx, segIdx = self.nearSegmentPairs(
+                self.vertexX[start:end], self.vertexY[start:end]
+            )
+            vertexIdx += start
+            vX, vY = self.vertexX[vertexIdx], self.vertexY[vertexIdx]
+            # the vertex touches the segment when it is one of its endpoints
+            mask = ~(
+                ((vX == self.x1[segIdx]) & (vY == self.y1[segIdx]))
+                | ((vX == self.x2[segIdx]) & (vY == self.y2[segIdx]))
+            )
+            if ignoreSameOwner:
+                mask &= self.vertexOwner[vertexIdx] != self.segmentOwner[segIdx]
+            yield vertexIdx[mask], segIdx[mask], end
+
+    def gridKeys(self, px, py):
+        """
+        Returns the cell key of each coordinate, or -1 for coordinates out of
+        the grid.
+        """
+        col, row = self.cellOf(px, self.originX), self.cellOf(py, self.originY)
+        inside = (col >= 0) & (col < self.nCols) & (row >= 0) & (row < self.nRows)
+        return numpy.where(inside, self.cellKey(col, row), -1)
+
+    def expandCells(self, keys, sortedKeys):
+        """
+        Returns, for each entry of sortedKeys that has the same key as an item
+        of keys, the pair (index in keys, index in sortedKeys).
+        """
+        left = numpy.searchsorted(sortedKeys, keys, side="left")
+        right = numpy.searchsorted(sortedKeys, keys, side="right")
+        counts = numpy.where(keys >= 0, right - left, 0)
+        queryIdx = numpy.repeat(numpy.arange(len(keys)), counts)
+        entryIdx = (
+            numpy.arange(counts.sum())
+            - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+            + numpy.repeat(left, counts)
+        )
+        return queryIdx, entryIdx
+
+    def nearSegmentPairs(self, px, py):
+        """
+        Returns the pairs (point index, segment index) whose distance is less
+        than or equal to the tolerance.
+        :param px: (numpy.array) x coordinates of the points.
+        :param py: (numpy.array) y coordinates of the points.
+        """
+        if not self.built:
+            self.build()
+        if len(self.cellKeys) == 0 or len(px) == 0:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty
+        pointIdx, entryIdx = self.expandCells(self.gridKeys(px, py), self.cellKeys)
+        segIdx = self.cellSegments[entryIdx]
+        squaredDist = self.squaredDistances(px[pointIdx], py[pointIdx], segIdx)
+        mask = squaredDist <= self.tolerance * self.tolerance
+        return pointIdx[mask], segIdx[mask]
+
+    def squaredDistances(self, px, py, segIdx):
+        x1, y1 = self.x1[segIdx], self.y1[segIdx]
+        dx, dy = self.x2[segIdx] - x1, self.y2[segIdx] - y1
+        t = numpy.clip(((px - x1) * dx + (py - y1) * dy) / (dx * dx + dy * dy), 0, 1)
+        return (px - x1 - t * dx) ** 2 + (py - y1 - t * dy) ** 2
+
+    def hasVertexWithin(self, px, py):
+        """
+        Returns a boolean array telling whether each point has an indexed
+        vertex within the tolerance, i.e., whether the point is already
+        shared by the indexed geometries.
+        """
+        if not self.built:
+            self.build()
+        found = numpy.zeros(len(px), dtype=bool)
+        if len(self.cellKeys) == 0 or len(px) == 0:
+            return found
+        col, row = self.cellOf(px, self.originX), self.cellOf(py, self.originY)
+        squaredTol = self.tolerance * self.tolerance
+        # the cell size is at least twice the tolerance, so the neighbour
+        # cells are enough to find every vertex within the tolerance
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                c, r = col + i, row + j
+                inside = (c >= 0) & (c < self.nCols) & (r >= 0) & (r < self.nRows)
+                keys = numpy.where(inside, self.cellKey(c, r), -1)
+                pointIdx, entryIdx = self.expandCells(keys, self.vertexCellKeys)
+                vertexIdx = self.vertexCellOrder[entryIdx]
+                squaredDist = (px[pointIdx] - self.vertexX[vertexIdx]) ** 2 + (
+                    py[pointIdx] - self.vertexY[vertexIdx]
+                ) ** 2
+                found[pointIdx[squaredDist <= squaredTol]] = True
+        return found
+
+    def iterateIntersections(self, batchSize=200000):
+        """
+        Yields, in batches, the points where two indexed segments cross each
+        other. Each crossing is evaluated only in the grid cell that contains
+        it, so a pair of segments registered in several cells is reported
+        once. Collinear overlaps are not crossings and are not reported.
+        :param batchSize: (int) number of grid entries evaluated at once.
+        :return: (generator) tuples (xArray, yArray, progress), where
+            progress is the processed fraction of the grid.
+        """
+        if not self.built:
+            self.build()
+        nEntries = len(self.cellKeys)
+        if nEntries == 0:
+            return
+        cellEnd = numpy.searchsorted(self.cellKeys, self.cellKeys, side="right")
+        for start in range(0, nEntries, batchSize):
+            end = min(start + batchSize, nEntries)
+            # each entry is paired with the following entries of its cell
+            counts = cellEnd[start:end] - numpy.arange(start, end) - 1
+            firstIdx = numpy.repeat(numpy.arange(start, end), counts)
+            secondIdx = (
+                numpy.arange(counts.sum())
+                - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+                + firstIdx
+                + 1
+            )
+            segA, segB = self.cellSegments[firstIdx], self.cellSegments[secondIdx]
+            ax, ay = self.x1[segA], self.y1[segA]
+            rx, ry = self.x2[segA] - ax, self.y2[segA] - ay
+            bx, by = self.x1[segB], self.y1[segB]
+            sx, sy = self.x2[segB] - bx, self.y2[segB] - by
+            denominator = rx * sy - ry * sx
+            notParallel = denominator != 0
+            denominator = numpy.where(notParallel, denominator, 1)
+            t = ((bx - ax) * sy - (by - ay) * sx) / denominator
+            u = ((bx - ax) * ry - (by - ay) * rx) / denominator
+            mask = notParallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+            x = (ax + t * rx)[mask]
+            y = (ay + t * ry)[mask]
+            inCell = self.gridKeys(x, y) == self.cellKeys[firstIdx[mask]]
+            yield x[inCell], y[inCell], end / nEntries
+
+    def vertexOwnerKey(self, vertexIdx):
+        return self.owners[self.vertexOwner[vertexIdx]]
+
+    def vertexGeometry(self, vertexIdx):
+        return self.pointGeometry(self.vertexX[vertexIdx], self.vertexY[vertexIdx])
+
+    def segmentGeometry(self, segmentIdx):
+        return QgsGeometry(
+            QgsLineString(
+                [
+                    QgsPoint(self.x1[segmentIdx], self.y1[segmentIdx]),
+                    QgsPoint(self.x2[segmentIdx], self.y2[segmentIdx]),
+                ]
+            )
+        )
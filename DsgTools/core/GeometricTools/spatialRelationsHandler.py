@@ -45,9 +45,11 @@ from qgis.PyQt.QtGui import QRegExpValidator
 from .featureHandler import FeatureHandler
 from .geometryHandler import GeometryHandler
 from .layerHandler import LayerHandler
+from DsgTools.core.DSGToolsProcessingAlgs.algProfiler import algProfiler
 from DsgTools.core.DSGToolsProcessingAlgs.algRunner import AlgRunner
 
 
+@algProfiler.profileMethods()
 class SpatialRelationsHandler(QObject):
     __predicates = (
         QCoreApplication.translate("EnforceSpatialRulesAlgorithm", "equals"),
@@ -304,11 +306,33 @@ class SpatialRelationsHandler(QObject):
         contourIdDict,
         feedback=None,
     ):
+        """
+        Relates each area built from the contours to the contours on its
+        boundary, using one prepared geometry per area.
+        """
         boundsGeom = (
             [i for i in geoBoundsLyr.getFeatures()][0].geometry()
             if geoBoundsLyr is not None
             else None
         )
+        boundsEngine = None
+        if boundsGeom is not None:
+            boundsEngine = QgsGeometry.createGeometryEngine(boundsGeom.constGet())
+            boundsEngine.prepareGeometry()
+        clippedContourDict = dict()
+
+        def clippedContour(contourId):
+            # each contour bounds two areas, so it is clipped only once
+            if contourId not in clippedContourDict:
+                contourGeom = contourIdDict[contourId].geometry()
+                clippedContourDict[contourId] = (
+                    contourGeom
+                    if boundsEngine is None
+                    or not boundsEngine.intersects(contourGeom.constGet())
+                    else contourGeom.intersection(boundsGeom)
+                )
+            return clippedContourDict[contourId]
+
         nPolygons = polygonLyr.featureCount()
         size = 100 / nPolygons if nPolygons else 0
         for current, feat in enumerate(polygonLyr.getFeatures()):
@@ -316,26 +340,21 @@ class SpatialRelationsHandler(QObject):
                 break
             featId = feat.id()
             geom = feat.geometry()
-            featBB = geom.boundingBox()
             contourAreaDict["areaSpatialIdx"].addFeature(feat)
             contourAreaDict["areaIdDict"][featId] = feat
             if featId not in contourAreaDict["areaContourRelations"]:
                 contourAreaDict["areaContourRelations"][featId] = defaultdict(list)
-            for contourId in contourSpatialIdx.intersects(featBB):
-                if feedback is not None and feedback.isCanceled():
-                    break
+            areaEngine = QgsGeometry.createGeometryEngine(geom.constGet())
+            areaEngine.prepareGeometry()
+            for contourId in contourSpatialIdx.intersects(geom.boundingBox()):
                 candidateContourFeat = contourIdDict[contourId]
-                if candidateContourFeat.geometry().intersects(geom):
-                    contourValue = candidateContourFeat[attributeName]
-                    candidateContourGeom = (
-                        candidateContourFeat.geometry()
-                        if boundsGeom is not None
-                        and not candidateContourFeat.geometry().intersects(boundsGeom)
-                        else candidateContourFeat.geometry().intersection(boundsGeom)
-                    )
-                    contourAreaDict["areaContourRelations"][featId][
-                        contourValue
-                    ].append(candidateContourGeom)
+                if not areaEngine.intersects(
+                    candidateContourFeat.geometry().constGet()
+                ):
+                    continue
+                contourAreaDict["areaContourRelations"][featId][
+                    candidateContourFeat[attributeName]
+                ].append(clippedContour(contourId))
             if feedback is not None:
                 feedback.setProgress(current * size)
 
@@ -360,7 +379,9 @@ class SpatialRelationsHandler(QObject):
         self, contourAreaDict, threshold, context=None, feedback=None
     ):
         """
-        Can be more efficient, the first draft will be of several for inside for.
+        Each area is bounded by the contours around it, so two of them whose
+        heights differ by more than the threshold mean that a contour between
+        them is missing.
         """
         relationCount = len(contourAreaDict["areaContourRelations"])
         size = 100 / relationCount if relationCount else 0
@@ -380,10 +401,10 @@ class SpatialRelationsHandler(QObject):
                 for geom in heightDict[h1]:
                     if feedback is not None and feedback.isCanceled():
                         break
-                    shortestLineGeomList = [
-                        geom.shortestLine(i) for i in heightDict[h2]
-                    ]
-                    shortestLine = min(shortestLineGeomList, key=lambda x: x.length())
+                    shortestLine = min(
+                        (geom.shortestLine(i) for i in heightDict[h2]),
+                        key=lambda x: x.length(),
+                    )
                     missingContourFlagDict.update(
                         {
                             shortestLine.asWkb(): self.tr(
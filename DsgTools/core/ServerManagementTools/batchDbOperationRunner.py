@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-26
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from qgis.core import Qgis, QgsMessageLog
+from qgis.PyQt.QtCore import QCoreApplication
+
+from DsgTools.core.Factories.DbFactory.dbFactory import DbFactory
+from DsgTools.core.dsgEnums import DsgEnums
+
+
+class DbConnectionPool(object):
+    """
+    Pool of PostGIS connections to the databases of a server. Qt sql
+    connections can only be used by the thread that opened them, so the
+    idle connections are kept apart per thread and a connection is only
+    handed back to the thread that opened it. Each thread keeps at most
+    maxIdle idle connections; the least recently used ones are closed.
+    """
+
+    def __init__(self, host, port, user, password, maxIdle=2):
+        self.connectionParams = (host, port, user, password)
+        self.maxIdle = maxIdle
+        self.lock = threading.Lock()
+        self.idleDict = defaultdict(OrderedDict)
+        self.openedConnections = 0
+
+    def tr(self, string):
+        return QCoreApplication.translate("DbConnectionPool", string)
+
+    def acquire(self, dbName):
+        """
+        Returns a connection to dbName owned by the calling thread, reusing
+        an idle one when possible.
+        """
+        threadIdle = self.idleDict[threading.get_ident()]
+        abstractDb = threadIdle.pop(dbName, None)
+        if abstractDb is not None:
+            return abstractDb
+        host, port, user, password = self.connectionParams
+        abstractDb = DbFactory().createDbFactory(DsgEnums.DriverPostGIS)
+        if not abstractDb.testCredentials(host, port, dbName, user, password):
+            raise Exception(self.tr("Unable to connect to ") + dbName)
+        with self.lock:
+            self.openedConnections += 1
+        return abstractDb
+
+    def release(self, abstractDb, discard=False):
+        """
+        Gives the connection back to the pool of the calling thread.
+        :param discard: (bool) closes the connection instead (e.g. after the
+            database was dropped).
+        """
+        if discard:
+            abstractDb.closeDatabase()
+            return
+        threadIdle = self.idleDict[threading.get_ident()]
+        threadIdle[abstractDb.getDatabaseName()] = abstractDb
+        while len(threadIdle) > self.maxIdle:
+            threadIdle.popitem(last=False)[1].closeDatabase()
+
+    def closeThreadConnections(self):
+        """
+        Closes the idle connections of the calling thread.
+        """
+        threadIdle = self.idleDict.pop(threading.get_ident(), OrderedDict())
+        for abstractDb in threadIdle.values():
+            abstractDb.closeDatabase()
+
+
+class BatchDbOperationRunner(object):
+    """
+    Runs batch operations (drop, PostGIS upgrade, style import and sql
+    customization) on databases of a server with a pool of worker threads
+    sharing a DbConnectionPool. It does not depend on the BatchDbManager
+    dialog, so batches can be scripted:
+
+        runner = BatchDbOperationRunner.fromAbstractDb(serverAbstractDb, 8)
+        successList, exceptionDict = runner.customizeFromSQLFile(dbList, path)
+        print(runner.formatReport())
+
+    Every operation returns (successList, exceptionDict) and fills
+    self.report with the wall time, the throughput and the time spent on
+    each database.
+    """
+
+    def __init__(
+        self, host, port, user, password, serverDbName="postgres", maxWorkers=None
+    ):
+        """
+        :param serverDbName: (str) database used for server wide commands,
+            such as dropping databases.
+        :param maxWorkers: (int) number of databases handled at the same
+            time. Defaults to the number of cpus minus one.
+        """
+        self.pool = DbConnectionPool(host, port, user, password)
+        self.serverDbName = serverDbName
+        self.maxWorkers = maxWorkers or max(1, os.cpu_count() - 1)
+        self.report = dict()
+
+    @classmethod
+    def fromAbstractDb(cls, serverAbstractDb, maxWorkers=None):
+        """
+        Builds a runner with the connection parameters of serverAbstractDb.
+        """
+        host, port, user, password = serverAbstractDb.getParamsFromConectedDb()
+        return cls(
+            host,
+            port,
+            user,
+            password,
+            serverDbName=serverAbstractDb.getDatabaseName(),
+            maxWorkers=maxWorkers,
+        )
+
+    def tr(self, string):
+        return QCoreApplication.translate("BatchDbOperationRunner", string)
+
+    def run(self, operationName, dbNameList, dbOperation, feedback=None):
+        """
+        Runs dbOperation(dbName) on each database of dbNameList. Canceling
+        feedback stops new databases from being started; those are reported
+        as canceled.
+        :param feedback: (QgsFeedback) progress and cancel.
+        :return: (tuple) list of databases where the operation succeeded and
+            dict {dbName: error message}.
+        """
+        dbQueue = queue.Queue()
+        for dbName in dbNameList:
+            dbQueue.put(dbName)
+        successList, exceptionDict, timingDict = [], dict(), dict()
+        lock = threading.Lock()
+        nDbs = len(dbNameList)
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        dbName = dbQueue.get_nowait()
+                    except queue.Empty:
+                        return
+                    if feedback is not None and feedback.isCanceled():
+                        with lock:
+                            exceptionDict[dbName] = self.tr("Canceled.")
+                        continue
+                    start = time.perf_counter()
+                    error = None
+                    try:
+                        dbOperation(dbName)
+                    except Exception as e:
+                        error = ":".join(map(str, e.args))
+                    with lock:
+                        timingDict[dbName] = time.perf_counter() - start
+                        if error is None:
+                            successList.append(dbName)
+                        else:
+                            exceptionDict[dbName] = error
+                        if feedback is not None and nDbs:
+                            feedback.setProgress(100 * len(timingDict) / nDbs)
+            finally:
+                self.pool.closeThreadConnections()
+
+        start = time.perf_counter()
+        nWorkers = max(1, min(self.maxWorkers, nDbs))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=nWorkers) as executor:
+            for _ in range(nWorkers):
+                executor.submit(worker)
+        wallTime = time.perf_counter() - start
+        self.report = {
+            "operation": operationName,
+            "workers": nWorkers,
+            "databases": nDbs,
+            "wall_time": wallTime,
+            "throughput": len(timingDict) / wallTime if wallTime else None,
+            "timing": timingDict,
+            "errors": len(exceptionDict),
+        }
+        QgsMessageLog.logMessage(self.formatReport(), "DSGTools Plugin", Qgis.Info)
+        return [i for i in dbNameList if i in successList], exceptionDict
+
+    def formatReport(self, limit=10):
+        """
+        Returns the last report as text, with the slowest databases first.
+        """
+        if not self.report:
+            return ""
+        lineList = [
+            self.tr(
+                "{operation}: {databases} databases in {wall_time:.2f} s with {workers} workers ({throughput:.2f} databases/s, {errors} errors)"
+            ).format(**dict(self.report, throughput=self.report["throughput"] or 0))
+        ]
+        slowestList = sorted(
+            self.report["timing"].items(), key=lambda x: x[1], reverse=True
+        )
+        lineList += [
+            "{0}: {1:.2f} s".format(dbName, elapsed)
+            for dbName, elapsed in slowestList[:limit]
+        ]
+        return "\n".join(lineList)
+
+    def runOnConnection(self, dbName, method):
+        """
+        Calls method(abstractDb) with a pooled connection to dbName.
+        """
+        abstractDb = self.pool.acquire(dbName)
+        try:
+            return method(abstractDb)
+        finally:
+            self.pool.release(abstractDb)
+
+    def dropDatabases(self, dbNameList, feedback=None):
+        def dropDatabase(dbName):
+            self.runOnConnection(
+                self.serverDbName, lambda serverDb: serverDb.dropDatabase(dbName)
+            )
+
+        return self.run(
+            self.tr("Drop databases"), dbNameList, dropDatabase, feedback=feedback
+        )
+
+    def upgradePostgis(self, dbNameList, feedback=None):
+        """
+        Upgrades PostGIS on each database. Template databases are unset as
+        templates during the upgrade.
+        """
+
+        def upgradePostgis(dbName):
+            serverDb = self.pool.acquire(self.serverDbName)
+            try:
+                isTemplate = serverDb.checkIfTemplate(dbName)
+                if isTemplate:
+                    serverDb.setDbAsTemplate(dbName=dbName, setTemplate=False)
+                try:
+                    self.runOnConnection(
+                        dbName, lambda abstractDb: abstractDb.upgradePostgis()
+                    )
+                finally:
+                    if isTemplate:
+                        serverDb.setDbAsTemplate(dbName=dbName, setTemplate=True)
+            finally:
+                self.pool.release(serverDb)
+
+        return self.run(
+            self.tr("Upgrade PostGIS"), dbNameList, upgradePostgis, feedback=feedback
+        )
+
+    def importStyles(self, dbNameList, styleList, feedback=None):
+        """
+        :param styleList: (list) style folders, such as edgv_3/example.
+        """
+
+        def importStyles(dbName):
+            def importIntoDb(abstractDb):
+                for style in styleList:
+                    abstractDb.importStylesIntoDb(style)
+
+            self.runOnConnection(dbName, importIntoDb)
+
+        return self.run(
+            self.tr("Import styles"), dbNameList, importStyles, feedback=feedback
+        )
+
+    def customizeFromSQLFile(self, dbNameList, sqlFilePath, feedback=None):
+        return self.run(
+            self.tr("Customize from SQL file"),
+            dbNameList,
+            lambda dbName: self.runOnConnection(
+                dbName, lambda abstractDb: abstractDb.runSqlFromFile(sqlFilePath)
+            ),
+            feedback=feedback,
+        )
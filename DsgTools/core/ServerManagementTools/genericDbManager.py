@@ -25,12 +25,18 @@ from builtins import str
 from osgeo import ogr
 from uuid import uuid4
 import codecs, os, json, binascii
+import concurrent.futures
+import queue
+import threading
 
 # DSG Tools imports
 from DsgTools.core.Factories.DbFactory.dbFactory import DbFactory
 from DsgTools.core.Utils.utils import Utils
 from DsgTools.core.dsgEnums import DsgEnums
 
+# QGIS imports
+from qgis.core import Qgis, QgsMessageLog
+
 # qgis.PyQt imports
 from qgis.PyQt.Qt import QObject
 
@@ -304,57 +310,60 @@ class GenericDbManager(QObject):
         self.createSetting(configName, edgvVersion, newJsonDict)
         return self.installSetting(configName, dbNameList=dbList)
 
-    def installSetting(self, configName, dbNameList=[]):
+    def installSetting(self, configName, dbNameList=[], maxWorkers=1, feedback=None):
         """
         Generic install. Can be reimplenented in child methods.
+        :param maxWorkers: (int) number of databases handled at the same time.
+            See runOnDatabases.
+        :param feedback: (QgsFeedback) used to cancel the rollout.
         """
-        errorDict = dict()
         settingType = self.getManagerType()
         if dbNameList == []:
             dbNameList = list(self.dbDict.keys())
-        successList = []
         configEdgvVersion = self.getSettingVersion(configName)
-        for dbName in dbNameList:
-            abstractDb = self.instantiateAbstractDb(dbName)
-            edgvVersion = abstractDb.getDatabaseVersion()
-            if edgvVersion != configEdgvVersion:
-                errorDict[dbName] = self.tr("Database version missmatch.")
-                continue
-            recDict = self.adminDb.getRecordFromAdminDb(
-                settingType, configName, edgvVersion
+        return self.runOnDatabases(
+            dbNameList,
+            lambda abstractDb, adminDb, dbName: self.installSettingOnDatabase(
+                abstractDb, adminDb, configName, settingType, configEdgvVersion
+            ),
+            maxWorkers=maxWorkers,
+            feedback=feedback,
+        )
+
+    def installSettingOnDatabase(
+        self, abstractDb, adminDb, configName, settingType, configEdgvVersion
+    ):
+        edgvVersion = abstractDb.getDatabaseVersion()
+        if edgvVersion != configEdgvVersion:
+            raise Exception(self.tr("Database version missmatch."))
+        recDict = adminDb.getRecordFromAdminDb(settingType, configName, edgvVersion)
+        if not abstractDb.checkIfExistsConfigTable(settingType):
+            abstractDb.createPropertyTable(settingType, useTransaction=True)
+        try:
+            abstractDb.db.transaction()
+            adminDb.db.transaction()
+            self.materializeIntoDatabase(
+                abstractDb, recDict
+            )  # step done when property management involves changing database structure
+            abstractDb.insertRecordInsidePropertyTable(
+                settingType, recDict, edgvVersion
             )
-            try:
-                if not abstractDb.checkIfExistsConfigTable(settingType):
-                    abstractDb.createPropertyTable(settingType, useTransaction=True)
-            except Exception as e:
-                errorDict[dbName] = ":".join(e.args)
-                continue
-            try:
-                abstractDb.db.transaction()
-                self.adminDb.db.transaction()
-                self.materializeIntoDatabase(
-                    abstractDb, recDict
-                )  # step done when property management involves changing database structure
-                abstractDb.insertRecordInsidePropertyTable(
-                    settingType, recDict, edgvVersion
-                )
-                dbOid = abstractDb.getDbOID()
-                self.adminDb.insertInstalledRecordIntoAdminDb(
-                    settingType, recDict, dbOid
-                )
-                abstractDb.db.commit()
-                self.adminDb.db.commit()
-            except Exception as e:
-                abstractDb.db.rollback()
-                self.adminDb.db.rollback()
-                errorDict[dbName] = ":".join(e.args)
-            successList.append(dbName)
-        return (successList, errorDict)
+            dbOid = abstractDb.getDbOID()
+            adminDb.insertInstalledRecordIntoAdminDb(settingType, recDict, dbOid)
+            abstractDb.db.commit()
+            adminDb.db.commit()
+        except Exception:
+            abstractDb.db.rollback()
+            adminDb.db.rollback()
+            raise
 
-    def deleteSetting(self, configName, dbNameList=[]):
+    def deleteSetting(self, configName, dbNameList=[], maxWorkers=1, feedback=None):
         """
         Generic remove. Can be reimplenented in child methods.
         1. Get property dict from adminDb
+        :param maxWorkers: (int) number of databases handled at the same time.
+            See runOnDatabases.
+        :param feedback: (QgsFeedback) used to cancel the rollout.
         """
         errorDict = dict()
         successList = []
@@ -362,84 +371,211 @@ class GenericDbManager(QObject):
         propertyDict = self.adminDb.getPropertyPerspectiveDict(
             settingType, DsgEnums.Property
         )
-        if configName in list(propertyDict.keys()):
-            for dbName in propertyDict[configName]:
-                if not dbName:
-                    try:
-                        self.adminDb.db.transaction()
-                        self.adminDb.removeRecordFromPropertyTable(
-                            settingType, configName, None
-                        )
-                        self.adminDb.db.commit()
-                        successList.append(dbName)
-                    except Exception as e:
-                        self.adminDb.db.rollback()
-                        errorDict[dbName] = ":".join(e.args)
-                else:
-                    abstractDb = self.instantiateAbstractDb(dbName)
-                    edgvVersion = abstractDb.getDatabaseVersion()
-                    try:
-                        abstractDb.db.transaction()
-                        self.adminDb.db.transaction()
-                        self.undoMaterializationFromDatabase(
-                            abstractDb, configName, settingType, edgvVersion
-                        )  # step done when property management involves changing database structure
-                        abstractDb.removeRecordFromPropertyTable(
-                            settingType, configName, edgvVersion
-                        )
-                        self.adminDb.removeRecordFromPropertyTable(
-                            settingType, configName, edgvVersion
-                        )
-                        abstractDb.db.commit()
-                        self.adminDb.db.commit()
-                        successList.append(dbName)
-                    except Exception as e:
-                        abstractDb.db.rollback()
-                        self.adminDb.db.rollback()
-                        errorDict[dbName] = ":".join(e.args)
+        if configName not in list(propertyDict.keys()):
+            return (successList, errorDict)
+        dbList = [dbName for dbName in propertyDict[configName] if dbName]
+        for dbName in propertyDict[configName]:
+            if dbName:
+                continue
+            # setting that is not installed on any database
+            try:
+                self.adminDb.db.transaction()
+                self.adminDb.removeRecordFromPropertyTable(
+                    settingType, configName, None
+                )
+                self.adminDb.db.commit()
+                successList.append(dbName)
+            except Exception as e:
+                self.adminDb.db.rollback()
+                errorDict[dbName] = ":".join(e.args)
+        dbSuccessList, dbErrorDict = self.runOnDatabases(
+            dbList,
+            lambda abstractDb, adminDb, dbName: self.deleteSettingFromDatabase(
+                abstractDb, adminDb, configName, settingType
+            ),
+            maxWorkers=maxWorkers,
+            feedback=feedback,
+        )
+        successList += dbSuccessList
+        errorDict.update(dbErrorDict)
         return (successList, errorDict)
 
-    def uninstallSetting(self, configName, dbNameList=[]):
+    def deleteSettingFromDatabase(self, abstractDb, adminDb, configName, settingType):
+        edgvVersion = abstractDb.getDatabaseVersion()
+        try:
+            abstractDb.db.transaction()
+            adminDb.db.transaction()
+            self.undoMaterializationFromDatabase(
+                abstractDb, configName, settingType, edgvVersion
+            )  # step done when property management involves changing database structure
+            abstractDb.removeRecordFromPropertyTable(
+                settingType, configName, edgvVersion
+            )
+            adminDb.removeRecordFromPropertyTable(settingType, configName, edgvVersion)
+            abstractDb.db.commit()
+            adminDb.db.commit()
+        except Exception:
+            abstractDb.db.rollback()
+            adminDb.db.rollback()
+            raise
+
+    def uninstallSetting(self, configName, dbNameList=[], maxWorkers=1, feedback=None):
         """
         Generic uninstall. Can be reimplenented in child methods.
         This can uninstall setting on a list of databases or in all databases (if dbNameList == [])
+        :param maxWorkers: (int) number of databases handled at the same time.
+            See runOnDatabases.
+        :param feedback: (QgsFeedback) used to cancel the rollout.
         """
-        errorDict = dict()
-        successList = []
         settingType = self.getManagerType()
         propertyDict = self.adminDb.getPropertyPerspectiveDict(
             settingType, DsgEnums.Property
         )
-        if configName in list(propertyDict.keys()):
-            if (
-                dbNameList == []
-            ):  # builds filter dbList to uninstall in all installed databases
-                dbList = propertyDict[configName]
-            else:  # builds filter dbList to uninstall in databases in dbNameList
-                dbList = [i for i in propertyDict[configName] if i in dbNameList]
-            for dbName in dbList:
-                abstractDb = self.instantiateAbstractDb(dbName)
-                edgvVersion = abstractDb.getDatabaseVersion()
+        if configName not in list(propertyDict.keys()):
+            return ([], dict())
+        if (
+            dbNameList == []
+        ):  # builds filter dbList to uninstall in all installed databases
+            dbList = propertyDict[configName]
+        else:  # builds filter dbList to uninstall in databases in dbNameList
+            dbList = [i for i in propertyDict[configName] if i in dbNameList]
+        return self.runOnDatabases(
+            dbList,
+            lambda abstractDb, adminDb, dbName: self.uninstallSettingFromDatabase(
+                abstractDb, adminDb, configName, settingType, dbName
+            ),
+            maxWorkers=maxWorkers,
+            feedback=feedback,
+        )
+
+    def uninstallSettingFromDatabase(
+        self, abstractDb, adminDb, configName, settingType, dbName
+    ):
+        edgvVersion = abstractDb.getDatabaseVersion()
+        try:
+            abstractDb.db.transaction()
+            adminDb.db.transaction()
+            self.undoMaterializationFromDatabase(
+                abstractDb, configName, settingType, edgvVersion
+            )  # step done when property management involves changing database structure
+            abstractDb.removeRecordFromPropertyTable(
+                settingType, configName, edgvVersion
+            )
+            adminDb.uninstallPropertyOnAdminDb(
+                settingType, configName, edgvVersion, dbName=dbName
+            )
+            abstractDb.db.commit()
+            adminDb.db.commit()
+        except Exception:
+            abstractDb.db.rollback()
+            adminDb.db.rollback()
+            raise
+
+    def runOnDatabases(self, dbNameList, dbOperation, maxWorkers=1, feedback=None):
+        """
+        Runs dbOperation(abstractDb, adminDb, dbName) on each database. Each
+        operation manages its own transactions on the database and on
+        dsgtools_admindb, so a failure on one database does not change the
+        others.
+        With maxWorkers > 1, databases are handled by a pool of maxWorkers
+        threads. Qt sql connections can only be used by the thread that
+        opened them, so each worker opens its own dsgtools_admindb connection
+        and a new connection to each database it handles.
+        Canceling feedback stops new databases from being started; the ones
+        already started are committed or rolled back as usual, and the ones
+        not started are reported as canceled. feedback progress is set as
+        databases are handled.
+        :param maxWorkers: (int) number of databases handled at the same
+            time. None means the number of cpus minus one.
+        :return: (tuple) list of databases where the operation succeeded and
+            dict {dbName: error message}.
+        """
+        maxWorkers = max(1, os.cpu_count() - 1) if maxWorkers is None else maxWorkers
+        successList, errorDict = [], dict()
+        if maxWorkers <= 1 or len(dbNameList) <= 1:
+            for dbName in dbNameList:
+                if feedback is not None and feedback.isCanceled():
+                    errorDict[dbName] = self.tr("Canceled.")
+                    continue
                 try:
-                    abstractDb.db.transaction()
-                    self.adminDb.db.transaction()
-                    self.undoMaterializationFromDatabase(
-                        abstractDb, configName, settingType, edgvVersion
-                    )  # step done when property management involves changing database structure
-                    abstractDb.removeRecordFromPropertyTable(
-                        settingType, configName, edgvVersion
-                    )
-                    self.adminDb.uninstallPropertyOnAdminDb(
-                        settingType, configName, edgvVersion, dbName=dbName
-                    )
-                    abstractDb.db.commit()
-                    self.adminDb.db.commit()
+                    abstractDb = self.instantiateAbstractDb(dbName)
+                    dbOperation(abstractDb, self.adminDb, dbName)
+                    successList.append(dbName)
                 except Exception as e:
-                    abstractDb.db.rollback()
-                    self.adminDb.db.rollback()
-                    errorDict[dbName] = ":".join(e.args)
-                successList.append(dbName)
-        return (successList, errorDict)
+                    errorDict[dbName] = ":".join(map(str, e.args))
+                if feedback is not None:
+                    feedback.setProgress(
+                        100 * (len(successList) + len(errorDict)) / len(dbNameList)
+                    )
+            return (successList, errorDict)
+        connectionParams = self.serverAbstractDb.getParamsFromConectedDb()
+        dbQueue = queue.Queue()
+        for dbName in dbNameList:
+            dbQueue.put(dbName)
+        lock = threading.Lock()
+
+        def worker():
+            adminDb = self.connectToDatabase("dsgtools_admindb", connectionParams)
+            try:
+                while True:
+                    try:
+                        dbName = dbQueue.get_nowait()
+                    except queue.Empty:
+                        return
+                    if feedback is not None and feedback.isCanceled():
+                        with lock:
+                            errorDict[dbName] = self.tr("Canceled.")
+                        continue
+                    abstractDb = None
+                    try:
+                        abstractDb = self.connectToDatabase(dbName, connectionParams)
+                        dbOperation(abstractDb, adminDb, dbName)
+                        with lock:
+                            successList.append(dbName)
+                    except Exception as e:
+                        with lock:
+                            errorDict[dbName] = ":".join(map(str, e.args))
+                    finally:
+                        if abstractDb is not None:
+                            abstractDb.closeDatabase()
+                    if feedback is not None:
+                        with lock:
+                            nDone = len(successList) + len(errorDict)
+                        feedback.setProgress(100 * nDone / len(dbNameList))
+            finally:
+                adminDb.closeDatabase()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futureList = [
+                executor.submit(worker) for _ in range(min(maxWorkers, len(dbNameList)))
+            ]
+        for future in futureList:
+            # errors opening the dsgtools_admindb connection of a worker
+            if future.exception() is not None:
+                QgsMessageLog.logMessage(
+                    self.tr("Error on database worker: ")
+                    + ":".join(map(str, future.exception().args)),
+                    "DSGTools Plugin",
+                    Qgis.Critical,
+                )
+        # databases left behind by workers that could not connect
+        while not dbQueue.empty():
+            errorDict[dbQueue.get_nowait()] = self.tr(
+                "Unable to connect to dsgtools_admindb."
+            )
+        return ([i for i in dbNameList if i in successList], errorDict)
+
+    def connectToDatabase(self, dbName, connectionParams):
+        """
+        Opens a new connection to dbName on the server, owned by the calling
+        thread.
+        :param connectionParams: (tuple) host, port, user and password.
+        """
+        host, port, user, password = connectionParams
+        abstractDb = DbFactory().createDbFactory(DsgEnums.DriverPostGIS)
+        if not abstractDb.testCredentials(host, port, dbName, user, password):
+            raise Exception(self.tr("Unable to connect to ") + dbName)
+        return abstractDb
 
     def materializeIntoDatabase(self, abstractDb, propertyDict):
         """
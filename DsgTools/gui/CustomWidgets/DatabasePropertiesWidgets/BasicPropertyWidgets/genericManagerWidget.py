@@ -33,6 +33,7 @@ from qgis.PyQt.QtWidgets import (
     QFileDialog,
     QMenu,
     QHeaderView,
+    QProgressDialog,
 )
 from qgis.PyQt.QtGui import QCursor
 
@@ -41,7 +42,7 @@ from DsgTools.gui.CustomWidgets.SelectionWidgets.listSelector import ListSelecto
 from DsgTools.core.Utils.utils import Utils
 from DsgTools.core.dsgEnums import DsgEnums
 
-from qgis.core import QgsMessageLog, Qgis
+from qgis.core import QgsMessageLog, Qgis, QgsFeedback
 import json
 
 FORM_CLASS, _ = uic.loadUiType(
@@ -100,6 +101,12 @@ class GenericManagerWidget(QtWidgets.QWidget, FORM_CLASS):
         self.setButtons()
         self.treeWidget.setContextMenuPolicy(Qt.CustomContextMenu)
         self.treeWidget.customContextMenuRequested.connect(self.createMenuAssigned)
+        # number of databases handled at the same time when settings are
+        # installed, uninstalled or deleted. None means the number of cpus
+        # minus one.
+        self.maxWorkers = None
+        self.feedback = None
+        self.progressDialog = None
 
     def setButtons(self):
         createText = self.createPushButton.text()
@@ -413,11 +420,23 @@ class GenericManagerWidget(QtWidgets.QWidget, FORM_CLASS):
 
     def manageSetting(self, config, manageType, dbList=[], parameterDict=dict()):
         if manageType == GenericManagerWidget.Install:
-            return self.genericDbManager.installSetting(config, dbNameList=dbList)
+            return self.genericDbManager.installSetting(
+                config,
+                dbNameList=dbList,
+                maxWorkers=self.maxWorkers,
+                feedback=self.feedback,
+            )
         elif manageType == GenericManagerWidget.Delete:
-            return self.genericDbManager.deleteSetting(config)
+            return self.genericDbManager.deleteSetting(
+                config, maxWorkers=self.maxWorkers, feedback=self.feedback
+            )
         elif manageType == GenericManagerWidget.Uninstall:
-            return self.genericDbManager.uninstallSetting(config, dbNameList=dbList)
+            return self.genericDbManager.uninstallSetting(
+                config,
+                dbNameList=dbList,
+                maxWorkers=self.maxWorkers,
+                feedback=self.feedback,
+            )
         elif manageType == GenericManagerWidget.Update:
             return self.genericDbManager.updateSetting(
                 config, parameterDict["newJsonDict"]
@@ -464,15 +483,30 @@ class GenericManagerWidget(QtWidgets.QWidget, FORM_CLASS):
         exceptionDict = dict()
         dbList = [] if dbList is None else dbList
         if self.lookAndPromptForStructuralChanges(dbList=dbList):
-            for config in selectedConfig:
-                QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
-                sucessList, errorDict = self.manageSetting(
-                    config, manageType, dbList=dbList, parameterDict=parameterDict
-                )
-                QApplication.restoreOverrideCursor()
-                successDict[config] = sucessList
-                if errorDict != dict():
-                    exceptionDict[config] = errorDict
+            self.startProgress(len(selectedConfig))
+            try:
+                for step, config in enumerate(selectedConfig):
+                    if self.feedback.isCanceled():
+                        break
+                    self.progressDialog.setLabelText(
+                        self.tr("Processing {0}...").format(config)
+                    )
+                    self.progressDialog.setValue(step)
+                    QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
+                    try:
+                        sucessList, errorDict = self.manageSetting(
+                            config,
+                            manageType,
+                            dbList=dbList,
+                            parameterDict=parameterDict,
+                        )
+                    finally:
+                        QApplication.restoreOverrideCursor()
+                    successDict[config] = sucessList
+                    if errorDict != dict():
+                        exceptionDict[config] = errorDict
+            finally:
+                self.stopProgress()
             self.refresh()
             return successDict, exceptionDict
         else:
@@ -481,6 +515,40 @@ class GenericManagerWidget(QtWidgets.QWidget, FORM_CLASS):
             )
             return (dict(), dict())
 
+    def startProgress(self, nSteps):
+        """
+        Shows a cancelable progress dialog for a settings operation. Canceling
+        it cancels self.feedback, so the databases not started yet are
+        skipped.
+        :param nSteps: (int) number of settings to be handled.
+        """
+        self.feedback = QgsFeedback()
+        self.progressDialog = QProgressDialog("", self.tr("Cancel"), 0, nSteps, self)
+        self.progressDialog.setWindowTitle(self.widgetName)
+        self.progressDialog.setWindowModality(Qt.WindowModal)
+        self.progressDialog.setMinimumDuration(0)
+        self.progressDialog.canceled.connect(self.feedback.cancel)
+        # the widget lives on the gui thread, so progress reported by worker
+        # threads is queued and only the gui thread touches the dialog
+        self.feedback.progressChanged.connect(self.onSettingProgress)
+
+    def onSettingProgress(self, progress):
+        """
+        Processes pending events while databases are handled, so the cancel
+        button of the progress dialog can be clicked.
+        :param progress: (float) progress of the current setting, in percent.
+        """
+        if self.progressDialog is None:
+            return
+        QApplication.processEvents()
+
+    def stopProgress(self):
+        if self.progressDialog is not None:
+            self.progressDialog.canceled.disconnect(self.feedback.cancel)
+            self.progressDialog.close()
+        self.progressDialog = None
+        self.feedback = None
+
     def createMenuAssigned(self, position):
         """
         Creates a pop up menu
@@ -23,7 +23,9 @@ Some parts were inspired by QGIS plugin MultipleLayerSelection
  ***************************************************************************/
 """
 
+import concurrent.futures
 import os
+import threading
 from functools import partial
 
 from qgis.gui import QgsMapTool, QgsRubberBand
@@ -35,6 +37,8 @@ from qgis.core import (
     QgsProject,
     QgsWkbTypes,
     QgsRasterLayer,
+    QgsVectorLayerFeatureSource,
+    QgsProviderRegistry,
 )
 from qgis.PyQt.QtCore import Qt, QSettings
 from qgis.PyQt.QtGui import QColor, QCursor
@@ -71,6 +75,7 @@ class GenericSelectionTool(QgsMapTool):
         self.cursorChanged = False
         self.menuHovered = False  # indicates hovering actions over context menu
         self.geometryHandler = GeometryHandler(iface=self.iface)
+        self.queryPool = None
 
     def addTool(self, manager, callback, parentMenu, iconBasePath):
         icon_path = iconBasePath + "/genericSelect.png"
@@ -178,6 +183,8 @@ class GenericSelectionTool(QgsMapTool):
                     continue
                 # builds bbRect and select from layer, adding selection
                 bbRect = self.canvas.mapSettings().mapToLayerCoordinates(layer, r)
+                if not self.canContainHits(layer, bbRect):
+                    continue
                 layer.selectByRect(bbRect, behavior=QgsVectorLayer.AddToSelection)
             self.rubberBand.hide()
 
@@ -212,6 +219,103 @@ class GenericSelectionTool(QgsMapTool):
                 return True
         return False
 
+    def canContainHits(self, layer, bbRect):
+        """
+        Tells if layer may have features inside bbRect. The extent is only
+        used as a hint on memory and file layers, where it is known without
+        querying the data source; layers of other providers (databases,
+        services) are always queried, off the main thread.
+        :param bbRect: (QgsRectangle) search rectangle in layer coordinates.
+        """
+        if layer.providerType() == "memory":
+            if layer.featureCount() == 0:
+                return False
+        elif layer.providerType() != "ogr" or not os.path.isfile(
+            QgsProviderRegistry.instance()
+            .decodeUri("ogr", layer.source())
+            .get("path", "")
+        ):
+            return True
+        extent = layer.extent()
+        return extent.isNull() or extent.intersects(bbRect)
+
+    def queryLayer(self, source, bbRect, searchRect, canceled):
+        """
+        Gets the features of a layer feature source that intersect
+        searchRect. Runs on the query pool.
+        """
+        featureList = []
+        for feature in source.getFeatures(QgsFeatureRequest(bbRect)):
+            if canceled.is_set():
+                break
+            geom = feature.geometry()
+            if geom and geom.intersects(searchRect):
+                featureList.append(feature)
+        return featureList
+
+    def getLayerFeatures(self, layers, rect):
+        """
+        Queries the layers concurrently for the features that intersect rect.
+        Layers that cannot contain hits are skipped. As only the strongest
+        geometry type is kept, the results are returned as soon as every
+        layer of the strongest geometry type with hits has answered; the
+        remaining queries are canceled.
+        :param rect: (QgsRectangle) search rectangle in canvas coordinates.
+        :return: (dict) {QgsVectorLayer: list of QgsFeature}
+        """
+        if self.queryPool is None:
+            self.queryPool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, os.cpu_count() - 1)
+            )
+        canceled = threading.Event()
+        futureDict, pendingByGeomType = dict(), dict()
+        for layer in layers:
+            if not isinstance(layer, QgsVectorLayer):
+                continue
+            bbRect = self.canvas.mapSettings().mapToLayerCoordinates(layer, rect)
+            if not self.canContainHits(layer, bbRect):
+                continue
+            # feature sources are created here, as layers live on the main thread
+            future = self.queryPool.submit(
+                self.queryLayer,
+                QgsVectorLayerFeatureSource(layer),
+                bbRect,
+                self.geometryHandler.reprojectSearchArea(layer, rect),
+                canceled,
+            )
+            futureDict[future] = layer
+            pendingByGeomType[layer.geometryType()] = (
+                pendingByGeomType.get(layer.geometryType(), 0) + 1
+            )
+        lyrFeatDict = dict()
+        try:
+            for future in concurrent.futures.as_completed(futureDict):
+                layer = futureDict[future]
+                pendingByGeomType[layer.geometryType()] -= 1
+                featureList = future.result()
+                if featureList:
+                    lyrFeatDict[layer] = featureList
+                if self.isDecided(lyrFeatDict, pendingByGeomType):
+                    break
+        finally:
+            canceled.set()
+            for future in futureDict:
+                future.cancel()
+        # keeps the layer order of the canvas
+        return {lyr: lyrFeatDict[lyr] for lyr in layers if lyr in lyrFeatDict}
+
+    def isDecided(self, lyrFeatDict, pendingByGeomType):
+        """
+        Tells if the strongest geometry type with hits is already known and
+        every layer of that type has answered.
+        """
+        for geomType in sorted(pendingByGeomType):
+            if pendingByGeomType[geomType] > 0:
+                return False
+            if any(lyr.geometryType() == geomType for lyr in lyrFeatDict):
+                return True
+        return True
+
     def getPrimitiveDict(self, e, hasControlModifier=False, hasAltModifier=False):
         """
         Builds a dict with keys as geometryTypes of layer, which are Qgis.Point (value 0), Qgis.Line (value 1) or Qgis.Polygon (value 2),
@@ -733,8 +837,6 @@ class GenericSelectionTool(QgsMapTool):
         :param e: mouse event caught from canvas.
         """
         selected = QApplication.keyboardModifiers() == Qt.ControlModifier
-        if selected:
-            firstGeom = self.checkSelectedLayers()
         # setting a list of features to iterate over
         layerList = self.getPrimitiveDict(
             e,
@@ -747,38 +849,10 @@ class GenericSelectionTool(QgsMapTool):
         if not layers:
             return
         rect = self.getCursorRect(e)
-        lyrFeatDict = dict()
-        for layer in layers:
-            if not isinstance(layer, QgsVectorLayer):
-                continue
-            geomType = layer.geometryType()
-            # iterate over features inside the mouse bounding box
-            bbRect = self.canvas.mapSettings().mapToLayerCoordinates(layer, rect)
-            for feature in layer.getFeatures(QgsFeatureRequest(bbRect)):
-                geom = feature.geometry()
-                if not geom:
-                    continue
-                searchRect = self.geometryHandler.reprojectSearchArea(layer, rect)
-                if selected:
-                    # if Control was held, appending behaviour is different
-                    if not firstGeom:
-                        firstGeom = geomType
-                    elif firstGeom > geomType:
-                        firstGeom = geomType
-                    if geomType == firstGeom and geom.intersects(searchRect):
-                        # only appends features if it has the same geometry as first selected feature
-                        if layer in lyrFeatDict:
-                            lyrFeatDict[layer].append(feature)
-                        else:
-                            lyrFeatDict[layer] = [feature]
-                else:
-                    if not geom.intersects(searchRect):
-                        continue
-                    if layer in lyrFeatDict:
-                        lyrFeatDict[layer].append(feature)
-                    else:
-                        lyrFeatDict[layer] = [feature]
-        lyrFeatDict = self.filterStrongestGeometry(lyrFeatDict)
+        # features inside the mouse bounding box, keeping only the strongest
+        # geometry type (when Control is held, layers were already filtered
+        # by the geometry type of the selected features)
+        lyrFeatDict = self.filterStrongestGeometry(self.getLayerFeatures(layers, rect))
         if not lyrFeatDict:
             return
         moreThanOneFeat = (
@@ -815,3 +889,6 @@ class GenericSelectionTool(QgsMapTool):
 
     def unload(self):
         self.deactivate()
+        if self.queryPool is not None:
+            self.queryPool.shutdown(wait=False)
+            self.queryPool = None
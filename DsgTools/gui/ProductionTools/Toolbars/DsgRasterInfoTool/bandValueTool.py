@@ -29,6 +29,7 @@ from qgis.PyQt.QtCore import QTimer
 from qgis.PyQt.QtWidgets import QToolTip
 
 from .....core.GeometricTools.geometryHandler import GeometryHandler
+from .....core.GeometricTools.rasterValueService import rasterValueService
 
 
 class BandValueTool(QgsMapTool):
@@ -97,15 +98,11 @@ class BandValueTool(QgsMapTool):
         mousePosGeom = QgsGeometry.fromPoint(mousePos)
         self.geometryHandler.reprojectFeature(mousePosGeom, rasterCrs, self.canvasCrs)
         mousePos = mousePosGeom.asPoint()
-        # identify pixel(s) information
-        i = rasterLayer.dataProvider().identify(mousePos, QgsRaster.IdentifyFormatValue)
-        if i.isValid():
-            text = ", ".join(
-                ["{0:g}".format(r) for r in list(i.results().values()) if r is not None]
-            )
-        else:
-            text = ""
-        return text
+        # pixel(s) information, read from the cached raster blocks
+        valueList = rasterValueService.values(rasterLayer, mousePos)
+        if valueList is None:
+            return ""
+        return ", ".join(["{0:g}".format(r) for r in valueList if r is not None])
 
     def showToolTip(self):
         """ """
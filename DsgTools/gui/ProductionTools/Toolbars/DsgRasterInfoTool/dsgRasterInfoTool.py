@@ -42,6 +42,7 @@ from DsgTools.gui.ProductionTools.Toolbars.DsgRasterInfoTool.bandValueTool impor
     BandValueTool,
 )
 from DsgTools.core.GeometricTools.geometryHandler import GeometryHandler
+from DsgTools.core.GeometricTools.rasterValueService import rasterValueService
 from DsgTools.gui.ProductionTools.Toolbars.DsgRasterInfoTool.assignBandValueTool import (
     AssignBandValueTool,
 )
@@ -313,15 +314,11 @@ class DsgRasterInfoTool(QWidget, Ui_DsgRasterInfoTool):
         canvasCrs = self.canvas.mapSettings().destinationCrs()
         self.geometryHandler.reprojectFeature(mousePosGeom, rasterCrs, canvasCrs)
         mousePos = mousePosGeom.asPoint()
-        # identify pixel(s) information
-        i = rasterLayer.dataProvider().identify(mousePos, QgsRaster.IdentifyFormatValue)
-        if i.isValid():
-            text = ", ".join(
-                ["{0:g}".format(r) for r in list(i.results().values()) if r is not None]
-            )
-        else:
-            text = ""
-        return text
+        # pixel(s) information, read from the cached raster blocks
+        valueList = rasterValueService.values(rasterLayer, mousePos)
+        if valueList is None:
+            return ""
+        return ", ".join(["{0:g}".format(r) for r in valueList if r is not None])
 
     def showToolTip(self, qgsPoint):
         """ """
@@ -361,3 +358,4 @@ class DsgRasterInfoTool(QWidget, Ui_DsgRasterInfoTool):
         self.iface.unregisterMainWindowAction(self.valueSetterButtonAction)
         self.iface.unregisterMainWindowAction(self.bandTooltipButtonAction)
         self.iface.unregisterMainWindowAction(self.dynamicHistogramButtonAction)
+        rasterValueService.shutdown()
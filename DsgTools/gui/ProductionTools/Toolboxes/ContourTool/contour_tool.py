@@ -31,12 +31,16 @@ from qgis.core import (
     QgsFeatureRequest,
     QgsCoordinateTransform,
 )
+from qgis.PyQt.QtCore import QCoreApplication
 from DsgTools.gui.ProductionTools.Toolboxes.ContourTool.contour_value import (
     ContourValue,
 )
 
 
 class ContourTool(object):
+    def tr(self, string):
+        return QCoreApplication.translate("ContourTool", string)
+
     def updateReference(self, referenceLayer):
         """
         Updates the reference layer and updates the spatial index
@@ -49,39 +53,39 @@ class ContourTool(object):
         """
         Populates the spatial index
         """
-        # spatial index
-        self.index = QgsSpatialIndex()
-        for feat in self.reference.getFeatures():
-            self.index.addFeature(feat)
+        # spatial index, bulk loaded from the geometries only
+        self.index = QgsSpatialIndex(
+            self.reference.getFeatures(QgsFeatureRequest().setNoAttributes())
+        )
 
     def getCandidates(self, bbox):
         """
         Gets candidates using the spatial index to speedup the process
         """
-        # features that might satisfy the query
+        # features that might satisfy the query, fetched in a single request
         ids = self.index.intersects(bbox)
-        candidates = []
-        for id in ids:
-            candidates.append(
-                next(self.reference.getFeatures(QgsFeatureRequest().setFilterFid(id)))
-            )
-        return candidates
+        if not ids:
+            return []
+        return list(self.reference.getFeatures(QgsFeatureRequest().setFilterFids(ids)))
 
     def getFeatures(self, geom):
         """
         Gets the features that intersect geom to be updated
         """
-        # features that satisfy the query
-        ret = []
-
-        rect = geom.boundingBox()
-        candidates = self.getCandidates(rect)
-        for candidate in candidates:
-            featGeom = candidate.geometry()
-            if featGeom.intersects(geom):
-                ret.append(candidate)
-
-        return ret
+        # the profile line is prepared once and tested against every candidate
+        engine = self.prepareGeometry(geom)
+        candidates = self.getCandidates(geom.boundingBox())
+        return [
+            candidate
+            for candidate in candidates
+            if candidate.hasGeometry()
+            and engine.intersects(candidate.geometry().constGet())
+        ]
+
+    def prepareGeometry(self, geom):
+        engine = QgsGeometry.createGeometryEngine(geom.constGet())
+        engine.prepareGeometry()
+        return engine
 
     def getKey(self, item):
         """
@@ -94,20 +98,22 @@ class ContourTool(object):
         Sorts features according to the distance
         """
         # sorting by distance
-        distances = []
-
         firstPoint = geom.asPolyline()[0]
         pointGeom = QgsGeometry.fromPointXY(firstPoint)
+        engine = self.prepareGeometry(geom)
 
+        distances = []
         for intersected in features:
-            intersection = geom.intersection(intersected.geometry())
+            intersection = QgsGeometry(
+                engine.intersection(intersected.geometry().constGet())
+            )
             if intersection.type() == QgsWkbTypes.PointGeometry:
                 distance = intersection.distance(pointGeom)
                 distances.append((distance, intersected))
 
-        ordered = sorted(distances, key=self.getKey)
+        distances.sort(key=self.getKey)
         # returning a list of tuples (distance, feature)
-        return ordered
+        return distances
 
     def reproject(self, geom, canvasCrs):
         """
@@ -157,14 +163,21 @@ class ContourTool(object):
                 return -3
             self.first_value = None
 
-        for i in range(1, len(ordered)):
-            # value to be adjusted
-            value = first_value + pace * i
-            # feature that will be updated
-            feature = ordered[i][1]
-            # feature id that will be updated
-            id = feature.id()
-            # actual update in the layer
-            if not self.reference.changeAttributeValue(id, fieldIndex, value):
+        # values computed in one pass, skipping the ones already assigned
+        changes = [
+            (feature.id(), first_value + pace * i, feature.attribute(fieldIndex))
+            for i, (_, feature) in enumerate(ordered)
+            if i > 0 and feature.attribute(fieldIndex) != first_value + pace * i
+        ]
+        if not changes:
+            return 1
+        # the whole stroke is written as a single undo command and the layer
+        # is repainted once
+        self.reference.beginEditCommand(self.tr("Assign contour values"))
+        for id, value, oldValue in changes:
+            if not self.reference.changeAttributeValue(id, fieldIndex, value, oldValue):
+                self.reference.destroyEditCommand()
                 return 0
+        self.reference.endEditCommand()
+        self.reference.triggerRepaint()
         return 1
@@ -45,6 +45,9 @@ from DsgTools.core.Utils.utils import Utils
 from DsgTools.core.Factories.SqlFactory.sqlGeneratorFactory import SqlGeneratorFactory
 from DsgTools.gui.ServerTools.viewServers import ViewServers
 from DsgTools.core.Factories.DbFactory.dbFactory import DbFactory
+from DsgTools.core.ServerManagementTools.batchDbOperationRunner import (
+    BatchDbOperationRunner,
+)
 
 from DsgTools.gui.DatabaseTools.UserTools.profile_editor import ProfileEditor
 from DsgTools.gui.ServerTools.createView import CreateView
@@ -77,6 +80,10 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
         self.dbsCustomSelector.selectionChanged.connect(self.populateStylesInterface)
         self.dbsCustomSelector.selectionChanged.connect(self.populateOtherInterfaces)
         self.previousTab = 0
+        # number of databases handled at the same time by batch operations.
+        # None means the number of cpus minus one.
+        self.maxWorkers = None
+        self.operationRunner = None
         self.dbDict = {
             "2.1.3": [],
             "2.1.3 Pro": [],
@@ -189,8 +196,18 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
                 exceptionDict[dbName] = ":".join(e.args)
         return exceptionDict
 
-    def outputMessage(self, header, successList, exceptionDict):
-        msg = header
+    def createOperationRunner(self):
+        return BatchDbOperationRunner.fromAbstractDb(
+            self.serverWidget.abstractDb, maxWorkers=self.maxWorkers
+        )
+
+    def operationReport(self):
+        if self.operationRunner is None:
+            return ""
+        return self.operationRunner.formatReport() + "\n"
+
+    def outputMessage(self, header, successList, exceptionDict, report=""):
+        msg = header + report
         if len(successList) > 0:
             msg += self.tr("\nSuccessful databases: ")
             msg += ", ".join(successList)
@@ -241,7 +258,9 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
         QApplication.restoreOverrideCursor()
         self.setDatabases()
         header = self.tr("Drop operation complete. \n")
-        self.outputMessage(header, successList, exceptionDict)
+        self.outputMessage(
+            header, successList, exceptionDict, report=self.operationReport()
+        )
         self.dbsCustomSelector.setInitialState(self.dbsCustomSelector.fromLs)
 
     @pyqtSlot(bool)
@@ -252,7 +271,9 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
         QApplication.restoreOverrideCursor()
         self.setDatabases()
         header = self.tr("Upgrade Posgtis operation complete. \n")
-        self.outputMessage(header, successList, exceptionDict)
+        self.outputMessage(
+            header, successList, exceptionDict, report=self.operationReport()
+        )
 
     def batchUpgradePostgis(self, dbList):
         exceptionDict = dict()
@@ -268,39 +289,16 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
             )
             == QMessageBox.Cancel
         ):
+            self.operationRunner = None
             return successList, exceptionDict
         dbsDict = self.instantiateAbstractDbs(instantiateTemplates=True)
         self.closeAbstractDbs(dbsDict)
-        for dbName in dbsDict:
-            try:
-                if self.serverWidget.abstractDb.checkIfTemplate(dbName):
-                    self.serverWidget.abstractDb.setDbAsTemplate(
-                        dbName=dbName, setTemplate=False
-                    )
-                    dbsDict[dbName].upgradePostgis()
-                    self.serverWidget.abstractDb.setDbAsTemplate(
-                        dbName=dbName, setTemplate=True
-                    )
-                    successList.append(dbName)
-                else:
-                    dbsDict[dbName].upgradePostgis()
-                    successList.append(dbName)
-            except Exception as e:
-                exceptionDict[dbName] = ":".join(e.args)
-        return successList, exceptionDict
+        self.operationRunner = self.createOperationRunner()
+        return self.operationRunner.upgradePostgis(list(dbsDict.keys()))
 
     def batchDropDbs(self, dbList):
-        exceptionDict = dict()
-        successList = []
-        dbsDict = self.instantiateAbstractDbs()
-        self.closeAbstractDbs(dbsDict)
-        for dbName in dbList:
-            try:
-                self.serverWidget.abstractDb.dropDatabase(dbName)
-                successList.append(dbName)
-            except Exception as e:
-                exceptionDict[dbName] = ":".join(e.args)
-        return successList, exceptionDict
+        self.operationRunner = self.createOperationRunner()
+        return self.operationRunner.dropDatabases(dbList)
 
     @pyqtSlot(bool)
     def on_importStylesPushButton_clicked(self):
@@ -337,7 +335,9 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
             )
             QApplication.restoreOverrideCursor()
             header = self.tr("Import operation complete. \n")
-            self.outputMessage(header, successList, exceptionDict)
+            self.outputMessage(
+                header, successList, exceptionDict, report=self.operationReport()
+            )
             self.populateStylesInterface()
             closeExceptionDict = self.closeAbstractDbs(dbsDict)
             self.logInternalError(closeExceptionDict)
@@ -364,23 +364,8 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
         return styleList
 
     def batchImportStyles(self, dbsDict, styleDir, styleList, version):
-        exceptionDict = dict()
-        successList = []
-        for dbName in list(dbsDict.keys()):
-            for style in styleList:
-                try:
-                    dbsDict[dbName].importStylesIntoDb(style)
-                    successList.append(dbName)
-                except Exception as e:
-                    errors = []
-                    for arg in e.args:
-                        if isinstance(arg, str):
-                            s = "{}".format(arg.encode("utf-8"))
-                        else:
-                            s = str(arg)
-                        errors.append(s)
-                    exceptionDict[dbName] = ":".join(errors)
-        return successList, exceptionDict
+        self.operationRunner = self.createOperationRunner()
+        return self.operationRunner.importStyles(list(dbsDict.keys()), styleList)
 
     def getStyleDir(self, versionList):
         if (
@@ -500,20 +485,17 @@ class BatchDbManager(QtWidgets.QDialog, FORM_CLASS):
         )
         QApplication.restoreOverrideCursor()
         header = self.tr("Customize from SQL file operation complete. \n")
-        self.outputMessage(header, successList, exceptionDict)
+        self.outputMessage(
+            header, successList, exceptionDict, report=self.operationReport()
+        )
         closeExceptionDict = self.closeAbstractDbs(dbsDict)
         self.logInternalError(closeExceptionDict)
 
     def batchCustomizeFromSQLFile(self, dbsDict, sqlFilePath):
-        exceptionDict = dict()
-        successList = []
-        for dbName in list(dbsDict.keys()):
-            try:
-                dbsDict[dbName].runSqlFromFile(sqlFilePath)
-                successList.append(dbName)
-            except Exception as e:
-                exceptionDict[dbName] = ":".join(e.args)
-        return successList, exceptionDict
+        self.operationRunner = self.createOperationRunner()
+        return self.operationRunner.customizeFromSQLFile(
+            list(dbsDict.keys()), sqlFilePath
+        )
 
     def populateOtherInterfaces(self):
         dbsDict = self.instantiateAbstractDbs()
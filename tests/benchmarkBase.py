@@ -0,0 +1,644 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-20
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+"""
+Benchmark harness for DSGTools processing algorithms. Datasets are generated
+from a seed, so every run of a benchmark uses the same geometries, and their
+size is multiplied by a scale factor. Results (wall time, peak RSS and
+feature throughput) are written to JSON and may be compared to a baseline.
+Cursor path benchmarks replay mouse paths over a raster, sampling it as the
+raster info tools do on hover.
+"""
+
+import array
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+
+import processing
+from osgeo import gdal, osr
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProject,
+    QgsRasterLayer,
+    QgsVectorLayer,
+)
+
+from DsgTools.core.GeometricTools.rasterValueService import RasterValueService
+
+
+class SyntheticDatasetGenerator(object):
+    """
+    Builds reproducible memory layers. Every generator returns a dict
+    {layerName: QgsVectorLayer}.
+    """
+
+    def __init__(self, seed=0, scale=1.0, crs="EPSG:31982", origin=(500000, 7500000)):
+        self.seed = seed
+        self.scale = scale
+        self.crs = crs
+        self.originX, self.originY = origin
+
+    def random(self, name):
+        # one stream per dataset, so adding a dataset does not change others
+        return random.Random("{0}-{1}".format(self.seed, name))
+
+    def scaled(self, value):
+        return max(1, int(round(value * math.sqrt(self.scale))))
+
+    def createLayer(self, name, geometryType, fields=None):
+        fieldsUri = "".join(
+            "&field={0}:{1}".format(fieldName, fieldType)
+            for fieldName, fieldType in (fields or [])
+        )
+        return QgsVectorLayer(
+            "{0}?crs={1}{2}".format(geometryType, self.crs, fieldsUri), name, "memory"
+        )
+
+    def addFeatures(self, layer, geometryAttributeList):
+        featList = []
+        for geom, attributes in geometryAttributeList:
+            feat = QgsFeature(layer.fields())
+            feat.setGeometry(geom)
+            feat.setAttributes(attributes)
+            featList.append(feat)
+        layer.dataProvider().addFeatures(featList)
+        layer.updateExtents()
+        return layer
+
+    def point(self, x, y):
+        return QgsPointXY(self.originX + x, self.originY + y)
+
+    def drainageTree(self, nOutlets=4, depth=6, segmentLength=200.0):
+        """
+        Binary drainage trees drawn from the outlets upstream, with line
+        direction following the flow.
+        """
+        rng = self.random("drainageTree")
+        nOutlets = self.scaled(nOutlets)
+        itemList = []
+        for outlet in range(nOutlets):
+            stack = [(self.point(outlet * segmentLength * depth * 2, 0), 90.0, 0)]
+            while stack:
+                end, angle, level = stack.pop()
+                if level >= depth:
+                    continue
+                length = segmentLength * rng.uniform(0.6, 1.0)
+                start = QgsPointXY(
+                    end.x() + length * math.cos(math.radians(angle)),
+                    end.y() + length * math.sin(math.radians(angle)),
+                )
+                mid = QgsPointXY(
+                    (start.x() + end.x()) / 2 + rng.uniform(-5, 5),
+                    (start.y() + end.y()) / 2 + rng.uniform(-5, 5),
+                )
+                itemList.append(
+                    (QgsGeometry.fromPolylineXY([start, mid, end]), [level])
+                )
+                for delta in (-30, 30):
+                    stack.append(
+                        (start, angle + delta + rng.uniform(-10, 10), level + 1)
+                    )
+        layer = self.createLayer("drainages", "LineString", [("level", "integer")])
+        return {"drainages": self.addFeatures(layer, itemList)}
+
+    def roadGrid(self, nRows=20, nCols=20, spacing=250.0, jitter=10.0):
+        """
+        Grid of roads split at every crossing, with jittered vertexes.
+        """
+        rng = self.random("roadGrid")
+        nRows, nCols = self.scaled(nRows), self.scaled(nCols)
+        nodes = [
+            [
+                self.point(
+                    col * spacing + rng.uniform(-jitter, jitter),
+                    row * spacing + rng.uniform(-jitter, jitter),
+                )
+                for col in range(nCols + 1)
+            ]
+            for row in range(nRows + 1)
+        ]
+        itemList = []
+        for row in range(nRows + 1):
+            for col in range(nCols + 1):
+                if col < nCols:
+                    itemList.append(
+                        (
+                            QgsGeometry.fromPolylineXY(
+                                [nodes[row][col], nodes[row][col + 1]]
+                            ),
+                            [1],
+                        )
+                    )
+                if row < nRows:
+                    itemList.append(
+                        (
+                            QgsGeometry.fromPolylineXY(
+                                [nodes[row][col], nodes[row + 1][col]]
+                            ),
+                            [2],
+                        )
+                    )
+        layer = self.createLayer("roads", "LineString", [("type", "integer")])
+        return {"roads": self.addFeatures(layer, itemList)}
+
+    def polygonCoverage(
+        self, nRows=20, nCols=20, size=200.0, gapRatio=0.02, overlapRatio=0.02
+    ):
+        """
+        Coverage of square cells where a ratio of the cells is shrunk
+        (gaps) and another ratio is grown (overlaps).
+        """
+        rng = self.random("polygonCoverage")
+        nRows, nCols = self.scaled(nRows), self.scaled(nCols)
+        itemList = []
+        for row in range(nRows):
+            for col in range(nCols):
+                draw = rng.random()
+                delta = (
+                    -size * 0.05
+                    if draw < gapRatio
+                    else size * 0.05
+                    if draw < gapRatio + overlapRatio
+                    else 0
+                )
+                x0, y0 = col * size - delta, row * size - delta
+                x1, y1 = (col + 1) * size + delta, (row + 1) * size + delta
+                ring = [
+                    self.point(x0, y0),
+                    self.point(x1, y0),
+                    self.point(x1, y1),
+                    self.point(x0, y1),
+                    self.point(x0, y0),
+                ]
+                itemList.append(
+                    (QgsGeometry.fromPolygonXY([ring]), [rng.randint(1, 5)])
+                )
+        layer = self.createLayer("coverage", "Polygon", [("class", "integer")])
+        return {"coverage": self.addFeatures(layer, itemList)}
+
+    def contourSet(self, nHills=4, interval=10.0, nLevels=8, radius=1000.0):
+        """
+        Concentric contours around hills inside a frame, plus the frame.
+        """
+        rng = self.random("contourSet")
+        nHills = self.scaled(nHills)
+        itemList = []
+        frameSize = nHills * radius * 2.5
+        for hill in range(nHills):
+            centerX = (hill + 0.5) * radius * 2.5
+            centerY = frameSize / 2
+            for level in range(1, nLevels + 1):
+                levelRadius = radius * (nLevels + 1 - level) / (nLevels + 1)
+                ring = [
+                    self.point(
+                        centerX
+                        + levelRadius
+                        * (1 + rng.uniform(-0.02, 0.02))
+                        * math.cos(2 * math.pi * i / 64),
+                        centerY
+                        + levelRadius
+                        * (1 + rng.uniform(-0.02, 0.02))
+                        * math.sin(2 * math.pi * i / 64),
+                    )
+                    for i in range(64)
+                ]
+                ring.append(ring[0])
+                itemList.append((QgsGeometry.fromPolylineXY(ring), [level * interval]))
+        contours = self.createLayer("contours", "LineString", [("cota", "double")])
+        frame = self.createLayer("frame", "Polygon")
+        frameRing = [
+            self.point(0, 0),
+            self.point(frameSize, 0),
+            self.point(frameSize, frameSize),
+            self.point(0, frameSize),
+            self.point(0, 0),
+        ]
+        return {
+            "contours": self.addFeatures(contours, itemList),
+            "frame": self.addFeatures(
+                frame, [(QgsGeometry.fromPolygonXY([frameRing]), [])]
+            ),
+        }
+
+    def demRaster(self, size=1024, pixelSize=5.0, nHills=6):
+        """
+        Float32 GeoTIFF of gaussian hills, written to the temp dir.
+        """
+        rng = self.random("demRaster")
+        size = self.scaled(size)
+        hillList = [
+            (
+                rng.uniform(0, size),
+                rng.uniform(0, size),
+                rng.uniform(size / 20, size / 5),
+                rng.uniform(50, 500),
+            )
+            for _ in range(self.scaled(nHills))
+        ]
+        path = os.path.join(
+            tempfile.mkdtemp(), "dem_{0}_{1}.tif".format(self.seed, size)
+        )
+        dataset = gdal.GetDriverByName("GTiff").Create(
+            path, size, size, 1, gdal.GDT_Float32, ["TILED=YES"]
+        )
+        dataset.SetGeoTransform(
+            (self.originX, pixelSize, 0, self.originY + size * pixelSize, 0, -pixelSize)
+        )
+        srs = osr.SpatialReference()
+        srs.SetFromUserInput(self.crs)
+        dataset.SetProjection(srs.ExportToWkt())
+        band = dataset.GetRasterBand(1)
+        for row in range(size):
+            values = array.array(
+                "f",
+                (
+                    sum(
+                        height
+                        * math.exp(
+                            -((col - x) ** 2 + (row - y) ** 2) / (2 * sigma**2)
+                        )
+                        for x, y, sigma, height in hillList
+                    )
+                    for col in range(size)
+                ),
+            )
+            band.WriteRaster(0, row, size, 1, values.tobytes())
+        dataset = None
+        return {"dem": QgsRasterLayer(path, "dem", "gdal")}
+
+    def cursorPath(self, extent, pixelSize, nPoints=5000, step=3.0):
+        """
+        Random walk with momentum inside extent, like a mouse following
+        features on the canvas.
+        :param step: (float) mean distance between events, in pixels.
+        :return: (list) list of QgsPointXY.
+        """
+        rng = self.random("cursorPath")
+        x, y = extent.center().x(), extent.center().y()
+        heading = rng.uniform(0, 2 * math.pi)
+        pointList = []
+        for _ in range(max(1, int(round(nPoints * self.scale)))):
+            heading += rng.gauss(0, 0.3)
+            distance = rng.expovariate(1 / step) * pixelSize
+            newX = x + distance * math.cos(heading)
+            newY = y + distance * math.sin(heading)
+            if not (
+                extent.xMinimum() < newX < extent.xMaximum()
+                and extent.yMinimum() < newY < extent.yMaximum()
+            ):
+                heading += math.pi
+                continue
+            x, y = newX, newY
+            pointList.append(QgsPointXY(x, y))
+        return pointList
+
+    def generate(self, datasetName, **kwargs):
+        return getattr(self, datasetName)(**kwargs)
+
+
+class PeakRssMonitor(object):
+    """
+    Measures how much the resident set size of the process grows over the
+    value sampled when the block starts, so runs inside a long lived QGIS
+    process are not charged with the memory used by earlier runs:
+
+        with PeakRssMonitor() as monitor:
+            processing.run(...)
+        monitor.peakRssMb()
+
+    On Linux the kernel high water mark is reset when the block starts
+    (/proc/self/clear_refs) and read when it ends. Elsewhere the current
+    RSS (psutil) is sampled on a thread. The peak is None when neither is
+    available.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self.stopEvent = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def currentRss():
+        """
+        Returns the current resident set size of the process, in bytes, or
+        None if it cannot be read.
+        """
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+        if psutil is not None:
+            return psutil.Process().memory_info().rss
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def resetHighWaterMark():
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def highWaterMark():
+        """
+        Returns the peak resident set size (VmHWM) of the process, in bytes,
+        or None outside Linux.
+        """
+        try:
+            with open("/proc/self/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def sample(self):
+        while not self.stopEvent.wait(self.interval):
+            rss = self.currentRss()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+
+    def __enter__(self):
+        self.baseline = self.currentRss()
+        self.peak = self.baseline
+        self.useHighWaterMark = self.baseline is not None and self.resetHighWaterMark()
+        if self.baseline is not None and not self.useHighWaterMark:
+            self.stopEvent.clear()
+            self.thread = threading.Thread(target=self.sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        if self.thread is not None:
+            self.stopEvent.set()
+            self.thread.join()
+            self.thread = None
+        if self.baseline is None:
+            return False
+        rss = self.highWaterMark() if self.useHighWaterMark else None
+        self.peak = max(self.peak, self.currentRss() if rss is None else rss)
+        return False
+
+    def peakRssMb(self):
+        """
+        Returns the growth of the resident set size over the baseline, in
+        megabytes, or None if it could not be measured.
+        """
+        if self.baseline is None:
+            return None
+        return (self.peak - self.baseline) / 1024**2
+
+
+class BenchmarkRunner(object):
+    """
+    Runs processing algorithms headless over synthetic datasets and records
+    wall time, peak RSS growth (see PeakRssMonitor) and feature throughput.
+    """
+
+    def __init__(self, seed=0, scale=1.0):
+        self.seed = seed
+        self.scale = scale
+        self.generator = SyntheticDatasetGenerator(seed=seed, scale=scale)
+        self.results = []
+
+    @staticmethod
+    def maxPeak(peakList):
+        peakList = [peak for peak in peakList if peak is not None]
+        return max(peakList) if peakList else None
+
+    def loadDatasets(self, datasetDefs):
+        """
+        :param datasetDefs: (dict) {datasetName: generator kwargs}
+        :return: (dict) {layerName: QgsVectorLayer}
+        """
+        layerDict = dict()
+        for datasetName, kwargs in datasetDefs.items():
+            layerDict.update(self.generator.generate(datasetName, **(kwargs or {})))
+        QgsProject.instance().addMapLayers(list(layerDict.values()))
+        return layerDict
+
+    def resolveParameters(self, params, layerDict):
+        """
+        Replaces the values written as '@layerName' by the ids of the
+        generated layers.
+        """
+        if isinstance(params, dict):
+            return {k: self.resolveParameters(v, layerDict) for k, v in params.items()}
+        if isinstance(params, list):
+            return [self.resolveParameters(v, layerDict) for v in params]
+        if isinstance(params, str) and params.startswith("@"):
+            return layerDict[params[1:]].id()
+        return params
+
+    def run(self, benchmarkDef, repeat=1):
+        """
+        Runs a benchmark definition, in the format:
+            {
+                'name': benchmark name,
+                'algorithm': algorithm id,
+                'datasets': {generator name: generator kwargs},
+                'params': algorithm parameters ('@layerName' for datasets),
+            }
+        The best of repeat runs is recorded.
+        """
+        QgsProject.instance().clear()
+        layerDict = self.loadDatasets(benchmarkDef.get("datasets", {}))
+        nFeatures = sum(lyr.featureCount() for lyr in layerDict.values())
+        parameters = self.resolveParameters(benchmarkDef.get("params", {}), layerDict)
+        wallTimeList, peakList = [], []
+        for _ in range(repeat):
+            context = QgsProcessingContext()
+            context.setProject(QgsProject.instance())
+            with PeakRssMonitor() as monitor:
+                start = time.perf_counter()
+                processing.run(
+                    benchmarkDef["algorithm"],
+                    parameters,
+                    context=context,
+                    feedback=QgsProcessingFeedback(),
+                )
+                wallTimeList.append(time.perf_counter() - start)
+            peakList.append(monitor.peakRssMb())
+        wallTime = min(wallTimeList)
+        result = {
+            "name": benchmarkDef["name"],
+            "algorithm": benchmarkDef["algorithm"],
+            "seed": self.seed,
+            "scale": self.scale,
+            "input_features": nFeatures,
+            "wall_time": wallTime,
+            "peak_rss_mb": self.maxPeak(peakList),
+            "features_per_second": nFeatures / wallTime if wallTime else None,
+        }
+        self.results.append(result)
+        QgsProject.instance().clear()
+        return result
+
+    def loadCursorPath(self, benchmarkDef):
+        """
+        Returns the raster layer and the cursor path of a cursor path
+        benchmark. Recorded paths name a raster file and list the points, in
+        the raster crs; otherwise both are generated.
+        """
+        if "rasterPath" in benchmarkDef:
+            rasterLayer = QgsRasterLayer(benchmarkDef["rasterPath"], "raster", "gdal")
+        else:
+            rasterLayer = self.generator.demRaster(**benchmarkDef.get("raster", {}))[
+                "dem"
+            ]
+        if not rasterLayer.isValid():
+            raise Exception("Invalid raster for {0}".format(benchmarkDef["name"]))
+        if "points" in benchmarkDef:
+            pointList = [QgsPointXY(p[0], p[1]) for p in benchmarkDef["points"]]
+        else:
+            pointList = self.generator.cursorPath(
+                rasterLayer.extent(),
+                rasterLayer.rasterUnitsPerPixelX(),
+                **benchmarkDef.get("path", {})
+            )
+        return rasterLayer, pointList
+
+    def runCursorPath(self, benchmarkDef, repeat=1):
+        """
+        Replays a cursor path over a raster, sampling every band at each
+        point with provider identify and with a RasterValueService, and
+        records both wall times. The definition format is:
+            {
+                'name': benchmark name,
+                'raster': demRaster kwargs, or 'rasterPath': raster file,
+                'path': cursorPath kwargs, or 'points': [[x, y], ...],
+                'service': RasterValueService kwargs,
+            }
+        The service starts with an empty cache on every run. Values that
+        differ from identify are counted as mismatches.
+        """
+        rasterLayer, pointList = self.loadCursorPath(benchmarkDef)
+        provider = rasterLayer.dataProvider()
+        identifyService = RasterValueService()
+        identifyTimeList, serviceTimeList, peakList = [], [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            expectedList = [
+                identifyService.identify(rasterLayer, point) for point in pointList
+            ]
+            identifyTimeList.append(time.perf_counter() - start)
+            service = RasterValueService(**benchmarkDef.get("service", {}))
+            with PeakRssMonitor() as monitor:
+                start = time.perf_counter()
+                valueList = [service.values(rasterLayer, point) for point in pointList]
+                serviceTimeList.append(time.perf_counter() - start)
+            peakList.append(monitor.peakRssMb())
+            hits, misses = service.hits, service.misses
+            service.shutdown()
+        nMismatches = sum(
+            1
+            for expected, value in zip(expectedList, valueList)
+            if not self.sameValues(expected, value)
+        )
+        identifyTime, wallTime = min(identifyTimeList), min(serviceTimeList)
+        result = {
+            "name": benchmarkDef["name"],
+            "algorithm": "cursor path",
+            "seed": self.seed,
+            "scale": self.scale,
+            "input_features": len(pointList),
+            "wall_time": wallTime,
+            "identify_time": identifyTime,
+            "speedup": identifyTime / wallTime if wallTime else None,
+            "cache_hit_ratio": hits / (hits + misses) if hits + misses else None,
+            "mismatches": nMismatches,
+            "bands": provider.bandCount(),
+            "peak_rss_mb": self.maxPeak(peakList),
+            "features_per_second": len(pointList) / wallTime if wallTime else None,
+        }
+        self.results.append(result)
+        return result
+
+    @staticmethod
+    def sameValues(expected, value):
+        if expected is None or value is None:
+            return expected is None and value is None
+        return len(expected) == len(value) and all(
+            (a is None and b is None)
+            or (
+                a is not None
+                and b is not None
+                and (a == b or (math.isnan(a) and math.isnan(b)))
+            )
+            for a, b in zip(expected, value)
+        )
+
+    def writeResults(self, path):
+        with open(path, "w") as f:
+            json.dump(
+                {"seed": self.seed, "scale": self.scale, "results": self.results},
+                f,
+                indent=4,
+            )
+
+    @staticmethod
+    def compareWithBaseline(results, baselinePath, tolerance=0.2):
+        """
+        Returns a list of messages about the benchmarks whose wall time grew
+        more than tolerance (ratio) over the baseline. Benchmarks missing
+        from the baseline, or run with a different scale, are not compared.
+        """
+        with open(baselinePath, "r") as f:
+            baselineDict = {
+                (i["name"], i["scale"]): i for i in json.load(f).get("results", [])
+            }
+        regressionList = []
+        for result in results:
+            baseline = baselineDict.get((result["name"], result["scale"]))
+            if baseline is None or not baseline["wall_time"]:
+                continue
+            ratio = result["wall_time"] / baseline["wall_time"]
+            if ratio > 1 + tolerance:
+                regressionList.append(
+                    "{name}: {current:.3f} s against {baseline:.3f} s ({ratio:.0%})".format(
+                        name=result["name"],
+                        current=result["wall_time"],
+                        baseline=baseline["wall_time"],
+                        ratio=ratio,
+                    )
+                )
+        return regressionList
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-20
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+"""
+Benchmarks of DSGTools algorithms over synthetic datasets, defined in
+tests_yaml/benchmarks.yaml. They are skipped unless DSGTOOLS_BENCHMARK is
+set, and are configured by the environment variables:
+    DSGTOOLS_BENCHMARK_SCALE: dataset size multiplier (default 1);
+    DSGTOOLS_BENCHMARK_SEED: dataset seed (default 0);
+    DSGTOOLS_BENCHMARK_REPEAT: runs of each benchmark, the best is kept
+        (default 1);
+    DSGTOOLS_BENCHMARK_OUTPUT: path of the JSON report (default
+        benchmark_results.json in the temp dir);
+    DSGTOOLS_BENCHMARK_BASELINE: JSON report to compare with. Wall times
+        more than DSGTOOLS_BENCHMARK_TOLERANCE (default 0.2) slower fail;
+    DSGTOOLS_BENCHMARK_CURSOR_PATHS: recorded cursor path JSON files,
+        separated by os.pathsep, each one a cursor path definition with
+        rasterPath and points (see BenchmarkRunner.runCursorPath).
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import yaml
+from qgis.core import QgsProject
+from qgis.testing import unittest
+
+from DsgTools.tests.benchmarkBase import BenchmarkRunner
+
+
+@unittest.skipUnless(
+    os.environ.get("DSGTOOLS_BENCHMARK"), "set DSGTOOLS_BENCHMARK to run benchmarks"
+)
+class Tester(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.runner = BenchmarkRunner(
+            seed=int(os.environ.get("DSGTOOLS_BENCHMARK_SEED", 0)),
+            scale=float(os.environ.get("DSGTOOLS_BENCHMARK_SCALE", 1)),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        QgsProject.instance().clear()
+
+    def get_definition_file(self):
+        return "benchmarks.yaml"
+
+    def loadBenchmarks(self, key="benchmarks"):
+        with open(
+            os.path.join(
+                os.path.dirname(__file__), "tests_yaml", self.get_definition_file()
+            ),
+            "r",
+        ) as stream:
+            return yaml.load(stream, Loader=yaml.SafeLoader).get(key) or []
+
+    def loadRecordedCursorPaths(self):
+        pathList = os.environ.get("DSGTOOLS_BENCHMARK_CURSOR_PATHS")
+        if not pathList:
+            return []
+        benchmarkList = []
+        for path in pathList.split(os.pathsep):
+            with open(path, "r") as f:
+                benchmarkList.append(json.load(f))
+        return benchmarkList
+
+    def test_benchmarks(self):
+        repeat = int(os.environ.get("DSGTOOLS_BENCHMARK_REPEAT", 1))
+        resultList = []
+        for benchmarkDef in self.loadBenchmarks():
+            result = self.runner.run(benchmarkDef, repeat=repeat)
+            resultList.append(result)
+            print(
+                "{name}: {wall_time:.3f} s, {peakRss} MB peak RSS growth, "
+                "{input_features} features".format(
+                    peakRss="{0:.1f}".format(result["peak_rss_mb"])
+                    if result["peak_rss_mb"] is not None
+                    else "unknown",
+                    **result
+                )
+            )
+        self.writeAndCompare(resultList)
+
+    def test_cursor_paths(self):
+        repeat = int(os.environ.get("DSGTOOLS_BENCHMARK_REPEAT", 1))
+        resultList = []
+        for benchmarkDef in (
+            self.loadBenchmarks("cursor_paths") + self.loadRecordedCursorPaths()
+        ):
+            result = self.runner.runCursorPath(benchmarkDef, repeat=repeat)
+            resultList.append(result)
+            print(
+                "{name}: {wall_time:.3f} s against {identify_time:.3f} s with "
+                "identify, {input_features} lookups, {mismatches} "
+                "mismatches".format(**result)
+            )
+            self.assertEqual(result["mismatches"], 0, result["name"])
+        self.writeAndCompare(resultList)
+
+    def writeAndCompare(self, resultList):
+        outputPath = os.environ.get(
+            "DSGTOOLS_BENCHMARK_OUTPUT",
+            os.path.join(tempfile.gettempdir(), "benchmark_results.json"),
+        )
+        self.runner.writeResults(outputPath)
+        print("Benchmark report written to {0}".format(outputPath))
+        baselinePath = os.environ.get("DSGTOOLS_BENCHMARK_BASELINE")
+        if not baselinePath:
+            return
+        regressionList = BenchmarkRunner.compareWithBaseline(
+            resultList,
+            baselinePath,
+            tolerance=float(os.environ.get("DSGTOOLS_BENCHMARK_TOLERANCE", 0.2)),
+        )
+        self.assertEqual(regressionList, [], "\n".join(regressionList))
+
+
+def run_all(filterString=None):
+    """Default function that is called by the runner if nothing else is specified"""
+    filterString = "test_" if filterString is None else filterString
+    suite = unittest.TestSuite()
+    suite.addTests(unittest.makeSuite(Tester, filterString))
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite)
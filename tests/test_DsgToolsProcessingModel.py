@@ -21,12 +21,29 @@
  ***************************************************************************/
 """
 
+import os
+import shutil
 import sys
+import tempfile
+from unittest import mock
+
+from qgis.core import (
+    QgsGeometry,
+    QgsProcessingModelAlgorithm,
+    QgsProcessingModelChildAlgorithm,
+    QgsProcessingModelChildParameterSource,
+    QgsProcessingModelOutput,
+    QgsProject,
+)
 from qgis.testing import unittest
 
 from DsgTools.core.DSGToolsProcessingAlgs.Models.dsgToolsProcessingModel import (
     DsgToolsProcessingModel,
 )
+from DsgTools.core.DSGToolsProcessingAlgs.Models.frameTiledModelRunner import (
+    FrameTiledModelRunner,
+)
+from DsgTools.tests.benchmarkBase import SyntheticDatasetGenerator
 
 
 class ModelTester(unittest.TestCase):
@@ -40,6 +57,136 @@ class ModelTester(unittest.TestCase):
         self.assertFalse(model.isValid())
         self.assertEquals(model.name(), "Invalid model")
 
+    def createModelFile(self, algorithmId, parameters, outputName="FLAGS"):
+        """
+        Writes a model with a single child algorithm, whose output outputName
+        is a model output, and returns its path.
+        """
+        model = QgsProcessingModelAlgorithm("tiling_test", "DSGTools tests")
+        child = QgsProcessingModelChildAlgorithm(algorithmId)
+        child.setChildId("check")
+        for name, value in parameters.items():
+            child.addParameterSources(
+                name, [QgsProcessingModelChildParameterSource.fromStaticValue(value)]
+            )
+        output = QgsProcessingModelOutput("flags")
+        output.setChildId("check")
+        output.setChildOutputName(outputName)
+        child.setModelOutputs({"flags": output})
+        model.addChildAlgorithm(child)
+        tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempDir)
+        path = os.path.join(tempDir, "tiling_test.model3")
+        model.toFile(path)
+        return path
+
+    def createFrames(self, layer, nRows=2, nCols=2):
+        generator = SyntheticDatasetGenerator()
+        extent = layer.extent()
+        extent.grow(1)
+        width, height = extent.width() / nCols, extent.height() / nRows
+        frameLayer = generator.createLayer("frames", "Polygon")
+        return generator.addFeatures(
+            frameLayer,
+            [
+                (
+                    QgsGeometry.fromWkt(
+                        "POLYGON(({0} {1}, {2} {1}, {2} {3}, {0} {3}, {0} {1}))".format(
+                            extent.xMinimum() + col * width,
+                            extent.yMinimum() + row * height,
+                            extent.xMinimum() + (col + 1) * width,
+                            extent.yMinimum() + (row + 1) * height,
+                        )
+                    ),
+                    [],
+                )
+                for row in range(nRows)
+                for col in range(nCols)
+            ],
+        )
+
+    def featureKeys(self, layer):
+        return sorted(
+            (
+                feat.geometry().asWkt(3),
+                tuple(str(value) for value in feat.attributes()),
+            )
+            for feat in layer.getFeatures()
+        )
+
+    def test_tiled_run_matches_untiled_run(self):
+        """Runs a flag raising model tiled and untiled and compares the flags."""
+        QgsProject.instance().clear()
+        roads = SyntheticDatasetGenerator().roadGrid(nRows=10, nCols=10)["roads"]
+        frames = self.createFrames(roads)
+        QgsProject.instance().addMapLayers([roads, frames])
+        parameters = {
+            "source": {
+                "type": "file",
+                "data": self.createModelFile(
+                    "dsgtools:identifydangles",
+                    {"INPUT": "roads", "SELECTED": False, "TOLERANCE": 2},
+                ),
+            },
+            "flags": {
+                "onFlagsRaised": "warn",
+                "enableLocalFlags": False,
+                "loadOutput": False,
+            },
+        }
+        untiledOut = DsgToolsProcessingModel(dict(parameters), "untiled").runModel()
+        tiledOut = DsgToolsProcessingModel(
+            dict(parameters, tiling={"frameLayer": "frames", "margin": 10}),
+            "tiled",
+        ).runModel()
+        self.assertEqual(set(untiledOut), set(tiledOut))
+        for name, untiledLayer in untiledOut.items():
+            self.assertGreater(untiledLayer.featureCount(), 0)
+            self.assertEqual(
+                self.featureKeys(untiledLayer), self.featureKeys(tiledOut[name])
+            )
+        QgsProject.instance().clear()
+
+    def test_tiling_runs_in_place_models_untiled(self):
+        """Models that edit their inputs in place run once, untiled."""
+        model = DsgToolsProcessingModel(
+            {
+                "source": {
+                    "type": "file",
+                    "data": self.createModelFile(
+                        "dsgtools:snaplayeronlayer", {}, outputName="OUTPUT"
+                    ),
+                }
+            },
+            "in place",
+        )
+        runner = FrameTiledModelRunner(model, "frames")
+        with mock.patch.object(
+            runner, "runUntiled", return_value={"flags": None}
+        ) as runUntiled, mock.patch.object(runner, "frames") as frames:
+            self.assertEqual(runner.run(), {"flags": None})
+        runUntiled.assert_called_once()
+        frames.assert_not_called()
+
+    def test_tiling_settings_are_validated(self):
+        """Unknown tiling settings invalidate the model instead of failing to run."""
+        parameters = {
+            "source": {
+                "type": "file",
+                "data": self.createModelFile("dsgtools:identifydangles", {}),
+            }
+        }
+        model = DsgToolsProcessingModel(
+            dict(parameters, tiling={"frameLayer": "frames", "margin": 10}),
+            "valid tiling",
+        )
+        self.assertTrue(model.isValid())
+        for tiling in ({"frameLayer": "frames", "buffer": 10}, {"margin": 10}):
+            model = DsgToolsProcessingModel(
+                dict(parameters, tiling=tiling), "invalid tiling"
+            )
+            self.assertFalse(model.isValid())
+
 
 def run_all(filterString=None):
     """Default function that is called by the runner if nothing else is specified"""
@@ -27,6 +27,7 @@ It is supposed to be run through QGIS with DSGTools installed.
 * This is merely a prototype for our unit test suite. *
 """
 
+import json
 import os
 import sys
 import warnings
@@ -38,6 +39,8 @@ import processing
 from qgis.utils import iface
 from qgis.core import (
     QgsDataSourceUri,
+    QgsFeature,
+    QgsGeometry,
     QgsVectorLayer,
     QgsProcessingFeedback,
     QgsProcessingContext,
@@ -53,6 +56,9 @@ from DsgTools.core.Factories.LayerLoaderFactory.layerLoaderFactory import (
 )
 from qgis.testing import unittest
 
+from DsgTools.core.DSGToolsProcessingAlgs.Algs.OtherAlgs.runIncrementalValidationAlgorithm import (
+    RunIncrementalValidationAlgorithm,
+)
 from DsgTools.tests.algorithmsTestBase import AlgorithmsTest, GenericAlgorithmsTest
 
 
@@ -70,6 +76,121 @@ class Tester(GenericAlgorithmsTest, AlgorithmsTest):
     def get_definition_file(self):
         return "otherAlgorithms.yaml"
 
+    def createLineLayer(self, name, wktList):
+        layer = QgsVectorLayer("LineString?crs=EPSG:31982", name, "memory")
+        featureList = []
+        for wkt in wktList:
+            feat = QgsFeature(layer.fields())
+            feat.setGeometry(QgsGeometry.fromWkt(wkt))
+            featureList.append(feat)
+        layer.dataProvider().addFeatures(featureList)
+        QgsProject.instance().addMapLayer(layer)
+        return layer
+
+    def runIncrementalValidation(
+        self, layer, previousFlags=None, algName="native:extractvertices"
+    ):
+        parameters = {
+            "INPUTLAYERS": [layer],
+            "ALG_NAME": algName,
+            "PARAMETER_DICT": json.dumps({"INPUT": layer.id()}),
+            "OUTPUT_LAYER_PARAMETER_NAME": "OUTPUT",
+            "SEARCH_RADIUS": 0,
+            "OUTPUT": "memory:",
+        }
+        if previousFlags is not None:
+            parameters["PREVIOUS_FLAGS"] = previousFlags
+        return processing.run(
+            "dsgtools:runincrementalvalidationalgorithm",
+            parameters,
+            context=QgsProcessingContext(),
+            feedback=QgsProcessingFeedback(),
+        )["OUTPUT"]
+
+    def flagCoordinates(self, flagLyr):
+        return sorted(
+            (round(feat.geometry().asPoint().x()), round(feat.geometry().asPoint().y()))
+            for feat in flagLyr.getFeatures()
+        )
+
+    def test_incremental_validation_replaces_flags_inside_region(self):
+        layer = self.createLineLayer(
+            "lines", ["LineString(0 0, 10 0)", "LineString(100 100, 110 100)"]
+        )
+        # the first run has no edit history, so the whole layer is validated
+        firstFlags = self.runIncrementalValidation(layer)
+        self.assertEqual(
+            self.flagCoordinates(firstFlags), [(0, 0), (10, 0), (100, 100), (110, 100)]
+        )
+        editedFid = next(
+            feat.id()
+            for feat in layer.getFeatures()
+            if feat.geometry().boundingBox().xMinimum() == 0
+        )
+        layer.startEditing()
+        layer.changeGeometry(editedFid, QgsGeometry.fromWkt("LineString(0 5, 10 5)"))
+        self.assertTrue(layer.commitChanges())
+        # flags of the edited line are replaced, the other flags are kept
+        secondFlags = self.runIncrementalValidation(layer, previousFlags=firstFlags)
+        self.assertEqual(
+            self.flagCoordinates(secondFlags),
+            [(0, 5), (10, 5), (100, 100), (110, 100)],
+        )
+
+    def test_incremental_validation_keeps_history_per_check(self):
+        layer = self.createLineLayer(
+            "lines", ["LineString(0 0, 10 0)", "LineString(100 100, 110 100)"]
+        )
+        firstVertices = self.runIncrementalValidation(layer)
+        firstCentroids = self.runIncrementalValidation(
+            layer, algName="native:centroids"
+        )
+        editedFid = next(
+            feat.id()
+            for feat in layer.getFeatures()
+            if feat.geometry().boundingBox().xMinimum() == 0
+        )
+        layer.startEditing()
+        layer.changeGeometry(editedFid, QgsGeometry.fromWkt("LineString(0 5, 10 5)"))
+        self.assertTrue(layer.commitChanges())
+        # validating the edit with one algorithm must not hide it from the
+        # other one
+        secondVertices = self.runIncrementalValidation(
+            layer, previousFlags=firstVertices
+        )
+        secondCentroids = self.runIncrementalValidation(
+            layer, previousFlags=firstCentroids, algName="native:centroids"
+        )
+        self.assertEqual(
+            self.flagCoordinates(secondVertices),
+            [(0, 5), (10, 5), (100, 100), (110, 100)],
+        )
+        self.assertEqual(self.flagCoordinates(secondCentroids), [(5, 5), (105, 100)])
+        # both checks validated the edit, so a third run keeps the flags
+        thirdCentroids = self.runIncrementalValidation(
+            layer, previousFlags=secondCentroids, algName="native:centroids"
+        )
+        self.assertEqual(self.flagCoordinates(thirdCentroids), [(5, 5), (105, 100)])
+
+    def test_incremental_validation_replaces_only_layer_parameters(self):
+        layer = self.createLineLayer("lines", ["LineString(0 0, 10 0)"])
+        alg = RunIncrementalValidationAlgorithm()
+        context = QgsProcessingContext()
+        parameterDict = alg.restrictParametersToRegion(
+            "native:extractbyattribute",
+            {"INPUT": layer.name(), "FIELD": layer.name(), "VALUE": layer.id()},
+            [layer],
+            QgsGeometry.fromWkt("Polygon((-1 -1, 11 -1, 11 1, -1 1, -1 -1))"),
+            0,
+            context,
+        )
+        self.assertNotIn(parameterDict["INPUT"], (layer.name(), layer.id()))
+        self.assertIsNotNone(
+            context.temporaryLayerStore().mapLayer(parameterDict["INPUT"])
+        )
+        self.assertEqual(parameterDict["FIELD"], layer.name())
+        self.assertEqual(parameterDict["VALUE"], layer.id())
+
 
 def run_all(filterString=None):
     """Default function that is called by the runner if nothing else is specified"""
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2023-06-15
+        git sha              : $Format:%H$
+        copyright            : (C) 2023 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import sys
+
+import numpy
+from qgis.core import QgsGeometry
+from qgis.testing import unittest
+
+from DsgTools.core.GeometricTools.segmentIndex import SegmentIndex
+
+
+class SegmentIndexTester(unittest.TestCase):
+    def buildIndex(self, tolerance, wktDict):
+        segmentIndex = SegmentIndex(tolerance)
+        for ownerKey, wkt in wktDict.items():
+            segmentIndex.addGeometry(QgsGeometry.fromWkt(wkt), ownerKey)
+        segmentIndex.build()
+        return segmentIndex
+
+    def nearPairs(self, segmentIndex, ignoreSameOwner=False):
+        pairList = []
+        for vertexIdx, segIdx, _ in segmentIndex.iterateNearPairs(
+            ignoreSameOwner=ignoreSameOwner
+        ):
+            pairList += zip(vertexIdx.tolist(), segIdx.tolist())
+        return pairList
+
+    def intersections(self, segmentIndex):
+        xList, yList = [], []
+        for xArray, yArray, _ in segmentIndex.iterateIntersections():
+            xList += xArray.tolist()
+            yList += yArray.tolist()
+        return numpy.array(xList), numpy.array(yList)
+
+    def test_vertex_near_segment(self):
+        segmentIndex = self.buildIndex(
+            0.1, {"a": "LineString(0 0, 10 0)", "b": "LineString(5 0.05, 5 5)"}
+        )
+        pairList = self.nearPairs(segmentIndex)
+        # the vertex is not paired with the segment it is an endpoint of
+        self.assertEqual(len(pairList), 1)
+        vertexIdx, segIdx = pairList[0]
+        self.assertEqual(segmentIndex.vertexOwnerKey(vertexIdx), "b")
+        self.assertTrue(
+            segmentIndex.vertexGeometry(vertexIdx).equals(
+                QgsGeometry.fromWkt("Point(5 0.05)")
+            )
+        )
+        self.assertTrue(
+            segmentIndex.segmentGeometry(segIdx).equals(
+                QgsGeometry.fromWkt("LineString(0 0, 10 0)")
+            )
+        )
+
+    def test_vertex_near_segment_of_same_owner(self):
+        segmentIndex = self.buildIndex(
+            0.1, {"a": "LineString(0 0, 10 0, 10 1, 5 0.05)"}
+        )
+        self.assertEqual(len(self.nearPairs(segmentIndex)), 1)
+        self.assertEqual(self.nearPairs(segmentIndex, ignoreSameOwner=True), [])
+
+    def test_near_segment_pairs(self):
+        segmentIndex = self.buildIndex(
+            0.1, {"a": "LineString(0 0, 10 0)", "b": "LineString(5 0.05, 5 5)"}
+        )
+        pointIdx, segIdx = segmentIndex.nearSegmentPairs(
+            numpy.array([5.0, 5.0, 20.0]), numpy.array([0.05, 1.0, 20.0])
+        )
+        self.assertEqual(
+            sorted(zip(pointIdx.tolist(), segIdx.tolist())), [(0, 0), (0, 1), (1, 1)]
+        )
+
+    def test_intersections(self):
+        segmentIndex = self.buildIndex(
+            1e-8,
+            {
+                1: "LineString(0 0, 100 100)",
+                2: "LineString(0 100, 100 0)",
+                # short segments make the grid cells much smaller than the
+                # crossing segments, which are then registered in many cells
+                3: "LineString({0})".format(
+                    ", ".join("{0} 0".format(200 + i) for i in range(21))
+                ),
+                # collinear overlaps are not crossings
+                4: "LineString(0 200, 10 200)",
+                5: "LineString(5 200, 15 200)",
+            },
+        )
+        xArray, yArray = self.intersections(segmentIndex)
+        self.assertEqual(int(((xArray == 50) & (yArray == 50)).sum()), 1)
+        unshared = ~segmentIndex.hasVertexWithin(xArray, yArray)
+        self.assertEqual(
+            list(zip(xArray[unshared].tolist(), yArray[unshared].tolist())),
+            [(50.0, 50.0)],
+        )
+
+    def test_vertex_within_tolerance(self):
+        segmentIndex = self.buildIndex(1e-8, {1: "LineString(200 0, 201 0)"})
+        self.assertEqual(
+            segmentIndex.hasVertexWithin(
+                numpy.array([200.5, 200.0, 201.0]), numpy.array([0.0, 1e-9, 1e-7])
+            ).tolist(),
+            [False, True, False],
+        )
+
+
+def run_all(filterString=None):
+    """Default function that is called by the runner if nothing else is specified"""
+    filterString = "test_" if filterString is None else filterString
+    suite = unittest.TestSuite()
+    suite.addTests(unittest.makeSuite(SegmentIndexTester, filterString))
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite)
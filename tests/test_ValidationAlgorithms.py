@@ -38,6 +38,9 @@ from qgis.core import (
     QgsProject,
     QgsVectorLayer,
     QgsDataSourceUri,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsGeometry,
     QgsLayerTreeLayer,
     QgsProcessingContext,
     QgsProcessingFeedback,
@@ -46,6 +49,9 @@ from qgis.core import (
 from qgis.PyQt.QtSql import QSqlDatabase
 
 from DsgTools.core.dsgEnums import DsgEnums
+from DsgTools.core.DSGToolsProcessingAlgs.Algs.ValidationAlgs.verifyCountourStackingAlgorithm import (
+    VerifyCountourStackingAlgorihtm,
+)
 from DsgTools.core.Factories.DbFactory.dbFactory import DbFactory
 from DsgTools.core.Factories.LayerLoaderFactory.layerLoaderFactory import (
     LayerLoaderFactory,
@@ -1853,6 +1859,69 @@ class Tester(unittest.TestCase):
     def test_snaplayeronlayer(self):
         self.assertEqual(self.testAlg("dsgtools:snaplayeronlayer"), "")
 
+    def runHierarchicalSnap(self, parallel):
+        """
+        Runs the hierarchical snap on memory copies of the snap layer on layer
+        test layers, as the algorithm updates its layers in place.
+        :param parallel: (bool) whether the layers of each hierarchy level are
+                         snapped concurrently.
+        :return: (dict) a map from layer name to the snapped layer.
+        """
+        proj = QgsProject.instance()
+        layers = self.testingDataset("gpkg", "testes_sirgas2000_23s")
+        layerNames = [
+            "camada_poligono_2",
+            "camada_poligono_1",
+            "camada_linha_1",
+            "camada_linha_2",
+        ]
+        snappedLayers = dict()
+        for layerName in layerNames:
+            lyr = layers[layerName].materialize(QgsFeatureRequest())
+            lyr.setName("hierarchical_snap_{0}".format(layerName))
+            proj.addMapLayer(lyr)
+            snappedLayers[layerName] = lyr
+        context = QgsProcessingContext()
+        context.setProject(proj)
+        processing.run(
+            "dsgtools:hierarchicalsnaplayeronlayer",
+            {
+                "SNAP_HIERARCHY": [
+                    {
+                        "referenceLayer": snappedLayers[layerNames[0]].name(),
+                        "snapLayerList": [
+                            snappedLayers[layerName].name()
+                            for layerName in layerNames[1:]
+                        ],
+                        "snap": 25,
+                        "mode": 0,
+                    }
+                ],
+                "SELECTED": False,
+                "PARALLEL": parallel,
+            },
+            None,
+            QgsProcessingFeedback(),
+            context,
+        )
+        return snappedLayers
+
+    def test_hierarchicalsnaplayeronlayer_parallel(self):
+        """
+        Checks that snapping the layers of a hierarchy level concurrently gives
+        the same output as snapping them one after the other.
+        """
+        expected = self.runHierarchicalSnap(parallel=False)
+        output = self.runHierarchicalSnap(parallel=True)
+        msg = ""
+        for layerName, lyr in output.items():
+            msg = self.compareLayers(lyr, expected[layerName])
+            if msg:
+                msg = "{0}: {1}".format(layerName, msg)
+                break
+        self.clearProject()
+        self.assertEqual(msg, "")
+
     def test_adjustnetworkconnectivity(self):
         self.assertEqual(self.testAlg("dsgtools:adjustnetworkconnectivity"), "")
 
@@ -1978,6 +2047,58 @@ class Tester(unittest.TestCase):
             self.testAlg("dsgtools:identifypolygonsliver", addControlKey=True), ""
         )
 
+    def test_verifycountourstacking_compares_each_area_with_its_parent(self):
+        """
+        Pins the flags raised by the contour nesting tree: each area is
+        compared with the smallest area that contains it and flags come in
+        breadth first order, from the outermost areas to the innermost ones.
+        """
+        layer = QgsVectorLayer(
+            "Polygon?crs=EPSG:31982&field=name:string&field=level:integer&field=depression:integer",
+            "contour_areas",
+            "memory",
+        )
+        areaList = [
+            # (name, xmin, ymin, xmax, ymax, level, depression)
+            ("a", 0, 0, 300, 300, 10, 0),
+            ("b", 10, 10, 100, 100, 30, 0),
+            ("c", 150, 150, 290, 290, 20, 0),
+            ("d", 20, 20, 90, 90, 30, 1),
+            ("e", 160, 160, 280, 280, 25, 1),
+            ("f", 30, 30, 80, 80, 30, 1),
+            ("g", 170, 170, 270, 270, 15, 0),
+        ]
+        featureList = []
+        # the innermost areas are added first, so the flag order does not
+        # come from the feature order
+        for name, xmin, ymin, xmax, ymax, level, depression in reversed(areaList):
+            feat = QgsFeature(layer.fields())
+            feat.setGeometry(
+                QgsGeometry.fromWkt(
+                    "Polygon(({0} {1}, {2} {1}, {2} {3}, {0} {3}, {0} {1}))".format(
+                        xmin, ymin, xmax, ymax
+                    )
+                )
+            )
+            feat.setAttributes([name, level, depression])
+            featureList.append(feat)
+        layer.dataProvider().addFeatures(featureList)
+        outputPolygons = []
+        VerifyCountourStackingAlgorihtm().compareLevel(
+            "level",
+            10,
+            "depression",
+            layer,
+            outputPolygons,
+            QgsProcessingFeedback(),
+            4,
+            25,
+        )
+        self.assertEqual(
+            [(feat["name"], code) for feat, code in outputPolygons],
+            [("b", 1), ("e", 3), ("f", 2), ("g", 4)],
+        )
+
 
 def run_all(filterString=None):
     """Default function that is called by the runner if nothing else is specified"""